@@ -1,37 +1,26 @@
 import bpy
-import os
-import bmesh
-import mathutils
+import sys
 from bpy.types import Panel, Scene, Operator, PropertyGroup
-from bpy.props import StringProperty, IntProperty, PointerProperty
-from math import radians
+from bpy.props import IntProperty, BoolProperty, PointerProperty
 
+from . import instrumentation
+from . import uv_tools
+from . import export_tools
 
-class ToolSettings(PropertyGroup):
-    ld_angle: IntProperty(name="Limited Dissolve Angle", min=1, default=5, max=5)
-    export_path: StringProperty(name="File", subtype="FILE_PATH")
-
-
-class TOOL_OT_3dp_rename(Operator):
-    bl_idname = "3dp.rename"
-    bl_label = "rename"
-    bl_description = "set name of object data"
-    bl_options = {"REGISTER", "UNDO"}
-    foo: StringProperty(name="Name")
 
-    @classmethod
-    def poll(cls, context):
-        return len(context.selected_objects) > 0
-
-    def execute(self, context):
-        selected = context.selected_objects
-        for obj in selected:
-            obj.name = self.foo
-            obj.data.name = self.foo
-
-        self.report({"INFO"}, "Object renamed: %r" % self.foo)
-
-        return {"FINISHED"}
+class CadSettings(PropertyGroup):
+    ld_angle: IntProperty(name="Limited Dissolve Angle", min=1, default=5, max=5)
+    ld_cache: BoolProperty(name="Cache Dissolve Results", default=True)
+    ld_parallel: BoolProperty(name="Dissolve In Background Workers", default=False)
+    ld_workers: IntProperty(name="Workers", description="0 uses every core", min=0)
+    ld_verify: BoolProperty(
+        name="Verify Against Serial Dissolve",
+        description="Off by default: also dissolve every worker-computed mesh "
+        "in this process and compare their faces, edges and vertex positions",
+        default=False,
+    )
+    ld_cache_budget: IntProperty(name="Cache Budget (MB)", min=16, default=256)
+    min_part_verts: IntProperty(name="Minimum Part Vertices", min=0, default=0)
 
 
 class TOOL_OT_3dp_initialize(Operator):
@@ -48,28 +37,33 @@ class TOOL_OT_3dp_initialize(Operator):
         )
 
     def execute(self, context):
+        from .cad_pipeline import initialize_object
 
+        settings = context.scene.kbd_cad
         obj = context.active_object
+        vertex_count = len(obj.data.vertices)
+        parts, timings = initialize_object(obj, min_part_verts=settings.min_part_verts)
 
-        obj.scale = (0.01, 0.01, 0.01)
-        obj.rotation_euler = mathutils.Euler((0.0, 0.0, 0.0), "XYZ")
-
-        verts = [vert.co for vert in obj.data.vertices]
-        plain_verts = [list(vert.to_tuple()) for vert in verts]
-
-        height = 0
-        for x in plain_verts:
-            vert = round(x[2], 6)
-            if vert < height:
-                height = vert
-
-        obj.location = (0.0, 0.0, abs(height) / 100)
-        bpy.ops.object.transform_apply(location=True, scale=True, rotation=True)
-        bpy.ops.object.mode_set(mode="EDIT")
-        bpy.ops.mesh.separate(type="LOOSE")
-        bpy.ops.object.mode_set(mode="OBJECT")
         bpy.ops.view3d.view_all()
 
+        if not parts:
+            self.report(
+                {"WARNING"},
+                "Scaled %d vertices, but no loose part has %d vertices, "
+                "nothing was separated" % (vertex_count, settings.min_part_verts),
+            )
+            return {"FINISHED"}
+
+        self.report(
+            {"INFO"},
+            "Initialized %d vertices into %d parts (%s)"
+            % (
+                vertex_count,
+                len(parts),
+                ", ".join("%s %.3fs" % t for t in timings),
+            ),
+        )
+
         return {"FINISHED"}
 
 
@@ -87,108 +81,83 @@ class TOOL_OT_3dp_dissolve(Operator):
         )
 
     def execute(self, context):
-        meshes = set(o.data for o in context.selected_objects if o.type == "MESH")
-
-        bm = bmesh.new()
-
-        for m in meshes:
-            bm.from_mesh(m)
-            bmesh.ops.dissolve_limit(
-                bm, angle_limit=radians(self.foo), verts=bm.verts, edges=bm.edges
+        from .cad_pipeline import dissolve_meshes, dissolve_meshes_parallel
+        from .dissolve_cache import cache as dissolve_cache
+        from .mesh_arrays import round_trip_safe
+
+        settings = context.scene.kbd_cad
+        objects = [o for o in context.selected_objects if o.type == "MESH"]
+        # Cached and worker results are written back from mesh arrays, meshes
+        # with data the arrays can't hold are dissolved in place instead
+        whole = set(o.data for o in objects if not round_trip_safe(o))
+        meshes = set(o.data for o in objects) - whole
+        dissolve_meshes(whole, self.foo)
+
+        cache = None
+        if settings.ld_cache:
+            cache = dissolve_cache
+            cache.resize(settings.ld_cache_budget * 1024 * 1024)
+
+        if not settings.ld_parallel:
+            dissolve_meshes(meshes, self.foo, cache)
+            self.report({"INFO"}, "Applied limited dissolve (%r°)" % self.foo)
+            return {"FINISHED"}
+
+        try:
+            computed, mismatches = dissolve_meshes_parallel(
+                meshes, self.foo, cache, settings.ld_workers, settings.ld_verify
             )
-            bm.to_mesh(m)
-            m.update()
-            bm.clear()
-
-        bm.free()
+        except RuntimeError as error:
+            self.report({"ERROR"}, str(error))
+            return {"CANCELLED"}
 
-        self.report({"INFO"}, "Applied limited dissolve (%r°)" % self.foo)
+        if mismatches:
+            self.report(
+                {"WARNING"},
+                "Parallel dissolve differs from serial for: %s" % ", ".join(mismatches),
+            )
+        else:
+            self.report(
+                {"INFO"},
+                "Applied limited dissolve (%r°) to %d meshes in workers"
+                % (self.foo, computed),
+            )
 
         return {"FINISHED"}
 
 
-class TOOL_OT_3dp_unwrap(Operator):
-    bl_idname = "3dp.unwrap"
-    bl_label = "unwrap uv"
-    bl_description = "project uv from view"
-    bl_options = {"REGISTER", "UNDO"}
-    foo: StringProperty(name="Direction")
+class TOOL_OT_3dp_dissolve_precompute(Operator):
+    bl_idname = "3dp.ld_precompute"
+    bl_label = "precompute limited dissolve"
+    bl_description = "cache limited dissolve results for every angle"
 
     @classmethod
     def poll(cls, context):
-        return context.active_object.mode == "EDIT"
+        return (
+            context.active_object.mode == "OBJECT" and len(context.selected_objects) > 0
+        )
 
     def execute(self, context):
-        camera_data = bpy.data.cameras.get("3DPCamera")
-
-        if camera_data is None:
-            camera_data = bpy.data.cameras.new(name="3DPCamera")
-            my_camera = bpy.data.objects.new("3DPCamera", camera_data)
-
-            context.scene.collection.objects.link(my_camera)
-        else:
-            my_camera = bpy.data.objects["3DPCamera"]
-
-        if context.active_object.data.total_face_sel == 0:
-            self.report({"ERROR"}, "No Faces Selected")
-            return {"CANCELLED"}
-
-        camera_data.type = "ORTHO"
-
-        cam_rot = mathutils.Euler((radians(90), 0.0, radians(-90)), "XYZ")
-        cam_loc = (-9.4902, 0.0000, 0.0000)
-        camera_data.ortho_scale = 2
-
-        if self.foo == "top":
-            cam_rot = mathutils.Euler((radians(6), 0.0, 0.0), "XYZ")
-            cam_loc = (0.000, 0.6666, 5.0786)
-            camera_data.ortho_scale = 5
-        if self.foo == "bottom":
-            cam_rot = mathutils.Euler((radians(180), 0.0, 0.0), "XYZ")
-            cam_loc = (0.0000, -1.1414, -6.0376)
-            camera_data.ortho_scale = 5
-
-        my_camera.location = cam_loc
-        my_camera.rotation_euler = cam_rot
-        context.scene.camera = my_camera
-
-        bpy.ops.view3d.view_camera()
-
-        for area in bpy.context.screen.areas:
-            if area.type == "VIEW_3D":
-                area.spaces.active.region_3d.update()
-
-        bpy.ops.uv.project_from_view(
-            camera_bounds=True, correct_aspect=False, scale_to_bounds=False
+        from .cad_pipeline import precompute_dissolve
+        from .dissolve_cache import cache as dissolve_cache
+        from .mesh_arrays import round_trip_safe
+
+        settings = context.scene.kbd_cad
+        meshes = set(
+            o.data
+            for o in context.selected_objects
+            if o.type == "MESH" and round_trip_safe(o)
         )
 
-        bpy.ops.view3d.view_camera()
-
-        self.report({"INFO"}, "UV projected from %r view" % self.foo)
-
-        return {"FINISHED"}
-
-
-class TOOL_OT_3dp_export(Operator):
-    bl_idname = "3dp.export"
-    bl_label = "export gltf"
-    filename_ext = ".glb"
-
-    @classmethod
-    def poll(cls, context):
-        return len(context.selected_objects) > 0 and context.scene.settings.export_path
+        dissolve_cache.resize(settings.ld_cache_budget * 1024 * 1024)
+        computed = precompute_dissolve(meshes, dissolve_cache)
 
-    def execute(self, context):
-        bpy.ops.export_scene.gltf(
-            filepath=bpy.path.abspath(context.scene.settings.export_path),
-            use_selection=True,
-            export_materials="PLACEHOLDER",
-            export_animations=False,
-            export_morph=False,
+        self.report(
+            {"INFO"},
+            "Cached %d limited dissolve results for %d meshes"
+            % (computed, len(meshes)),
         )
 
-        self.report({"INFO"}, "Exported to: " + context.scene.settings.export_path)
-
         return {"FINISHED"}
 
 
@@ -201,6 +170,10 @@ class VIEW3D_PT_3dpkbd_uv_panel(Panel):
 
     def draw(self, context):
         layout = self.layout
+
+        settings = context.scene.kbd_cad
+        row = layout.row()
+        row.prop(settings, "min_part_verts", text="Min Verts")
         row = layout.row()
         row.operator("3dp.init", text="Initialize Model")
 
@@ -218,7 +191,7 @@ class VIEW3D_PT_3dpkbd_dissolve(Panel):
         layout.use_property_split = True
         layout.use_property_decorate = False
 
-        settings = context.scene.settings
+        settings = context.scene.kbd_cad
         row = layout.row()
         row.active = (
             context.active_object.mode == "OBJECT" and len(context.selected_objects) > 0
@@ -227,94 +200,72 @@ class VIEW3D_PT_3dpkbd_dissolve(Panel):
         row = layout.row()
         row.operator("3dp.ld", text="Dissolve").foo = settings.ld_angle
 
+        box = layout.box()
+        box.prop(settings, "ld_cache", text="Cache")
+        col = box.column()
+        col.active = settings.ld_cache
+        col.prop(settings, "ld_cache_budget", text="Budget (MB)")
+        col.operator("3dp.ld_precompute", text="Precompute All Angles")
+
+        # The cache module loads with the first dissolve, not with the panel
+        module = sys.modules.get(__package__ + ".dissolve_cache")
+        if module is None:
+            col.label(text="Cache empty")
+        else:
+            dissolve_cache = module.cache
+            obj = context.active_object
+            if obj is not None and obj.type == "MESH":
+                counts = dissolve_cache.face_counts(obj.data.name)
+                for angle, faces in counts.items():
+                    col.label(text="%d°: %d faces" % (angle, faces))
+
+            col.label(
+                text="%d results, %.1f MB, %d hits / %d misses"
+                % (
+                    len(dissolve_cache.entries),
+                    dissolve_cache.size / (1024 * 1024),
+                    dissolve_cache.hits,
+                    dissolve_cache.misses,
+                )
+            )
 
-class VIEW3D_PT_3dpkbd_uv(Panel):
-    bl_space_type = "VIEW_3D"
-    bl_region_type = "UI"
-    bl_category = "3DPKBD"
-    bl_label = "UV Project From View"
-
-    def draw(self, context):
-        layout = self.layout
-
-        layout.use_property_split = True
-        layout.use_property_decorate = False  # No animation.
-
-        row = layout.row()
-        row.operator("3dp.unwrap", text="Side").foo = "side"
-        row.operator("3dp.unwrap", text="Top").foo = "top"
-        row.operator("3dp.unwrap", text="Bottom").foo = "bottom"
-
-
-class VIEW3D_PT_3dpkbd_rename(Panel):
-    bl_space_type = "VIEW_3D"
-    bl_region_type = "UI"
-    bl_category = "3DPKBD"
-    bl_label = "Rename"
-
-    def draw(self, context):
-        layout = self.layout
-
-        layout.use_property_split = True
-        layout.use_property_decorate = False  # No animation.
-
-        row = layout.row()
-        col = row.column()
-        col.operator("3dp.rename", text="Top").foo = "top"
-        col.operator("3dp.rename", text="Standard").foo = "standard"
-        col.operator("3dp.rename", text="Vented").foo = "vented"
-        col = row.column()
-        col.operator("3dp.rename", text="Blocker").foo = "blocker"
-        col.operator("3dp.rename", text="Blocker-1").foo = "blocker-1"
-        col.operator("3dp.rename", text="Blocker-2").foo = "blocker-2"
-
-
-class VIEW3D_PT_3dpkbd_export(Panel):
-    bl_space_type = "VIEW_3D"
-    bl_region_type = "UI"
-    bl_category = "3DPKBD"
-    bl_label = "Export"
-
-    def draw(self, context):
-        layout = self.layout
-
-        settings = context.scene.settings
-        layout.row().prop(settings, "export_path", text="")
-        layout.row().operator("3dp.export", text="Export GLTF")
+        box = layout.box()
+        box.prop(settings, "ld_parallel", text="Background Workers")
+        col = box.column()
+        col.active = settings.ld_parallel
+        col.prop(settings, "ld_workers")
+        col.prop(settings, "ld_verify", text="Verify")
 
 
 classes = (
-    ToolSettings,
+    CadSettings,
     TOOL_OT_3dp_initialize,
     TOOL_OT_3dp_dissolve,
-    TOOL_OT_3dp_unwrap,
-    TOOL_OT_3dp_rename,
-    TOOL_OT_3dp_export,
+    TOOL_OT_3dp_dissolve_precompute,
     VIEW3D_PT_3dpkbd_uv_panel,
     VIEW3D_PT_3dpkbd_dissolve,
-    VIEW3D_PT_3dpkbd_uv,
-    VIEW3D_PT_3dpkbd_rename,
-    VIEW3D_PT_3dpkbd_export,
 )
 
 
 def register():
     from bpy.utils import register_class
 
+    instrumentation.register()
     for cls in classes:
-        register_class(cls)
+        register_class(instrumentation.instrument(cls))
+    uv_tools.register()
+    export_tools.register()
 
-    Scene.settings = PointerProperty(type=ToolSettings)
+    Scene.kbd_cad = PointerProperty(type=CadSettings)
 
 
 def unregister():
     from bpy.utils import unregister_class
 
+    export_tools.unregister()
+    uv_tools.unregister()
     for cls in reversed(classes):
         unregister_class(cls)
+    instrumentation.unregister()
 
-    del Scene.settings
-
-
-if __name__ == "__main__":
-    register()
+    del Scene.kbd_cad
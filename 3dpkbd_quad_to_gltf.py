@@ -1,14 +1,20 @@
-import bpy
-import os
-import bmesh
-import mathutils
+import time
 from bpy.types import Panel, Scene, Operator, PropertyGroup
-from bpy.props import StringProperty, IntProperty, PointerProperty
-from math import radians
+from bpy.props import IntProperty, BoolProperty, PointerProperty
 
+from . import instrumentation
+from . import uv_tools
+from . import export_tools
 
-class ToolSettings(PropertyGroup):
-    export_path: StringProperty(name="File", subtype="FILE_PATH")
+
+class QuadSettings(PropertyGroup):
+    subd_levels: IntProperty(name="Levels", min=0, default=1, max=6)
+    subd_apply: BoolProperty(
+        name="Apply and Bake",
+        description="Apply the subdivision in background workers",
+        default=False,
+    )
+    subd_workers: IntProperty(name="Workers", description="0 uses every core", min=0)
 
 
 class TOOL_OT_3dp_subdivision(Operator):
@@ -36,211 +42,113 @@ class TOOL_OT_3dp_subdivision(Operator):
         return {"FINISHED"}
 
 
-class TOOL_OT_3dp_rename(Operator):
-    bl_idname = "3dp.rename"
-    bl_label = "rename"
-    bl_description = "set name of object data"
+class TOOL_OT_3dp_subdivision_batch(Operator):
+    bl_idname = "3dp.subd_batch"
+    bl_label = "subd selected"
+    bl_description = "add or update subdivision on every selected mesh"
     bl_options = {"REGISTER", "UNDO"}
-    foo: StringProperty(name="Name")
 
     @classmethod
     def poll(cls, context):
-        return len(context.selected_objects) > 0
+        return context.mode == "OBJECT" and len(context.selected_objects) > 0
 
     def execute(self, context):
-        selected = context.selected_objects
-        for obj in selected:
-            obj.name = self.foo
-            obj.data.name = self.foo
-
-        self.report({"INFO"}, "Object renamed: %r" % self.foo)
-
-        return {"FINISHED"}
-
-
-class TOOL_OT_3dp_unwrap(Operator):
-    bl_idname = "3dp.unwrap"
-    bl_label = "unwrap uv"
-    bl_description = "project uv from view"
-    bl_options = {"REGISTER", "UNDO"}
-    foo: StringProperty(name="Direction")
-
-    @classmethod
-    def poll(cls, context):
-        return context.active_object.mode == "EDIT"
-
-    def execute(self, context):
-        camera_data = bpy.data.cameras.get("3DPCamera")
-
-        if camera_data is None:
-            camera_data = bpy.data.cameras.new(name="3DPCamera")
-            my_camera = bpy.data.objects.new("3DPCamera", camera_data)
-
-            context.scene.collection.objects.link(my_camera)
-        else:
-            my_camera = bpy.data.objects["3DPCamera"]
-
-        if context.active_object.data.total_face_sel == 0:
-            self.report({"ERROR"}, "No Faces Selected")
+        start = time.perf_counter()
+        settings = context.scene.kbd_quad
+        objects = [o for o in context.selected_objects if o.type == "MESH"]
+
+        for obj in objects:
+            mod = next((m for m in obj.modifiers if m.type == "SUBSURF"), None)
+            if mod is None:
+                mod = obj.modifiers.new("Subdivision", "SUBSURF")
+            mod.levels = settings.subd_levels
+            mod.render_levels = settings.subd_levels
+
+        if not settings.subd_apply:
+            self.report(
+                {"INFO"},
+                "Subdivision level %d on %d objects"
+                % (settings.subd_levels, len(objects)),
+            )
+            return {"FINISHED"}
+
+        from .quad_pipeline import bakeable, subdivide_objects_parallel
+
+        baked = [o for o in objects if bakeable(o)]
+        try:
+            subdivide_objects_parallel(baked, settings.subd_workers)
+        except RuntimeError as error:
+            self.report({"ERROR"}, str(error))
             return {"CANCELLED"}
 
-        camera_data.type = "ORTHO"
-
-        cam_rot = mathutils.Euler((radians(90), 0.0, radians(-90)), "XYZ")
-        cam_loc = (-9.4902, 0.0000, 0.0000)
-        camera_data.ortho_scale = 2
-
-        if self.foo == "top":
-            cam_rot = mathutils.Euler((radians(6), 0.0, 0.0), "XYZ")
-            cam_loc = (0.000, 0.6666, 5.0786)
-            camera_data.ortho_scale = 5
-        if self.foo == "bottom":
-            cam_rot = mathutils.Euler((radians(180), 0.0, 0.0), "XYZ")
-            cam_loc = (0.0000, -1.1414, -6.0376)
-            camera_data.ortho_scale = 5
-
-        my_camera.location = cam_loc
-        my_camera.rotation_euler = cam_rot
-        context.scene.camera = my_camera
-
-        bpy.ops.view3d.view_camera()
-
-        for area in bpy.context.screen.areas:
-            if area.type == "VIEW_3D":
-                area.spaces.active.region_3d.update()
-
-        bpy.ops.uv.project_from_view(
-            camera_bounds=True, correct_aspect=False, scale_to_bounds=False
+        kept = len(objects) - len(baked)
+        self.report(
+            {"WARNING"} if kept else {"INFO"},
+            "Baked subdivision on %d objects in %.2fs%s"
+            % (
+                len(baked),
+                time.perf_counter() - start,
+                (
+                    ", %d kept their modifier (vertex groups, shape keys, custom"
+                    " normals, shared data or other modifiers)" % kept
+                    if kept
+                    else ""
+                ),
+            ),
         )
-
-        bpy.ops.view3d.view_camera()
-
-        self.report({"INFO"}, "UV projected from %r view" % self.foo)
-
         return {"FINISHED"}
 
 
-class TOOL_OT_3dp_export(Operator):
-    bl_idname = "3dp.export"
-    bl_label = "export gltf"
-    filename_ext = ".glb"
-
-    @classmethod
-    def poll(cls, context):
-        return len(context.selected_objects) > 0 and context.scene.settings.export_path
-
-    def execute(self, context):
-        bpy.ops.export_scene.gltf(
-            filepath=bpy.path.abspath(context.scene.settings.export_path),
-            use_selection=True,
-            export_materials="PLACEHOLDER",
-            export_animations=False,
-            export_morph=False,
-        )
-
-        self.report({"INFO"}, "Exported to: " + context.scene.settings.export_path)
-
-        return {"FINISHED"}
-
-
-class VIEW3D_PT_3dpkbd_uv_panel(Panel):
+class VIEW3D_PT_3dpkbd_subd(Panel):
     bl_space_type = "VIEW_3D"
     bl_region_type = "UI"
 
     bl_category = "3DPKBD"
-    bl_label = "3DPKBD Tool"
+    bl_label = "Subdivision"
 
     def draw(self, context):
         layout = self.layout
         row = layout.row()
         row.operator("3dp.subd", text="Add Subdivision")
 
-
-class VIEW3D_PT_3dpkbd_uv(Panel):
-    bl_space_type = "VIEW_3D"
-    bl_region_type = "UI"
-    bl_category = "3DPKBD"
-    bl_label = "UV Project From View"
-
-    def draw(self, context):
-        layout = self.layout
-
-        layout.use_property_split = True
-        layout.use_property_decorate = False  # No animation.
-
-        row = layout.row()
-        row.operator("3dp.unwrap", text="Side").foo = "side"
-        row.operator("3dp.unwrap", text="Top").foo = "top"
-        row.operator("3dp.unwrap", text="Bottom").foo = "bottom"
-
-
-class VIEW3D_PT_3dpkbd_rename(Panel):
-    bl_space_type = "VIEW_3D"
-    bl_region_type = "UI"
-    bl_category = "3DPKBD"
-    bl_label = "Rename"
-
-    def draw(self, context):
-        layout = self.layout
-
-        layout.use_property_split = True
-        layout.use_property_decorate = False  # No animation.
-
-        row = layout.row()
-        col = row.column()
-        col.operator("3dp.rename", text="Top").foo = "top"
-        col.operator("3dp.rename", text="Standard").foo = "standard"
-        col.operator("3dp.rename", text="Vented").foo = "vented"
-        col = row.column()
-        col.operator("3dp.rename", text="Blocker").foo = "blocker"
-        col.operator("3dp.rename", text="Blocker-1").foo = "blocker-1"
-        col.operator("3dp.rename", text="Blocker-2").foo = "blocker-2"
-
-
-class VIEW3D_PT_3dpkbd_export(Panel):
-    bl_space_type = "VIEW_3D"
-    bl_region_type = "UI"
-    bl_category = "3DPKBD"
-    bl_label = "Export"
-
-    def draw(self, context):
-        layout = self.layout
-
-        settings = context.scene.settings
-        layout.row().prop(settings, "export_path", text="")
-        layout.row().operator("3dp.export", text="Export GLTF")
+        settings = context.scene.kbd_quad
+        box = layout.box()
+        box.prop(settings, "subd_levels")
+        row = box.row()
+        row.prop(settings, "subd_apply")
+        sub = row.row()
+        sub.active = settings.subd_apply
+        sub.prop(settings, "subd_workers")
+        box.operator("3dp.subd_batch", text="Subdivide Selected")
 
 
 classes = (
-    ToolSettings,
+    QuadSettings,
     TOOL_OT_3dp_subdivision,
-    TOOL_OT_3dp_unwrap,
-    TOOL_OT_3dp_rename,
-    TOOL_OT_3dp_export,
-    VIEW3D_PT_3dpkbd_uv_panel,
-    VIEW3D_PT_3dpkbd_uv,
-    VIEW3D_PT_3dpkbd_rename,
-    VIEW3D_PT_3dpkbd_export,
+    TOOL_OT_3dp_subdivision_batch,
+    VIEW3D_PT_3dpkbd_subd,
 )
 
 
 def register():
     from bpy.utils import register_class
 
+    instrumentation.register()
     for cls in classes:
-        register_class(cls)
+        register_class(instrumentation.instrument(cls))
+    uv_tools.register()
+    export_tools.register()
 
-    Scene.settings = PointerProperty(type=ToolSettings)
+    Scene.kbd_quad = PointerProperty(type=QuadSettings)
 
 
 def unregister():
     from bpy.utils import unregister_class
 
+    export_tools.unregister()
+    uv_tools.unregister()
     for cls in reversed(classes):
         unregister_class(cls)
+    instrumentation.unregister()
 
-    del Scene.settings
-
-
-if __name__ == "__main__":
-    register()
+    del Scene.kbd_quad
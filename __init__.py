@@ -0,0 +1,30 @@
+bl_info = {
+    "name": "3DPKBD Tools",
+    "description": "Keyboard model cleanup, UV projection, glTF export and camera coverage",
+    "blender": (4, 0, 0),
+    "location": "View3D > Sidebar > 3DPKBD, Camera Coverage",
+    "category": "3D View",
+}
+
+import sys
+import importlib
+
+# Tool scripts in panel order. Each only needs bpy to register and imports its
+# numpy and bmesh pipeline the first time one of its operators runs.
+MODULES = (
+    "3dpkbd_cad_to_gltf",
+    "3dpkbd_quad_to_gltf",
+    "export_selection_to_gltf",
+    "vertex_to_origin",
+    "camera_coverage",
+)
+
+
+def register():
+    for name in MODULES:
+        importlib.import_module("." + name, __package__).register()
+
+
+def unregister():
+    for name in reversed(MODULES):
+        sys.modules[__package__ + "." + name].unregister()
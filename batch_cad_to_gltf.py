@@ -0,0 +1,254 @@
+"""Batch CAD to glTF conversion.
+
+Runs the 3DPKBD init, dissolve, unwrap and export stages over a directory of
+source models, one background Blender process per model:
+
+    blender -b --python batch_cad_to_gltf.py -- SOURCE_DIR OUTPUT_DIR \\
+        [--config config.json] [--jobs N]
+
+Each model is written to OUTPUT_DIR/STEM.glb, or STEM.EXT.glb when several
+sources share a stem.
+
+The optional config is JSON with "defaults" applied to every job and "jobs"
+overrides keyed by source file name or stem:
+
+    {"defaults": {"ld_angle": 5}, "jobs": {"iso_enter": {"name": "blocker"}}}
+"""
+
+import argparse
+import json
+import os
+import sys
+import importlib
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if not __package__:
+    # Run by path, from Blender or a plain Python, import the add-on
+    # package first so the relative imports resolve
+    sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+    __package__ = os.path.basename(SCRIPT_DIR)
+    importlib.import_module(__package__)
+
+from .worker_pool import blender_command, run_jobs
+
+SOURCE_EXTENSIONS = (".stl", ".obj", ".ply", ".fbx", ".glb", ".gltf", ".blend")
+
+DEFAULT_SETTINGS = {
+    "scale": 0.01,
+    "min_part_verts": 0,
+    "ld_angle": 5,
+    "unwrap": False,
+    "name": "",
+}
+
+IMPORTERS = {
+    ".stl": ("wm.stl_import", "import_mesh.stl"),
+    ".obj": ("wm.obj_import", "import_scene.obj"),
+    ".ply": ("wm.ply_import", "import_mesh.ply"),
+    ".fbx": ("import_scene.fbx",),
+    ".glb": ("import_scene.gltf",),
+    ".gltf": ("import_scene.gltf",),
+}
+
+
+def script_args():
+    # Blender passes everything after "--" through to the script
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1 :]
+    return sys.argv[1:]
+
+
+def job_settings(config, source):
+    name = os.path.basename(source)
+    stem = os.path.splitext(name)[0]
+    jobs = config.get("jobs", {})
+
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get("defaults", {}))
+    settings.update(jobs.get(stem, {}))
+    settings.update(jobs.get(name, {}))
+    return settings
+
+
+def import_model(path):
+    import bpy
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".blend":
+        bpy.ops.wm.open_mainfile(filepath=path)
+        return
+
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    for idname in IMPORTERS[extension]:
+        category, name = idname.split(".")
+        try:
+            getattr(getattr(bpy.ops, category), name)(filepath=path)
+            return
+        except AttributeError:
+            # Importer not available in this Blender version
+            continue
+
+    raise RuntimeError("No importer available for %r" % path)
+
+
+def run_worker(source, output, settings_path, result_path):
+    import bpy
+    from . import cad_pipeline as pipeline
+    from .uv_project import auto_unwrap_object
+
+    with open(settings_path) as f:
+        settings = json.load(f)
+
+    stages = []
+
+    def stage(name, start):
+        seconds = time.perf_counter() - start
+        stages.append((name, seconds))
+        print("%s: %.3fs" % (name, seconds), flush=True)
+
+    start = time.perf_counter()
+    import_model(source)
+    stage("import", start)
+
+    start = time.perf_counter()
+    parts = []
+    for obj in [o for o in bpy.context.scene.objects if o.type == "MESH"]:
+        objects, _ = pipeline.initialize_object(
+            obj, settings["scale"], settings["min_part_verts"]
+        )
+        if not objects:
+            print(
+                "%s: no loose part has %d vertices, skipped"
+                % (obj.name, settings["min_part_verts"]),
+                flush=True,
+            )
+        parts.extend(objects)
+    stage("init", start)
+
+    if settings["ld_angle"]:
+        start = time.perf_counter()
+        pipeline.dissolve_meshes(set(o.data for o in parts), settings["ld_angle"])
+        stage("dissolve", start)
+
+    if settings["unwrap"]:
+        start = time.perf_counter()
+        render = bpy.context.scene.render
+        for obj in parts:
+            auto_unwrap_object(obj, (render.resolution_x, render.resolution_y))
+        stage("unwrap", start)
+
+    if settings["name"]:
+        for obj in parts:
+            obj.name = settings["name"]
+            obj.data.name = settings["name"]
+
+    start = time.perf_counter()
+    for obj in bpy.context.scene.objects:
+        obj.select_set(obj in parts)
+    pipeline.export_gltf(output)
+    stage("export", start)
+
+    with open(result_path, "w") as f:
+        json.dump({"parts": len(parts), "stages": dict(stages)}, f)
+
+
+def output_name(name, names):
+    # part.stl and part.obj would both write part.glb, sources sharing a stem
+    # keep their extension instead
+    stem = os.path.splitext(name)[0].lower()
+    shared = [n for n in names if os.path.splitext(n)[0].lower() == stem]
+    if len(shared) > 1:
+        return name + ".glb"
+    return os.path.splitext(name)[0] + ".glb"
+
+
+def run_batch(source_dir, output_dir, config_path=None, jobs=None):
+    source_dir = os.path.abspath(source_dir)
+    output_dir = os.path.abspath(output_dir)
+
+    config = {}
+    if config_path:
+        with open(config_path) as f:
+            config = json.load(f)
+
+    sources = sorted(
+        os.path.join(source_dir, name)
+        for name in os.listdir(source_dir)
+        if os.path.splitext(name)[1].lower() in SOURCE_EXTENSIONS
+    )
+
+    log_dir = os.path.join(output_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    commands = []
+    log_paths = []
+    entries = []
+    names = [os.path.basename(source) for source in sources]
+    for source, name in zip(sources, names):
+        output = os.path.join(output_dir, output_name(name, names))
+        settings_path = os.path.join(log_dir, name + ".settings.json")
+        result_path = os.path.join(log_dir, name + ".result.json")
+
+        with open(settings_path, "w") as f:
+            json.dump(job_settings(config, source), f, indent=2)
+
+        commands.append(
+            blender_command(
+                os.path.abspath(__file__),
+                ["--worker", source, output, settings_path, result_path],
+            )
+        )
+        log_paths.append(os.path.join(log_dir, name + ".log"))
+        entries.append({"source": source, "output": output, "result_path": result_path})
+
+    start = time.perf_counter()
+    results = run_jobs(commands, log_paths, jobs)
+    total = time.perf_counter() - start
+
+    summary = []
+    for entry, result in zip(entries, results):
+        job = {
+            "source": entry["source"],
+            "output": entry["output"],
+            "ok": result["returncode"] == 0 and os.path.exists(entry["output"]),
+        }
+        job.update(result)
+        if os.path.exists(entry["result_path"]):
+            with open(entry["result_path"]) as f:
+                job.update(json.load(f))
+        summary.append(job)
+        print(
+            "%s %s (%.1fs)"
+            % ("OK  " if job["ok"] else "FAIL", entry["source"], job["seconds"])
+        )
+
+    failed = len([job for job in summary if not job["ok"]])
+    with open(os.path.join(output_dir, "summary.json"), "w") as f:
+        json.dump({"jobs": summary, "failed": failed, "seconds": total}, f, indent=2)
+
+    print("%d jobs, %d failed, %.1fs" % (len(summary), failed, total))
+
+    return 1 if failed else 0
+
+
+def main():
+    args = script_args()
+    if args and args[0] == "--worker":
+        run_worker(*args[1:5])
+        return 0
+
+    parser = argparse.ArgumentParser(description="Batch convert CAD models to glTF")
+    parser.add_argument("source_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--config", help="JSON job settings")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: cores)")
+    options = parser.parse_args(args)
+
+    return run_batch(
+        options.source_dir, options.output_dir, options.config, options.jobs
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
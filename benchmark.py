@@ -0,0 +1,667 @@
+"""Operator benchmarks on generated keyboard scenes.
+
+Builds keyboard-scale test scenes procedurally and times every operator of
+the scripts in this directory at several scales, under the bpy module or a
+background Blender:
+
+    blender -b --python benchmark.py -- [--keys 1 10 104] [--density 4 16] \\
+        [--repeat 3] [--only 3dp.ld camera.] [--output benchmark.json] \\
+        [--compare previous.json]
+
+CAD scenes are one object in millimetres with every keycap triangulated and
+its vertices duplicated along the seams between sides, like a tessellated CAD
+export. Quad scenes are one welded quad-modeled object per keycap, at the
+scale 3dp.init leaves CAD parts in. Results are written as JSON, and --compare
+prints the change of every median against an earlier run.
+
+Before timing anything the exporter's own Catmull-Clark subdivision is checked
+against the Subdivision modifier's corner positions and normals, and the run
+fails if they differ by more than SUBDIVISION_TOLERANCE.
+"""
+
+import bpy
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+import importlib
+import numpy as np
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+if not __package__:
+    # Run by path with --python, import the add-on package first so the
+    # relative imports and the scripts it loads resolve
+    sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+    __package__ = os.path.basename(SCRIPT_DIR)
+    importlib.import_module(__package__)
+
+from .mesh_arrays import write_mesh_arrays
+from . import coverage_analysis
+from . import dissolve_cache
+from . import glb_writer
+
+# Keycap footprint, height and the keyboard grid pitch in millimetres
+CAP_SIZE = 18.0
+CAP_HEIGHT = 8.0
+PITCH = 19.05
+ROW_KEYS = 15
+
+# Largest corner position (metres) and normal difference allowed between the
+# exporter's own subdivision and the Subdivision modifier's output
+SUBDIVISION_TOLERANCE = (1e-5, 1e-3)
+
+PIPELINES = (
+    "cad_pipeline",
+    "quad_pipeline",
+    "uv_project",
+    "export_worker",
+    "keyframe_bake",
+)
+
+
+def script_args():
+    # Blender passes everything after "--" through to the script
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1 :]
+    return sys.argv[1:]
+
+
+def keycap_arrays(density, weld=True):
+    # Quad grid over the four sides and the dished top of a tapered keycap,
+    # density quads along every edge. Without weld each side keeps its own
+    # vertices along the seams, like a tessellated CAD B-rep.
+    steps = np.linspace(-1.0, 1.0, density + 1)
+    a, b = np.meshgrid(steps, steps, indexing="ij")
+    a = a.ravel()
+    b = b.ravel()
+    one = np.ones_like(a)
+    # (x, y, z) of every face in cube coordinates, z from 0 at the bottom
+    sides = [
+        (a, b, one),
+        (one, a, (b + 1) / 2),
+        (-one, -a, (b + 1) / 2),
+        (-a, one, (b + 1) / 2),
+        (a, -one, (b + 1) / 2),
+    ]
+
+    co = []
+    faces = []
+    grid = np.arange((density + 1) ** 2).reshape(density + 1, density + 1)
+    quads = np.column_stack(
+        [
+            grid[:-1, :-1].ravel(),
+            grid[1:, :-1].ravel(),
+            grid[1:, 1:].ravel(),
+            grid[:-1, 1:].ravel(),
+        ]
+    )
+    for x, y, z in sides:
+        faces.append(quads + len(co) * len(a))
+        co.append(np.column_stack([x, y, z]))
+    co = np.concatenate(co)
+    faces = np.concatenate(faces)
+
+    if weld:
+        _, first, inverse = np.unique(
+            np.round(co, 6), axis=0, return_index=True, return_inverse=True
+        )
+        co = co[first]
+        faces = inverse.ravel()[faces]
+
+    # Orient every face outwards
+    normals = np.cross(
+        co[faces[:, 1]] - co[faces[:, 0]], co[faces[:, 2]] - co[faces[:, 0]]
+    )
+    centers = co[faces].mean(axis=1) - [0.0, 0.0, 0.5]
+    flip = np.einsum("ij,ij->i", normals, centers) < 0
+    faces[flip] = faces[flip, ::-1]
+
+    # Taper towards the top and dish the top face
+    taper = 1.0 - 0.2 * co[:, 2]
+    dish = 0.08 * (1.0 - co[:, 0] ** 2) * (co[:, 2] > 0.999)
+    co = np.column_stack(
+        [
+            co[:, 0] * taper * CAP_SIZE / 2,
+            co[:, 1] * taper * CAP_SIZE / 2,
+            (co[:, 2] - dish) * CAP_HEIGHT,
+        ]
+    )
+    return co, faces
+
+
+def keyboard_arrays(keys, density, cad=False):
+    # Mesh arrays of keys caps on a keyboard grid. cad triangulates the caps
+    # and duplicates the vertices along their seams.
+    co, faces = keycap_arrays(density, weld=not cad)
+    index = np.arange(keys)
+    offsets = np.column_stack(
+        [(index % ROW_KEYS) * PITCH, -(index // ROW_KEYS) * PITCH, np.zeros(keys)]
+    )
+    all_co = (co[None] + offsets[:, None]).reshape(-1, 3)
+    all_faces = (faces[None] + (index * len(co))[:, None, None]).reshape(-1, 4)
+
+    if cad:
+        loop_verts = all_faces[:, [0, 1, 2, 0, 2, 3]].ravel()
+        loop_total = np.full(len(all_faces) * 2, 3)
+    else:
+        loop_verts = all_faces.ravel()
+        loop_total = np.full(len(all_faces), 4)
+
+    return {
+        "co": all_co,
+        "edges": np.zeros((0, 2), dtype=np.int32),
+        "loop_verts": loop_verts,
+        "loop_start": np.cumsum(loop_total) - loop_total,
+        "loop_total": loop_total,
+        "material_index": np.zeros(len(loop_total), dtype=np.int32),
+        "use_smooth": np.zeros(len(loop_total), dtype=bool),
+        "uvs": {},
+    }
+
+
+def add_object(name, arrays):
+    mesh = bpy.data.meshes.new(name)
+    write_mesh_arrays(mesh, arrays)
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+
+
+def clear_scene():
+    if bpy.context.object is not None and bpy.context.object.mode != "OBJECT":
+        bpy.ops.object.mode_set(mode="OBJECT")
+    for collection in (
+        bpy.data.objects,
+        bpy.data.meshes,
+        bpy.data.cameras,
+        bpy.data.actions,
+    ):
+        for block in list(collection):
+            collection.remove(block)
+
+
+def reset_caches():
+    # Every timed call starts cold, repeats would otherwise only measure hits
+    dissolve_cache.cache.clear()
+    glb_writer.evaluated_cache.clear()
+    for cache in (
+        coverage_analysis.bvh_cache,
+        coverage_analysis.hull_cache,
+        coverage_analysis.fit_cache,
+    ):
+        cache.clear()
+
+
+def select(objects, active=None):
+    for obj in bpy.context.view_layer.objects:
+        obj.select_set(obj in objects)
+    bpy.context.view_layer.objects.active = active or (objects[0] if objects else None)
+
+
+def cad_scene(keys, density):
+    obj = add_object("Keyboard", keyboard_arrays(keys, density, cad=True))
+    select([obj])
+    return [obj]
+
+
+def quad_scene(keys, density, merged=False):
+    # Caps at the 3dp.init scale, one object each or all in one
+    if merged:
+        arrays = keyboard_arrays(keys, density)
+        arrays["co"] = arrays["co"] * 0.01
+        objects = [add_object("Keyboard", arrays)]
+    else:
+        arrays = keyboard_arrays(1, density)
+        arrays["co"] = arrays["co"] * 0.01
+        objects = []
+        for index in range(keys):
+            obj = add_object("Keycap.%03d" % index, arrays)
+            obj.location = (
+                (index % ROW_KEYS) * PITCH * 0.01,
+                -(index // ROW_KEYS) * PITCH * 0.01,
+                0.0,
+            )
+            objects.append(obj)
+    select(objects)
+    return objects
+
+
+def edit_all(objects):
+    select(objects)
+    bpy.ops.object.mode_set(mode="EDIT")
+    bpy.ops.mesh.select_all(action="SELECT")
+
+
+def viewport_error(error):
+    # Init operators end by framing the viewport, which fails without a window
+    # after their actual work is done
+    return "view3d." in str(error)
+
+
+def init_rig(objects):
+    try:
+        bpy.ops.camera.init()
+    except RuntimeError as error:
+        if not viewport_error(error):
+            raise
+    settings = bpy.context.scene.camera_coverage
+    settings.camera.location = (0.0, -1.0, 0.0)
+    settings.empty.location = (0.0, 0.0, -0.1)
+    settings.selected_object = objects[0]
+    select(objects)
+
+
+def load_script(filename):
+    return importlib.import_module("." + os.path.splitext(filename)[0], __package__)
+
+
+def cases(tmp):
+    # (script, case name, setup(keys, density) -> None, operator call), each
+    # script registered only while its own cases run
+    glb = os.path.join(tmp, "out.glb")
+
+    def use_settings(namespace, **values):
+        settings = getattr(bpy.context.scene, namespace)
+        for key, value in values.items():
+            setattr(settings, key, value)
+
+    def use_export(**values):
+        use_settings("kbd_export", export_path=glb, **values)
+
+    def cad_parts(keys, density, parallel=False):
+        use_settings("kbd_cad", ld_cache=False, ld_parallel=parallel)
+        cad_scene(keys, density)
+        try:
+            getattr(bpy.ops, "3dp").init()
+        except RuntimeError as error:
+            if not viewport_error(error):
+                raise
+        select(list(bpy.context.scene.objects))
+
+    def quad(keys, density, **values):
+        use_settings("kbd_quad", **values)
+        return quad_scene(keys, density)
+
+    def exported(keys, density, **values):
+        use_export(**values)
+        return quad_scene(keys, density)
+
+    def subdivided(keys, density, numpy):
+        quad(keys, density, subd_apply=False)
+        getattr(bpy.ops, "3dp").subd_batch()
+        use_export(fast_export=True, export_apply=True, export_subdivide=numpy)
+
+    return [
+        (
+            "3dpkbd_cad_to_gltf.py",
+            [
+                ("3dp.init", lambda k, d: cad_scene(k, d), ("3dp", "init", {})),
+                ("3dp.ld", cad_parts, ("3dp", "ld", {"foo": 5})),
+                (
+                    "3dp.ld[parallel]",
+                    lambda k, d: cad_parts(k, d, parallel=True),
+                    ("3dp", "ld", {"foo": 5}),
+                ),
+                (
+                    "3dp.unwrap",
+                    lambda k, d: edit_all(quad_scene(k, d, merged=True)),
+                    ("3dp", "unwrap", {"foo": "top"}),
+                ),
+                (
+                    "3dp.auto_unwrap",
+                    lambda k, d: quad_scene(k, d),
+                    ("3dp", "auto_unwrap", {}),
+                ),
+                (
+                    "3dp.export",
+                    lambda k, d: exported(k, d, fast_export=False, export_apply=False),
+                    ("3dp", "export", {}),
+                ),
+                (
+                    "3dp.export[fast]",
+                    lambda k, d: exported(k, d, fast_export=True, export_apply=False),
+                    ("3dp", "export", {}),
+                ),
+            ],
+        ),
+        (
+            "3dpkbd_quad_to_gltf.py",
+            [
+                (
+                    "3dp.subd",
+                    lambda k, d: select(quad(k, d)[:1]),
+                    ("3dp", "subd", {}),
+                ),
+                (
+                    "3dp.subd_batch",
+                    lambda k, d: quad(k, d, subd_apply=False),
+                    ("3dp", "subd_batch", {}),
+                ),
+                (
+                    "3dp.subd_batch[apply]",
+                    lambda k, d: quad(k, d, subd_apply=True),
+                    ("3dp", "subd_batch", {}),
+                ),
+                (
+                    "3dp.export[subdivided]",
+                    lambda k, d: subdivided(k, d, False),
+                    ("3dp", "export", {}),
+                ),
+                (
+                    "3dp.export[numpy subdivision]",
+                    lambda k, d: subdivided(k, d, True),
+                    ("3dp", "export", {}),
+                ),
+            ],
+        ),
+        (
+            "export_selection_to_gltf.py",
+            [
+                (
+                    "export.selection_to_gltf",
+                    lambda k, d: quad_scene(k, d),
+                    ("export", "selection_to_gltf", {"filepath": glb}),
+                ),
+                (
+                    "export.selection_to_gltf[fast]",
+                    lambda k, d: quad_scene(k, d),
+                    (
+                        "export",
+                        "selection_to_gltf",
+                        {"filepath": glb, "use_fast_writer": True},
+                    ),
+                ),
+            ],
+        ),
+        (
+            "vertex_to_origin.py",
+            [
+                (
+                    "object.vertex_to_origin",
+                    lambda k, d: edit_all(quad_scene(k, d)),
+                    ("object", "vertex_to_origin", {"target": "CENTROID"}),
+                ),
+            ],
+        ),
+        (
+            "camera_coverage.py",
+            [
+                (
+                    "camera.init",
+                    lambda k, d: quad_scene(k, d, merged=True),
+                    ("camera", "init", {}),
+                ),
+                (
+                    "camera.target",
+                    lambda k, d: init_rig(quad_scene(k, d, merged=True)),
+                    ("camera", "target", {}),
+                ),
+                (
+                    "camera.position",
+                    lambda k, d: init_rig(quad_scene(k, d, merged=True)),
+                    ("camera", "position", {"angle": 45.0}),
+                ),
+                (
+                    "camera.rotate",
+                    lambda k, d: init_rig(quad_scene(k, d, merged=True)),
+                    ("camera", "rotate", {"angle": 90.0}),
+                ),
+                (
+                    "camera.bake_turntable",
+                    lambda k, d: init_rig(quad_scene(k, d, merged=True)),
+                    ("camera", "bake_turntable", {}),
+                ),
+                (
+                    "camera.analyze_coverage",
+                    lambda k, d: init_rig(quad_scene(k, d, merged=True)),
+                    ("camera", "analyze_coverage", {}),
+                ),
+                (
+                    "camera.plan_coverage",
+                    lambda k, d: init_rig(quad_scene(k, d, merged=True)),
+                    ("camera", "plan_coverage", {}),
+                ),
+            ],
+        ),
+    ]
+
+
+def run_case(setup, call, keys, density, repeat):
+    # Median of repeat timed calls, each on a freshly built scene
+    group, name, kwargs = call
+    operator = getattr(getattr(bpy.ops, group), name)
+    seconds = []
+    result = {"vertices": 0, "error": None}
+    for _ in range(repeat):
+        clear_scene()
+        reset_caches()
+        try:
+            setup(keys, density)
+        except RuntimeError as error:
+            result["error"] = "setup: %s" % str(error).strip()
+            break
+        result["vertices"] = sum(
+            len(o.data.vertices) for o in bpy.context.scene.objects if o.type == "MESH"
+        )
+        start = time.perf_counter()
+        try:
+            status = operator(**kwargs)
+        except RuntimeError as error:
+            if not viewport_error(error):
+                result["error"] = str(error).strip()
+                break
+            status = {"FINISHED"}
+        seconds.append(time.perf_counter() - start)
+        if "FINISHED" not in status:
+            result["error"] = "returned %s" % ", ".join(sorted(status))
+            break
+
+    result["seconds"] = seconds
+    result["median"] = float(np.median(seconds)) if seconds else None
+    return result
+
+
+def subdivision_errors(arrays, levels):
+    # Largest corner position and normal difference between the numpy
+    # Catmull-Clark evaluator and the evaluated modifier, faces matched by
+    # their centres and corners by position since the order differs
+    from mathutils.kdtree import KDTree
+    from .catmull_clark import subdivide_arrays, export_loops, subsurf_modifier
+    from .mesh_arrays import read_mesh_arrays
+    from .mesh_dedupe import read_corner_normals
+
+    clear_scene()
+    obj = add_object("Keycap", arrays)
+    modifier = obj.modifiers.new("Subdivision", "SUBSURF")
+    modifier.levels = levels
+    if subsurf_modifier(obj) is None:
+        return None
+
+    result = subdivide_arrays(
+        read_mesh_arrays(obj.data),
+        levels,
+        modifier.use_limit_surface,
+        modifier.uv_smooth,
+        modifier.boundary_smooth,
+    )
+    ours = result["co"][result["loop_verts"]].reshape(-1, 4, 3)
+    our_normals = export_loops(result)["normals"].reshape(-1, 4, 3)
+
+    evaluated = obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
+    mesh = evaluated.to_mesh()
+    reference = read_mesh_arrays(mesh)
+    theirs = reference["co"][reference["loop_verts"]].reshape(-1, 4, 3)
+    their_normals = read_corner_normals(mesh).reshape(-1, 4, 3)
+    evaluated.to_mesh_clear()
+    if ours.shape != theirs.shape:
+        return float("inf"), float("inf")
+
+    tree = KDTree(len(theirs))
+    for index, center in enumerate(theirs.mean(axis=1)):
+        tree.insert(center, index)
+    tree.balance()
+    faces = np.array([tree.find(center)[1] for center in ours.mean(axis=1)])
+    distance = np.linalg.norm(ours[:, :, None] - theirs[faces][:, None], axis=3)
+    corners = distance.argmin(axis=2)
+    normals = their_normals[faces[:, None], corners]
+    return (
+        float(distance.min(axis=2).max()),
+        float(np.linalg.norm(our_normals - normals, axis=2).max()),
+    )
+
+
+def check_subdivision(density):
+    # The exporter subdivides plain modifiers itself by default, check it
+    # against the modifier on flat and smooth caps at every level it handles
+    checks = []
+    for smooth in (False, True):
+        for levels in (1, 2):
+            arrays = keyboard_arrays(1, density)
+            arrays["co"] = arrays["co"] * 0.01
+            arrays["use_smooth"][:] = smooth
+            errors = subdivision_errors(arrays, levels)
+            check = {"smooth": smooth, "levels": levels, "errors": errors}
+            check["ok"] = errors is not None and all(
+                error <= limit for error, limit in zip(errors, SUBDIVISION_TOLERANCE)
+            )
+            checks.append(check)
+            print(
+                "subdivision %-6s level %d %s"
+                % (
+                    "smooth" if smooth else "flat",
+                    levels,
+                    (
+                        "position %.2e, normal %.2e%s"
+                        % (errors + ("" if check["ok"] else " FAILED",))
+                        if errors is not None
+                        else "not handled by the evaluator FAILED"
+                    ),
+                ),
+                flush=True,
+            )
+    clear_scene()
+    return checks
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=SCRIPT_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(keys, densities, repeat, only=None):
+    # The operators import their pipelines on first use, load them up front so
+    # the first timed call does not pay for it
+    for name in PIPELINES:
+        importlib.import_module("." + name, __package__)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="3dp_bench_") as tmp:
+        for script, script_cases in cases(tmp):
+            selected = [
+                case
+                for case in script_cases
+                if not only or any(case[0].startswith(prefix) for prefix in only)
+            ]
+            if not selected:
+                continue
+
+            module = load_script(script)
+            module.register()
+            # Time the operators, not the tracing around them
+            bpy.context.window_manager.instrumentation.enabled = False
+            try:
+                for name, setup, call in selected:
+                    for count in keys:
+                        for density in densities:
+                            result = run_case(setup, call, count, density, repeat)
+                            result.update(
+                                {"operator": name, "keys": count, "density": density}
+                            )
+                            results.append(result)
+                            print(
+                                "%-34s %4d keys x%-3d %s"
+                                % (
+                                    name,
+                                    count,
+                                    density,
+                                    (
+                                        "%.4fs" % result["median"]
+                                        if result["error"] is None
+                                        else "ERROR " + result["error"]
+                                    ),
+                                ),
+                                flush=True,
+                            )
+            finally:
+                clear_scene()
+                module.unregister()
+
+    return results
+
+
+def compare(results, previous):
+    # Print the median change of every case found in both runs
+    old = {
+        (r["operator"], r["keys"], r["density"]): r["median"]
+        for r in previous["results"]
+    }
+    for result in results:
+        key = (result["operator"], result["keys"], result["density"])
+        before = old.get(key)
+        if before and result["median"]:
+            print(
+                "%-34s %4d keys x%-3d %.4fs -> %.4fs (%+.1f%%)"
+                % (
+                    key
+                    + (before, result["median"], (result["median"] / before - 1) * 100)
+                )
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the 3DPKBD operators")
+    parser.add_argument("--keys", type=int, nargs="+", default=[1, 10, 104])
+    parser.add_argument("--density", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", help="operator name prefixes")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="earlier benchmark JSON")
+    options = parser.parse_args(script_args())
+
+    start = time.perf_counter()
+    checks = check_subdivision(min(options.density))
+    results = run_benchmarks(
+        options.keys, options.density, options.repeat, options.only
+    )
+    report = {
+        "commit": git_commit(),
+        "blender": bpy.app.version_string,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seconds": time.perf_counter() - start,
+        "subdivision": checks,
+        "results": results,
+    }
+    with open(options.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Wrote %s" % options.output)
+
+    if options.compare:
+        with open(options.compare) as f:
+            compare(results, json.load(f))
+
+    failed = any(r["error"] for r in results) or not all(c["ok"] for c in checks)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
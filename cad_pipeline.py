@@ -0,0 +1,252 @@
+import bpy
+import os
+import tempfile
+import time
+import bmesh
+import mathutils
+import numpy as np
+from math import radians
+
+from .mesh_arrays import (
+    read_coords,
+    write_coords,
+    drop_to_floor,
+    separate_loose,
+    read_mesh_arrays,
+    write_mesh_arrays,
+    save_mesh_bundle,
+    load_mesh_bundle,
+    balance_chunks,
+)
+from .dissolve_cache import ANGLES, hash_arrays
+from .worker_pool import blender_command, run_jobs
+from .glb_writer import FragmentCache, write_glb
+
+
+def initialize_object(obj, scale=0.01, min_part_verts=0):
+    mesh = obj.data
+    timings = []
+
+    start = time.perf_counter()
+    co = read_coords(mesh)
+    timings.append(("read", time.perf_counter() - start))
+
+    # Scale to meters and rest on the floor, baking straight into the mesh
+    # data instead of going through transform_apply
+    start = time.perf_counter()
+    drop_to_floor(co, scale)
+    timings.append(("transform", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    write_coords(mesh, co)
+    obj.location = (0.0, 0.0, 0.0)
+    obj.rotation_euler = mathutils.Euler((0.0, 0.0, 0.0), "XYZ")
+    obj.scale = (1.0, 1.0, 1.0)
+    timings.append(("write", time.perf_counter() - start))
+
+    start = time.perf_counter()
+    parts = separate_loose(obj, min_part_verts)
+    timings.append(("separate", time.perf_counter() - start))
+
+    return parts, timings
+
+
+def dissolve_meshes(meshes, angle, cache=None):
+    bm = bmesh.new()
+
+    for m in meshes:
+        if cache is not None:
+            source = hash_arrays(read_mesh_arrays(m))
+            cache.sources[m.name] = source
+            result = cache.get(source, angle)
+            if result is not None:
+                m.clear_geometry()
+                write_mesh_arrays(m, result)
+                continue
+
+        bm.from_mesh(m)
+        bmesh.ops.dissolve_limit(
+            bm, angle_limit=radians(angle), verts=bm.verts, edges=bm.edges
+        )
+        bm.to_mesh(m)
+        m.update()
+        bm.clear()
+
+        if cache is not None:
+            cache.put(source, angle, read_mesh_arrays(m))
+
+    bm.free()
+
+
+def dissolve_copy(mesh, angle):
+    # Plain bmesh dissolve of the live mesh into a copy, the reference the
+    # worker round trip is checked against
+    copy = mesh.copy()
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bmesh.ops.dissolve_limit(
+        bm, angle_limit=radians(angle), verts=bm.verts, edges=bm.edges
+    )
+    bm.to_mesh(copy)
+    bm.free()
+    arrays = read_mesh_arrays(copy)
+    bpy.data.meshes.remove(copy)
+    return arrays
+
+
+def face_rows(arrays, ids):
+    # Every face as its sorted vertex ids padded with -1, rows sorted
+    loop_total = arrays["loop_total"].astype(np.int64)
+    offsets = np.arange(loop_total.sum()) - np.repeat(
+        np.cumsum(loop_total) - loop_total, loop_total
+    )
+    loops = np.repeat(arrays["loop_start"], loop_total) + offsets
+    faces = np.full((len(loop_total), max(loop_total.max(initial=0), 1)), -1)
+    faces[np.repeat(np.arange(len(loop_total)), loop_total), offsets] = ids[
+        arrays["loop_verts"][loops]
+    ]
+    faces = np.sort(faces, axis=1)
+    return faces[np.lexsort(faces.T[::-1])]
+
+
+def same_geometry(a, b, decimals=5):
+    # Element order may differ after the array round trip, so vertices are
+    # identified by their rounded position and the faces and edges compared
+    # as sets of those
+    for key in ("co", "edges", "loop_start", "loop_verts"):
+        if len(a[key]) != len(b[key]):
+            return False
+    _, ids = np.unique(
+        np.round(np.concatenate((a["co"], b["co"])), decimals),
+        axis=0,
+        return_inverse=True,
+    )
+    ids = ids.ravel()
+    ids_a = ids[: len(a["co"])]
+    ids_b = ids[len(a["co"]) :]
+    if not np.array_equal(np.unique(ids_a), np.unique(ids_b)):
+        return False
+    edges_a = np.unique(np.sort(ids_a[a["edges"]], axis=1), axis=0)
+    edges_b = np.unique(np.sort(ids_b[b["edges"]], axis=1), axis=0)
+    if not np.array_equal(edges_a, edges_b):
+        return False
+    return np.array_equal(face_rows(a, ids_a), face_rows(b, ids_b))
+
+
+def dissolve_meshes_parallel(meshes, angle, cache=None, workers=None, verify=False):
+    # Hand the mesh arrays to background Blender processes, one balanced chunk
+    # per worker, and write the results back in bulk
+    meshes = list(meshes)
+    sources = [read_mesh_arrays(m) for m in meshes]
+    results = [None] * len(meshes)
+
+    if cache is not None:
+        keys = [hash_arrays(arrays) for arrays in sources]
+        for index, m in enumerate(meshes):
+            cache.sources[m.name] = keys[index]
+            results[index] = cache.get(keys[index], angle)
+
+    pending = [index for index, result in enumerate(results) if result is None]
+    chunks = balance_chunks(
+        [len(sources[index]["co"]) for index in pending],
+        workers or os.cpu_count() or 1,
+    )
+    script = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "dissolve_worker.py"
+    )
+
+    with tempfile.TemporaryDirectory(prefix="3dp_ld_") as tmp:
+        commands = []
+        log_paths = []
+        outputs = []
+        for number, chunk in enumerate(chunks):
+            source = os.path.join(tmp, "in_%d.npz" % number)
+            outputs.append(os.path.join(tmp, "out_%d.npz" % number))
+            log_paths.append(os.path.join(tmp, "worker_%d.log" % number))
+            save_mesh_bundle(source, [sources[pending[i]] for i in chunk])
+            commands.append(blender_command(script, [source, outputs[-1], angle]))
+
+        jobs = run_jobs(commands, log_paths, len(commands))
+
+        for chunk, job, output in zip(chunks, jobs, outputs):
+            if job["returncode"] != 0 or not os.path.exists(output):
+                with open(job["log"]) as log:
+                    raise RuntimeError("Dissolve worker failed:\n" + log.read()[-2000:])
+            for i, arrays in zip(chunk, load_mesh_bundle(output)):
+                results[pending[i]] = arrays
+
+    computed = set(pending)
+    mismatches = []
+    if verify:
+        for index in pending:
+            expected = dissolve_copy(meshes[index], angle)
+            if not same_geometry(expected, results[index]):
+                mismatches.append(meshes[index].name)
+
+    for index, m in enumerate(meshes):
+        m.clear_geometry()
+        write_mesh_arrays(m, results[index])
+        if cache is not None and index in computed:
+            cache.put(keys[index], angle, results[index])
+
+    return len(pending), mismatches
+
+
+def precompute_dissolve(meshes, cache, angles=ANGLES):
+    # Dissolve each mesh at every angle from a single bmesh load, keeping the
+    # meshes themselves untouched
+    scratch = bpy.data.meshes.new("3DPDissolveScratch")
+    bm = bmesh.new()
+    computed = 0
+
+    for m in meshes:
+        source = hash_arrays(read_mesh_arrays(m))
+        cache.sources[m.name] = source
+        missing = [a for a in angles if (source, a) not in cache.entries]
+        if not missing:
+            continue
+
+        bm.from_mesh(m)
+        for angle in missing:
+            result = bm.copy()
+            bmesh.ops.dissolve_limit(
+                result,
+                angle_limit=radians(angle),
+                verts=result.verts,
+                edges=result.edges,
+            )
+            result.to_mesh(scratch)
+            result.free()
+            cache.put(source, angle, read_mesh_arrays(scratch))
+            computed += 1
+        bm.clear()
+
+    bm.free()
+    bpy.data.meshes.remove(scratch)
+
+    return computed
+
+
+def export_gltf(
+    filepath,
+    objects=None,
+    fast=False,
+    incremental=False,
+    instancing=None,
+    quantize=None,
+):
+    if fast:
+        if objects is None:
+            objects = bpy.context.selected_objects
+        cache = FragmentCache() if incremental else None
+        return write_glb(
+            filepath, objects, cache=cache, instancing=instancing, quantize=quantize
+        )
+
+    bpy.ops.export_scene.gltf(
+        filepath=filepath,
+        use_selection=True,
+        export_materials="PLACEHOLDER",
+        export_animations=False,
+        export_morph=False,
+    )
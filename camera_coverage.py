@@ -1,15 +1,20 @@
 import bpy
-from math import radians
+import time
+from math import radians, degrees
 from bpy.types import Panel, Scene, Operator, PropertyGroup, Object
 from bpy.props import (
     PointerProperty,
     FloatProperty,
     IntProperty,
     BoolProperty,
+    StringProperty,
+    EnumProperty,
 )
 
+from . import instrumentation
 
-class ToolSettings(PropertyGroup):
+
+class CoverageSettings(PropertyGroup):
     camera: PointerProperty(type=Object)
     empty: PointerProperty(type=Object)
     selected_object: PointerProperty(type=Object)
@@ -17,6 +22,115 @@ class ToolSettings(PropertyGroup):
     keyframes_position: IntProperty(
         name="Keyframe", min=1, default=10, step=10, max=250
     )
+    auto_fit: BoolProperty(
+        name="Auto Fit",
+        description="Fit ortho scale to the target whenever the rig moves",
+        default=False,
+    )
+    fit_center: BoolProperty(
+        name="Center",
+        description="Also move the empty so the target is centered in frame",
+        default=False,
+    )
+    fit_margin: FloatProperty(
+        name="Margin", min=0.0, default=5.0, max=100.0, subtype="PERCENTAGE"
+    )
+    plan_step: FloatProperty(
+        name="Candidate Spacing",
+        description="Angle between candidate views",
+        min=2.0,
+        default=10.0,
+        max=45.0,
+    )
+    plan_target: FloatProperty(
+        name="Target Coverage",
+        description="Share of the visible surface the planned views must cover",
+        min=1.0,
+        default=99.0,
+        max=100.0,
+        subtype="PERCENTAGE",
+    )
+    plan_spacing: IntProperty(name="Frames Between Views", min=1, default=10)
+    bake_steps: IntProperty(
+        name="Azimuth Steps",
+        description="Keys per revolution, 8 matches the rotation presets",
+        min=1,
+        default=8,
+        max=360,
+    )
+    bake_spacing: IntProperty(name="Frames Per Step", min=1, default=10)
+    bake_interpolation: EnumProperty(
+        name="Interpolation",
+        items=[
+            ("CONSTANT", "Constant", "Hold each view"),
+            ("LINEAR", "Linear", "Spin at constant speed"),
+            ("BEZIER", "Bezier", "Smooth spin"),
+            ("SINE", "Sine", "Sinusoidal easing"),
+            ("QUAD", "Quadratic", "Quadratic easing"),
+            ("CUBIC", "Cubic", "Cubic easing"),
+            ("EXPO", "Exponential", "Exponential easing"),
+        ],
+        default="LINEAR",
+    )
+    bake_easing: EnumProperty(
+        name="Easing",
+        items=[
+            ("AUTO", "Automatic", "Default easing of the interpolation"),
+            ("EASE_IN", "Ease In", "Ease in between keys"),
+            ("EASE_OUT", "Ease Out", "Ease out between keys"),
+            ("EASE_IN_OUT", "Ease In and Out", "Ease in and out between keys"),
+        ],
+        default="AUTO",
+    )
+    render_dir: StringProperty(name="Output", subtype="DIR_PATH", default="//coverage")
+    render_workers: IntProperty(name="Workers", description="0 uses every core", min=0)
+    render_samples: IntProperty(name="Samples", min=1, default=16)
+
+
+def fit_camera(context):
+    # Apply the cached fit of the target for the rig's current angles, returns
+    # why the camera could not be fitted or None
+    from .coverage_analysis import fitted_view
+
+    settings = context.scene.camera_coverage
+    target = settings.selected_object
+    if not settings.auto_fit or target is None or target.type != "MESH":
+        return
+
+    camera = settings.camera
+    empty = settings.empty
+    render = context.scene.render
+    aspect = (render.resolution_x * render.pixel_aspect_x) / (
+        render.resolution_y * render.pixel_aspect_y
+    )
+    view = (
+        round(degrees(empty.rotation_euler[0]), 3),
+        round(degrees(empty.rotation_euler[2]), 3),
+    )
+    try:
+        scale, location = fitted_view(
+            target,
+            camera,
+            empty,
+            view,
+            aspect,
+            camera.data.sensor_fit,
+            settings.fit_margin / 100,
+        )
+    except ValueError as error:
+        return str(error)
+
+    camera.data.ortho_scale = scale
+    if settings.fit_center:
+        empty.location = location
+    if settings.keyframes_enable:
+        camera.data.keyframe_insert(
+            data_path="ortho_scale", frame=settings.keyframes_position
+        )
+        if settings.fit_center:
+            empty.keyframe_insert(
+                data_path="location", frame=settings.keyframes_position
+            )
 
 
 class TOOL_OT_initialize(Operator):
@@ -54,8 +168,8 @@ class TOOL_OT_initialize(Operator):
         context.scene.camera = camera_object
 
         # Set tool settings camera and empty
-        context.scene.settings.camera = camera_object
-        context.scene.settings.empty = empty_object
+        context.scene.camera_coverage.camera = camera_object
+        context.scene.camera_coverage.empty = empty_object
 
         bpy.ops.view3d.view_camera()
 
@@ -72,7 +186,7 @@ class TOOL_OT_set_target(Operator):
 
     @classmethod
     def poll(cls, context):
-        settings = context.scene.settings
+        settings = context.scene.camera_coverage
         return (
             settings.selected_object is not None
             and settings.camera is not None
@@ -81,7 +195,7 @@ class TOOL_OT_set_target(Operator):
         )
 
     def execute(self, context):
-        settings = context.scene.settings
+        settings = context.scene.camera_coverage
 
         selected_obj = settings.selected_object
         obj_location = selected_obj.location
@@ -103,11 +217,11 @@ class TOOL_OT_position_camera(Operator):
 
     @classmethod
     def poll(cls, context):
-        settings = context.scene.settings
+        settings = context.scene.camera_coverage
         return settings.camera is not None and settings.empty is not None
 
     def execute(self, context):
-        settings = context.scene.settings
+        settings = context.scene.camera_coverage
 
         empty = settings.empty
         empty.rotation_euler[0] = radians(self.angle)
@@ -115,6 +229,14 @@ class TOOL_OT_position_camera(Operator):
             empty.keyframe_insert(
                 data_path="rotation_euler", frame=settings.keyframes_position
             )
+        error = fit_camera(context)
+        if error:
+            self.report(
+                {"WARNING"},
+                "Empty x rotation set to %r, camera not fitted: %s"
+                % (self.angle, error),
+            )
+            return {"FINISHED"}
 
         self.report({"INFO"}, "Empty x rotation set to %r" % self.angle)
 
@@ -130,11 +252,11 @@ class TOOL_OT_rotate_camera(Operator):
 
     @classmethod
     def poll(cls, context):
-        settings = context.scene.settings
+        settings = context.scene.camera_coverage
         return settings.camera is not None and settings.empty is not None
 
     def execute(self, context):
-        settings = context.scene.settings
+        settings = context.scene.camera_coverage
 
         empty = settings.empty
         empty.rotation_euler[2] = radians(self.angle)
@@ -142,12 +264,227 @@ class TOOL_OT_rotate_camera(Operator):
             empty.keyframe_insert(
                 data_path="rotation_euler", frame=settings.keyframes_position
             )
+        error = fit_camera(context)
+        if error:
+            self.report(
+                {"WARNING"},
+                "Empty z rotation set to %r, camera not fitted: %s"
+                % (self.angle, error),
+            )
+            return {"FINISHED"}
 
         self.report({"INFO"}, "Empty z rotation set to %r" % self.angle)
 
         return {"FINISHED"}
 
 
+class TOOL_OT_bake_turntable(Operator):
+    bl_idname = "camera.bake_turntable"
+    bl_label = "Bake turntable"
+    bl_description = "Key every elevation and azimuth step on the empty"
+    bl_options = {"REGISTER", "UNDO"}
+
+    @classmethod
+    def poll(cls, context):
+        settings = context.scene.camera_coverage
+        return settings.camera is not None and settings.empty is not None
+
+    def execute(self, context):
+        from .keyframe_bake import turntable_schedule, bake_rotation
+
+        settings = context.scene.camera_coverage
+        scene = context.scene
+        frames, angles = turntable_schedule(
+            settings.bake_steps, settings.bake_spacing, scene.frame_start
+        )
+        count = bake_rotation(
+            settings.empty,
+            frames,
+            angles,
+            settings.bake_interpolation,
+            settings.bake_easing,
+        )
+        scene.frame_end = int(frames[-1])
+
+        self.report(
+            {"INFO"},
+            "Baked %d keys, frames %d-%d" % (count, frames[0], frames[-1]),
+        )
+        return {"FINISHED"}
+
+
+class TOOL_OT_plan_coverage(Operator):
+    bl_idname = "camera.plan_coverage"
+    bl_label = "Plan coverage"
+    bl_description = "Keyframe the fewest views covering the target's surface"
+    bl_options = {"REGISTER", "UNDO"}
+
+    @classmethod
+    def poll(cls, context):
+        settings = context.scene.camera_coverage
+        return (
+            context.mode == "OBJECT"
+            and settings.camera is not None
+            and settings.empty is not None
+            and settings.selected_object is not None
+            and settings.selected_object.type == "MESH"
+        )
+
+    def execute(self, context):
+        import numpy as np
+        from .coverage_analysis import plan_views
+        from .keyframe_bake import bake_rotation
+
+        start = time.perf_counter()
+        settings = context.scene.camera_coverage
+        empty = settings.empty
+        empty.location = settings.selected_object.location
+
+        try:
+            plan = plan_views(
+                settings.selected_object,
+                settings.camera,
+                empty,
+                settings.plan_step,
+                settings.plan_target / 100,
+            )
+        except ValueError as error:
+            self.report({"ERROR"}, str(error))
+            return {"CANCELLED"}
+
+        if plan["views"]:
+            frames = (
+                context.scene.frame_start
+                + np.arange(len(plan["views"])) * settings.plan_spacing
+            )
+            bake_rotation(empty, frames, np.array(plan["views"]), "CONSTANT")
+
+        self.report(
+            {"WARNING"} if plan["approximate"] else {"INFO"},
+            "%d views cover %.1f%% of the surface (%d candidates, %s, %.2fs)%s"
+            % (
+                len(plan["views"]),
+                plan["covered"],
+                plan["candidates"],
+                plan["method"],
+                time.perf_counter() - start,
+                (
+                    ", too dense to ray cast every candidate so views were picked"
+                    " on an approximation and may not be the fewest"
+                    if plan["approximate"]
+                    else ""
+                ),
+            ),
+        )
+        return {"FINISHED"}
+
+
+class TOOL_OT_render_coverage(Operator):
+    bl_idname = "camera.render_coverage"
+    bl_label = "Render coverage"
+    bl_description = "Render every position and rotation preset of the selected objects"
+
+    @classmethod
+    def poll(cls, context):
+        settings = context.scene.camera_coverage
+        return (
+            settings.camera is not None
+            and settings.empty is not None
+            and (context.selected_objects or settings.selected_object is not None)
+        )
+
+    def execute(self, context):
+        from .coverage_render import VIEWS, render_coverage
+
+        settings = context.scene.camera_coverage
+        targets = [o.name for o in context.selected_objects if o.type == "MESH"]
+        if not targets and settings.selected_object is not None:
+            targets = [settings.selected_object.name]
+
+        summary = render_coverage(
+            targets,
+            bpy.path.abspath(settings.render_dir),
+            settings.camera.name,
+            settings.empty.name,
+            settings.render_workers,
+            settings.render_samples,
+        )
+        if summary["failed"]:
+            self.report(
+                {"ERROR"},
+                "%d of %d views failed, see worker logs in %s"
+                % (
+                    len(summary["failed"]),
+                    len(targets) * len(VIEWS),
+                    settings.render_dir,
+                ),
+            )
+            return {"CANCELLED"}
+
+        self.report(
+            {"INFO"},
+            "Rendered %d views, %d unchanged, %d contact sheets in %.1fs"
+            % (
+                summary["rendered"],
+                summary["skipped"],
+                len(summary["sheets"]),
+                summary["seconds"],
+            ),
+        )
+        return {"FINISHED"}
+
+
+class TOOL_OT_analyze_coverage(Operator):
+    bl_idname = "camera.analyze_coverage"
+    bl_label = "Analyze coverage"
+    bl_description = "Ray-cast every preset view and store per-face visibility"
+    bl_options = {"REGISTER", "UNDO"}
+
+    @classmethod
+    def poll(cls, context):
+        settings = context.scene.camera_coverage
+        return (
+            context.mode == "OBJECT"
+            and settings.camera is not None
+            and settings.empty is not None
+            and any(o.type == "MESH" for o in context.selected_objects)
+        )
+
+    def execute(self, context):
+        from .coverage_render import VIEWS
+        from .coverage_analysis import (
+            preset_cameras,
+            face_visibility,
+            store_coverage,
+            coverage_summary,
+        )
+
+        settings = context.scene.camera_coverage
+        try:
+            cameras = preset_cameras(settings.camera, settings.empty)
+        except ValueError as error:
+            self.report({"ERROR"}, str(error))
+            return {"CANCELLED"}
+        ortho = settings.camera.data.type == "ORTHO"
+
+        results = []
+        for obj in context.selected_objects:
+            if obj.type != "MESH":
+                continue
+            visible, areas, faces = face_visibility(obj, cameras, ortho)
+            store_coverage(obj.data, visible, faces)
+            summary = coverage_summary(visible, areas)
+            obj["coverage_views"] = summary["views"]
+            obj["coverage_percent"] = summary["covered"]
+            results.append("%s %.1f%%" % (obj.name, summary["covered"]))
+
+        self.report(
+            {"INFO"},
+            "Surface covered by %d views: %s" % (len(VIEWS), ", ".join(results)),
+        )
+        return {"FINISHED"}
+
+
 class VIEW3D_PT_camera_coverage(Panel):
     bl_space_type = "VIEW_3D"
     bl_region_type = "UI"
@@ -160,7 +497,7 @@ class VIEW3D_PT_camera_coverage(Panel):
         layout.use_property_split = True
         layout.use_property_decorate = False  # No animation.
 
-        settings = context.scene.settings
+        settings = context.scene.camera_coverage
 
         box = layout.box()
         row = box.row()
@@ -190,6 +527,18 @@ class VIEW3D_PT_camera_coverage(Panel):
         row.enabled = settings.keyframes_enable
         row = box.row()
 
+        box = layout.box()
+        row = box.row()
+        row.alignment = "CENTER"
+        row.label(text="Turntable")
+        box.prop(settings, "bake_steps")
+        box.prop(settings, "bake_spacing")
+        box.prop(settings, "bake_interpolation")
+        row = box.row()
+        row.active = settings.bake_interpolation not in ("CONSTANT", "LINEAR", "BEZIER")
+        row.prop(settings, "bake_easing")
+        box.operator("camera.bake_turntable", text="Bake Turntable")
+
         box = layout.box()
         row = box.row()
         row.alignment = "CENTER"
@@ -218,14 +567,49 @@ class VIEW3D_PT_camera_coverage(Panel):
         box = layout.box()
         row = box.row()
         row.prop(cam, "ortho_scale")
+        row.enabled = not settings.auto_fit
+        row = box.row()
+        row.prop(settings, "auto_fit")
+        sub = row.row()
+        sub.active = settings.auto_fit
+        sub.prop(settings, "fit_center")
+        row = box.row()
+        row.active = settings.auto_fit
+        row.prop(settings, "fit_margin")
+
+        box = layout.box()
+        row = box.row()
+        row.alignment = "CENTER"
+        row.label(text="Coverage Analysis", icon="HIDE_OFF")
+        box.operator("camera.analyze_coverage", text="Analyze Selected")
+        obj = context.active_object
+        if obj is not None and "coverage_percent" in obj:
+            box.label(text="%s: %.1f%% covered" % (obj.name, obj["coverage_percent"]))
+        box.prop(settings, "plan_step")
+        box.prop(settings, "plan_target")
+        box.prop(settings, "plan_spacing")
+        box.operator("camera.plan_coverage", text="Plan Views")
+
+        box = layout.box()
+        row = box.row()
+        row.alignment = "CENTER"
+        row.label(text="Coverage Renders", icon="RENDER_STILL")
+        box.prop(settings, "render_dir")
+        box.prop(settings, "render_workers")
+        box.prop(settings, "render_samples")
+        box.operator("camera.render_coverage", text="Render All Views")
 
 
 classes = (
-    ToolSettings,
+    CoverageSettings,
     TOOL_OT_initialize,
     TOOL_OT_set_target,
     TOOL_OT_position_camera,
     TOOL_OT_rotate_camera,
+    TOOL_OT_bake_turntable,
+    TOOL_OT_analyze_coverage,
+    TOOL_OT_plan_coverage,
+    TOOL_OT_render_coverage,
     VIEW3D_PT_camera_coverage,
 )
 
@@ -233,10 +617,11 @@ classes = (
 def register():
     from bpy.utils import register_class
 
+    instrumentation.register()
     for cls in classes:
-        register_class(cls)
+        register_class(instrumentation.instrument(cls))
 
-    Scene.settings = PointerProperty(type=ToolSettings)
+    Scene.camera_coverage = PointerProperty(type=CoverageSettings)
 
 
 def unregister():
@@ -244,9 +629,6 @@ def unregister():
 
     for cls in reversed(classes):
         unregister_class(cls)
+    instrumentation.unregister()
 
-    del Scene.settings
-
-
-if __name__ == "__main__":
-    register()
+    del Scene.camera_coverage
@@ -0,0 +1,294 @@
+import numpy as np
+
+# uv_smooth modes of the SUBSURF modifier this evaluator reproduces, mapped to
+# the rule used for UV island boundaries (None interpolates everything)
+UV_RULES = {"NONE": None, "PRESERVE_BOUNDARIES": "linear", "SMOOTH_ALL": "smooth"}
+
+
+def loop_topology(loop_verts, loop_start, loop_total):
+    # Face of every loop, the loop after it in its face and the edge from its
+    # vertex to the next one, edges numbered by sorted vertex pair
+    loop_face = np.repeat(np.arange(len(loop_start)), loop_total)
+    loop_next = np.arange(len(loop_verts)) + 1
+    face_end = (loop_start + loop_total)[loop_face]
+    loop_next[loop_next == face_end] = loop_start[loop_face][loop_next == face_end]
+
+    a = loop_verts.astype(np.int64)
+    b = a[loop_next]
+    keys = np.minimum(a, b) * (a.max(initial=0) + 1) + np.maximum(a, b)
+    _, first, loop_edge = np.unique(keys, return_index=True, return_inverse=True)
+    edges = np.column_stack([np.minimum(a, b)[first], np.maximum(a, b)[first]])
+    return loop_face, loop_next, loop_edge.ravel(), edges
+
+
+def refine(values, loop_verts, loop_start, loop_total, rule="smooth", corners=False):
+    # One Catmull-Clark step. rule is "smooth" for the usual boundary curves,
+    # "linear" to keep boundaries piecewise linear or None to interpolate
+    # everything bilinearly. corners keeps boundary vertices with one face
+    # sharp. Returns the new values and quad loops, four per old loop.
+    num_verts = len(values)
+    num_faces = len(loop_start)
+    loop_face, loop_next, loop_edge, edges = loop_topology(
+        loop_verts, loop_start, loop_total
+    )
+    loop_prev = np.empty_like(loop_next)
+    loop_prev[loop_next] = np.arange(len(loop_next))
+
+    face_points = np.zeros((num_faces, values.shape[1]))
+    np.add.at(face_points, loop_face, values[loop_verts])
+    face_points /= loop_total[:, None]
+
+    edge_faces = np.bincount(loop_edge, minlength=len(edges))
+    midpoints = values[edges].mean(axis=1)
+    edge_points = midpoints.copy()
+    interior = edge_faces == 2
+    if rule is not None:
+        face_sums = np.zeros_like(midpoints)
+        np.add.at(face_sums, loop_edge, face_points[loop_face])
+        edge_points[interior] = (2 * midpoints[interior] + face_sums[interior]) / 4
+
+    vert_points = values.astype(np.float64)
+    if rule is not None:
+        boundary = edges[~interior]
+        boundary_count = np.bincount(boundary.ravel(), minlength=num_verts)
+
+        valence = np.bincount(edges.ravel(), minlength=num_verts)
+        face_sum = np.zeros_like(vert_points)
+        np.add.at(face_sum, loop_verts, face_points[loop_face])
+        face_count = np.bincount(loop_verts, minlength=num_verts)
+        mid_sum = np.zeros_like(vert_points)
+        np.add.at(mid_sum, edges[:, 0], midpoints)
+        np.add.at(mid_sum, edges[:, 1], midpoints)
+
+        smooth = (boundary_count == 0) & (valence > 2) & (face_count == valence)
+        n = valence[smooth, None]
+        vert_points[smooth] = (
+            face_sum[smooth] / face_count[smooth, None]
+            + 2 * mid_sum[smooth] / n
+            + (n - 3) * values[smooth]
+        ) / n
+
+        if rule == "smooth":
+            curve = boundary_count == 2
+            if corners:
+                curve &= face_count > 1
+            neighbour_sum = np.zeros_like(vert_points)
+            np.add.at(neighbour_sum, boundary[:, 0], values[boundary[:, 1]])
+            np.add.at(neighbour_sum, boundary[:, 1], values[boundary[:, 0]])
+            vert_points[curve] = (neighbour_sum[curve] + 6 * values[curve]) / 8
+
+    # Vertex points, then edge points, then face points
+    edge_offset = num_verts
+    face_offset = num_verts + len(edges)
+    quads = np.column_stack(
+        [
+            loop_verts,
+            edge_offset + loop_edge,
+            face_offset + loop_face,
+            edge_offset + loop_edge[loop_prev],
+        ]
+    ).ravel()
+    refined = np.concatenate([vert_points, edge_points, face_points])
+    return refined, quads, loop_face
+
+
+def limit(values, loop_verts, rule="smooth", corners=False):
+    # Push the vertices of an all-quad mesh onto the limit surface
+    num_verts = len(values)
+    quads = loop_verts.reshape(-1, 4)
+    loop_next = quads[:, [1, 2, 3, 0]].ravel()
+    loop_opposite = quads[:, [2, 3, 0, 1]].ravel()
+
+    edge_sum = np.zeros_like(values)
+    np.add.at(edge_sum, loop_verts, values[loop_next])
+    diagonal_sum = np.zeros_like(values)
+    np.add.at(diagonal_sum, loop_verts, values[loop_opposite])
+    n = np.bincount(loop_verts, minlength=num_verts)
+
+    # Edges used by a single quad form the boundary
+    a = loop_verts
+    b = loop_next
+    keys, counts = np.unique(
+        np.minimum(a, b) * (num_verts + 1) + np.maximum(a, b), return_counts=True
+    )
+    open_edges = np.column_stack(divmod(keys[counts != 2], num_verts + 1))
+    boundary_count = np.bincount(open_edges.ravel(), minlength=num_verts)
+
+    result = values.copy()
+    interior = (boundary_count == 0) & (n > 0)
+    k = n[interior, None]
+    result[interior] = (
+        k * k * values[interior] + 4 * edge_sum[interior] + diagonal_sum[interior]
+    ) / (k * (k + 5))
+
+    if rule == "smooth":
+        curve = boundary_count == 2
+        if corners:
+            curve &= n > 1
+        neighbour_sum = np.zeros_like(values)
+        np.add.at(neighbour_sum, open_edges[:, 0], values[open_edges[:, 1]])
+        np.add.at(neighbour_sum, open_edges[:, 1], values[open_edges[:, 0]])
+        result[curve] = (neighbour_sum[curve] + 4 * values[curve]) / 6
+
+    return result
+
+
+def face_varying(loop_verts, uv):
+    # Weld corners that share both vertex and UV into one face-varying vertex
+    uv = uv.astype(np.float32) + np.float32(0)
+    rows = np.column_stack([loop_verts.view(np.int32), uv.view(np.int32)])
+    keys = np.ascontiguousarray(rows).view(np.dtype((np.void, 12))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return uv[first].astype(np.float64), inverse.ravel()
+
+
+def subdivide_arrays(
+    arrays,
+    levels=1,
+    use_limit_surface=True,
+    uv_smooth="PRESERVE_BOUNDARIES",
+    boundary_smooth="ALL",
+):
+    # Catmull-Clark subdivision of mesh arrays in the read_mesh_arrays layout,
+    # matching the SUBSURF modifier for meshes without creases
+    corners = boundary_smooth == "PRESERVE_CORNERS"
+    uv_rule = UV_RULES[uv_smooth]
+
+    co = arrays["co"].astype(np.float64)
+    loop_verts = arrays["loop_verts"].astype(np.int64)
+    loop_start = arrays["loop_start"].astype(np.int64)
+    loop_total = arrays["loop_total"].astype(np.int64)
+    uv_loops = {}
+    for name, uv in arrays["uvs"].items():
+        uv_loops[name] = face_varying(loop_verts.astype(np.int32), uv)
+    faces = np.arange(len(loop_start))
+
+    for _ in range(levels):
+        co, new_loops, loop_face = refine(
+            co, loop_verts, loop_start, loop_total, corners=corners
+        )
+        for name, (uv, uv_verts) in uv_loops.items():
+            uv, uv_verts, _ = refine(uv, uv_verts, loop_start, loop_total, uv_rule)
+            uv_loops[name] = uv, uv_verts
+        faces = faces[loop_face]
+        loop_verts = new_loops
+        loop_total = np.full(len(loop_verts) // 4, 4)
+        loop_start = np.arange(0, len(loop_verts), 4)
+
+    if levels and use_limit_surface:
+        co = limit(co, loop_verts, corners=corners)
+        if uv_rule is not None:
+            for name, (uv, uv_verts) in uv_loops.items():
+                uv_loops[name] = limit(uv, uv_verts, uv_rule), uv_verts
+
+    _, _, _, edges = loop_topology(loop_verts, loop_start, loop_total)
+    return {
+        "co": co.astype(np.float32),
+        "edges": edges.astype(np.int32),
+        "loop_verts": loop_verts.astype(np.int32),
+        "loop_start": loop_start.astype(np.int32),
+        "loop_total": loop_total.astype(np.int32),
+        "material_index": arrays["material_index"][faces],
+        "use_smooth": arrays["use_smooth"][faces],
+        "uvs": {
+            name: uv[uv_verts].astype(np.float32)
+            for name, (uv, uv_verts) in uv_loops.items()
+        },
+    }
+
+
+def corner_normals(arrays):
+    # Angle weighted vertex normals on smooth faces, face normals on flat ones
+    co = arrays["co"].astype(np.float64)
+    loop_verts = arrays["loop_verts"]
+    loop_face, loop_next, _, _ = loop_topology(
+        loop_verts, arrays["loop_start"], arrays["loop_total"]
+    )
+    loop_prev = np.empty_like(loop_next)
+    loop_prev[loop_next] = np.arange(len(loop_next))
+
+    # Newell's method, exact for planar faces and stable for warped ones
+    current = co[loop_verts]
+    following = co[loop_verts[loop_next]]
+    face_normals = np.zeros((len(arrays["loop_start"]), 3))
+    np.add.at(face_normals, loop_face, np.cross(current, following))
+    face_normals /= np.maximum(np.linalg.norm(face_normals, axis=1), 1e-30)[:, None]
+
+    to_next = following - current
+    to_prev = co[loop_verts[loop_prev]] - current
+    cosine = np.einsum("ij,ij->i", to_next, to_prev) / np.maximum(
+        np.linalg.norm(to_next, axis=1) * np.linalg.norm(to_prev, axis=1), 1e-30
+    )
+    angles = np.arccos(np.clip(cosine, -1.0, 1.0))
+
+    vertex_normals = np.zeros_like(co)
+    np.add.at(vertex_normals, loop_verts, face_normals[loop_face] * angles[:, None])
+    vertex_normals /= np.maximum(np.linalg.norm(vertex_normals, axis=1), 1e-30)[:, None]
+
+    smooth = arrays["use_smooth"][loop_face]
+    normals = np.where(
+        smooth[:, None], vertex_normals[loop_verts], face_normals[loop_face]
+    )
+    return normals.astype(np.float32)
+
+
+def export_loops(arrays, uv_name=None):
+    # Per-corner attributes in the layout glb_writer.read_mesh_loops returns,
+    # quads split along their first diagonal like Blender's loop triangles
+    loop_start = arrays["loop_start"]
+    loop_total = arrays["loop_total"]
+    fans = np.repeat(loop_start, loop_total - 2)
+    offsets = np.arange(len(fans)) - np.repeat(
+        np.cumsum(loop_total - 2) - (loop_total - 2), loop_total - 2
+    )
+    tri_loops = np.column_stack([fans, fans + offsets + 1, fans + offsets + 2])
+    faces = np.repeat(np.arange(len(loop_start)), loop_total - 2)
+
+    return {
+        "positions": arrays["co"][arrays["loop_verts"]].astype(np.float32),
+        "normals": corner_normals(arrays),
+        "uvs": arrays["uvs"][uv_name] if uv_name is not None else None,
+        "tri_loops": tri_loops.astype(np.int32),
+        "tri_material": arrays["material_index"][faces].astype(np.int32),
+    }
+
+
+def subsurf_modifier(obj):
+    # The object's modifier when it is a lone subdivision this evaluator can
+    # reproduce, otherwise None
+    if len(obj.modifiers) != 1 or obj.modifiers[0].type != "SUBSURF":
+        return None
+    modifier = obj.modifiers[0]
+    if not modifier.show_viewport or modifier.levels > 2:
+        return None
+    if getattr(modifier, "subdivision_type", "CATMULL_CLARK") != "CATMULL_CLARK":
+        return None
+    if modifier.uv_smooth not in UV_RULES:
+        return None
+    if modifier.boundary_smooth not in ("ALL", "PRESERVE_CORNERS"):
+        return None
+
+    # corner_normals only knows smooth and flat faces, anything else that
+    # shapes the modifier's normals goes through the depsgraph
+    mesh = obj.data
+    if mesh.shape_keys is not None or mesh.has_custom_normals:
+        return None
+    if getattr(mesh, "use_auto_smooth", False):
+        return None
+    sharp_edges = np.empty(len(mesh.edges), dtype=bool)
+    mesh.edges.foreach_get("use_edge_sharp", sharp_edges)
+    if sharp_edges.any():
+        return None
+    # Smooth corners next to flat faces only average their own smooth fan
+    smooth = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get("use_smooth", smooth)
+    if smooth.any() and not smooth.all():
+        return None
+    for name in ("crease_edge", "crease_vert"):
+        crease = mesh.attributes.get(name)
+        if crease is not None:
+            values = np.empty(len(crease.data), dtype=np.float32)
+            crease.data.foreach_get("value", values)
+            if values.any():
+                return None
+    return modifier
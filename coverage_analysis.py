@@ -0,0 +1,471 @@
+import bpy
+import hashlib
+from contextlib import contextmanager
+from math import radians
+
+import bmesh
+import numpy as np
+from mathutils import Euler, Matrix
+from mathutils.bvhtree import BVHTree
+from mathutils.kdtree import KDTree
+
+from .coverage_render import VIEWS
+
+ATTRIBUTE = "coverage"
+
+# World space BVH per object name, rebuilt only when its hash changes
+bvh_cache = {}
+
+
+@contextmanager
+def evaluated_mesh(obj):
+    # The mesh with obj's modifiers applied, freed on exit
+    evaluated = obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
+    try:
+        yield evaluated.to_mesh()
+    finally:
+        evaluated.to_mesh_clear()
+
+
+def world_geometry(obj):
+    # World space vertices, loop topology and face centers and normals of the
+    # evaluated mesh, so Subdivision, Mirror and the like occlude as rendered
+    with evaluated_mesh(obj) as mesh:
+        return mesh_geometry(mesh, np.array(obj.matrix_world))
+
+
+def mesh_geometry(mesh, matrix):
+    normal_matrix = np.linalg.inv(matrix[:3, :3]).T
+
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+    loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+
+    centers = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("center", centers)
+    centers = centers.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+    normals = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("normal", normals)
+    normals = normals.reshape(-1, 3) @ normal_matrix.T
+    normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-30)[:, None]
+
+    # Areas in world space, so scaled objects weigh correctly
+    face = np.repeat(np.arange(len(loop_start)), loop_total)
+    following = np.arange(len(loop_verts)) + 1
+    end = (loop_start + loop_total)[face]
+    following[following == end] = loop_start[face][following == end]
+    cross = np.zeros((len(loop_start), 3))
+    np.add.at(cross, face, np.cross(co[loop_verts], co[loop_verts[following]]))
+    areas = np.linalg.norm(cross, axis=1) / 2
+
+    return {
+        "co": co,
+        "loop_verts": loop_verts,
+        "loop_start": loop_start,
+        "loop_total": loop_total,
+        "centers": centers,
+        "normals": normals,
+        "areas": areas,
+    }
+
+
+def geometry_hash(geometry):
+    digest = hashlib.blake2b(digest_size=16)
+    for key in ("co", "loop_verts", "loop_total"):
+        digest.update(np.ascontiguousarray(geometry[key]).data)
+    return digest.hexdigest()
+
+
+def object_bvh(obj, geometry):
+    key = geometry_hash(geometry)
+    cached = bvh_cache.get(obj.name)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    polygons = np.split(geometry["loop_verts"], geometry["loop_start"][1:])
+    tree = BVHTree.FromPolygons(
+        geometry["co"].tolist(), [p.tolist() for p in polygons], all_triangles=False
+    )
+    bvh_cache[obj.name] = (key, tree)
+    return tree
+
+
+def preset_cameras(camera, empty, views=VIEWS):
+    # World position and forward direction of the camera at every preset
+    local = camera.matrix_parent_inverse @ camera.matrix_basis
+    cameras = []
+    for elevation, azimuth in views:
+        rotation = Euler(empty.rotation_euler)
+        rotation[0] = radians(elevation)
+        rotation[2] = radians(azimuth)
+        matrix = Matrix.Translation(empty.location) @ rotation.to_matrix().to_4x4()
+        position = (matrix @ local).translation
+        forward = empty.location - position
+        if forward.length < 1e-9:
+            raise ValueError("Camera sits on the empty, move it away to aim")
+        cameras.append((np.array(position), np.array(forward.normalized())))
+    return cameras
+
+
+def base_faces(obj, geometry):
+    # Nearest evaluated face of every face of obj.data, None when modifiers
+    # kept the face count and the faces already line up
+    mesh = obj.data
+    if len(mesh.polygons) == len(geometry["centers"]):
+        return None
+
+    matrix = np.array(obj.matrix_world)
+    centers = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("center", centers)
+    centers = centers.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+
+    tree = KDTree(len(geometry["centers"]))
+    for index, center in enumerate(geometry["centers"].tolist()):
+        tree.insert(center, index)
+    tree.balance()
+    return np.array([tree.find(center)[1] for center in centers.tolist()], dtype=int)
+
+
+def face_visibility(obj, cameras, ortho=True):
+    # Visibility and areas of the evaluated faces, plus the evaluated face
+    # standing in for each face of obj.data
+    geometry = world_geometry(obj)
+    tree = object_bvh(obj, geometry)
+    visible = ray_visibility(tree, geometry, cameras, ortho)
+    return visible, geometry["areas"], base_faces(obj, geometry)
+
+
+def ray_visibility(tree, geometry, cameras, ortho=True):
+    # Boolean matrix of views by faces: the face points at the camera and the
+    # ray from its center to the camera is unobstructed. Rays are built per
+    # view in one batch, only faces facing the camera are cast.
+    centers = geometry["centers"]
+    normals = geometry["normals"]
+    extent = np.ptp(geometry["co"], axis=0).max() if len(geometry["co"]) else 1.0
+    origins = centers + normals * max(extent, 1e-6) * 1e-5
+
+    visible = np.zeros((len(cameras), len(centers)), dtype=bool)
+    for view, (position, forward) in enumerate(cameras):
+        if ortho:
+            directions = np.broadcast_to(-forward, centers.shape)
+            distances = np.full(len(centers), 1e30)
+        else:
+            directions = position - centers
+            distances = np.linalg.norm(directions, axis=1)
+            directions = directions / np.maximum(distances, 1e-30)[:, None]
+
+        # BVHTree has no batched cast, so rays go one call each. ray_cast
+        # takes plain sequences, which saves building two Vectors per ray.
+        facing = np.flatnonzero(np.einsum("ij,ij->i", normals, directions) > 0)
+        ray_cast = tree.ray_cast
+        for index, origin, direction, distance in zip(
+            facing.tolist(),
+            origins[facing].tolist(),
+            directions[facing].tolist(),
+            distances[facing].tolist(),
+        ):
+            if ray_cast(origin, direction, distance)[0] is None:
+                visible[view, index] = True
+
+    return visible
+
+
+def store_coverage(mesh, visible, faces=None):
+    # Fraction of the presets that see each face, as a float face attribute.
+    # faces picks the evaluated face for each face of mesh.
+    if faces is not None:
+        visible = visible[:, faces]
+    attribute = mesh.attributes.get(ATTRIBUTE)
+    if attribute is not None and (
+        attribute.domain != "FACE" or attribute.data_type != "FLOAT"
+    ):
+        mesh.attributes.remove(attribute)
+        attribute = None
+    if attribute is None:
+        attribute = mesh.attributes.new(ATTRIBUTE, "FLOAT", "FACE")
+    attribute.data.foreach_set("value", visible.mean(axis=0).astype(np.float32))
+    mesh.update()
+
+
+def coverage_summary(visible, areas):
+    # Percentage of the surface area seen by each view and by any view
+    total = max(areas.sum(), 1e-30)
+    return {
+        "views": (visible @ areas / total * 100).tolist(),
+        "covered": float(areas[visible.any(axis=0)].sum() / total * 100),
+        "unseen_faces": int((~visible.any(axis=0)).sum()),
+    }
+
+
+def candidate_views(step):
+    # Rig angles spaced about step degrees apart over the whole sphere, with
+    # fewer azimuths towards the poles
+    views = []
+    for elevation in np.arange(-90.0, 90.0 + step / 2, step):
+        count = max(1, int(round(360.0 * np.cos(np.radians(elevation)) / step)))
+        views += [(float(elevation), 360.0 * i / count) for i in range(count)]
+    return views
+
+
+def fan_triangles(geometry):
+    # Vertex indices of every face split into a fan of triangles
+    loop_start = geometry["loop_start"]
+    loop_total = geometry["loop_total"]
+    fans = np.repeat(loop_start, loop_total - 2)
+    offsets = np.arange(len(fans)) - np.repeat(
+        np.cumsum(loop_total - 2) - (loop_total - 2), loop_total - 2
+    )
+    corners = np.column_stack([fans, fans + offsets + 1, fans + offsets + 2])
+    return geometry["loop_verts"][corners]
+
+
+def rasterize(points, depth, triangles, shape, chunk=1 << 22):
+    # Nearest depth of the triangles covering each cell center, points are in
+    # cell units. Cells are expanded per triangle in chunks to bound memory.
+    nearest = np.full(shape[0] * shape[1], np.inf)
+    corners = points[triangles]
+    low = np.maximum(np.ceil(corners.min(axis=1) - 0.5), 0).astype(np.int64)
+    high = np.minimum(np.floor(corners.max(axis=1) - 0.5), np.array(shape) - 1).astype(
+        np.int64
+    )
+    spans = np.maximum(high - low + 1, 0)
+    counts = spans[:, 0] * spans[:, 1]
+
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    first = 0
+    while first < len(triangles):
+        # As many triangles as fit in one chunk of cells, at least one
+        last = int(np.searchsorted(offsets, offsets[first] + chunk, side="right")) - 1
+        last = min(max(last, first + 1), len(triangles))
+        batch = np.arange(first, last)
+        tri = np.repeat(batch, counts[batch])
+        local = np.arange(len(tri)) - np.repeat(
+            offsets[batch] - offsets[first], counts[batch]
+        )
+        x = low[tri, 0] + local // spans[tri, 1]
+        y = low[tri, 1] + local % spans[tri, 1]
+
+        a, b, c = corners[tri, 0], corners[tri, 1], corners[tri, 2]
+        ab = b - a
+        ac = c - a
+        ap = np.column_stack([x + 0.5, y + 0.5]) - a
+        area = ab[:, 0] * ac[:, 1] - ac[:, 0] * ab[:, 1]
+        safe = np.where(area == 0, 1.0, area)
+        w1 = (ap[:, 0] * ac[:, 1] - ac[:, 0] * ap[:, 1]) / safe
+        w2 = (ab[:, 0] * ap[:, 1] - ap[:, 0] * ab[:, 1]) / safe
+        w0 = 1.0 - w1 - w2
+        inside = (area != 0) & (w0 >= -1e-9) & (w1 >= -1e-9) & (w2 >= -1e-9)
+
+        vertices = triangles[tri]
+        z = depth[vertices[:, 0]] * w0
+        z += depth[vertices[:, 1]] * w1 + depth[vertices[:, 2]] * w2
+        ids = x * shape[1] + y
+        np.minimum.at(nearest, ids[inside], z[inside])
+        first = last
+
+    return nearest
+
+
+def depth_visibility(geometry, cameras, cell=None, max_cells=1024):
+    # Orthographic visibility from a coarse depth buffer per view. Triangles
+    # are rasterized at cell centers and vertices and face centers splatted,
+    # so faces smaller than a cell still occlude. Approximate but linear in
+    # the face count, for targets too dense to ray cast every candidate.
+    centers = geometry["centers"]
+    normals = geometry["normals"]
+    co = geometry["co"]
+    triangles = fan_triangles(geometry)
+    occluders = np.concatenate([centers, co])
+    extent = np.ptp(co, axis=0).max() if len(co) else 1.0
+    if cell is None:
+        cell = 2.0 * np.sqrt(max(np.median(geometry["areas"]), 1e-12))
+    cell = max(cell, extent / max_cells, 1e-9)
+
+    visible = np.zeros((len(cameras), len(centers)), dtype=bool)
+    for view, (_, forward) in enumerate(cameras):
+        helper = [0.0, 0.0, 1.0] if abs(forward[2]) < 0.9 else [1.0, 0.0, 0.0]
+        u = np.cross(forward, helper)
+        u /= np.linalg.norm(u)
+        v = np.cross(forward, u)
+        basis = np.column_stack([u, v])
+
+        origin = occluders @ basis
+        origin = origin.min(axis=0)
+        points = (co @ basis - origin) / cell
+        shape = tuple(np.floor(points.max(axis=0)).astype(np.int64) + 1)
+        nearest = rasterize(points, co @ forward, triangles, shape)
+
+        cells = np.floor((occluders @ basis - origin) / cell).astype(np.int64)
+        cells = np.minimum(cells, np.array(shape) - 1)
+        ids = cells[:, 0] * shape[1] + cells[:, 1]
+        depth = occluders @ forward
+        np.minimum.at(nearest, ids, depth)
+
+        face_ids = ids[: len(centers)]
+        facing = normals @ forward < 0
+        visible[view] = facing & (depth[: len(centers)] <= nearest[face_ids] + cell)
+
+    return visible
+
+
+def greedy_cover(visible, weights, target):
+    # Weighted set cover: repeatedly take the view that sees the most still
+    # uncovered area until target of the coverable area is reached
+    coverable = weights[visible.any(axis=0)].sum()
+    matrix = visible.astype(np.float32)
+    remaining = weights.astype(np.float32) * visible.any(axis=0)
+    chosen = []
+    covered = 0.0
+    while coverable > 0 and covered < target * coverable:
+        gains = matrix @ remaining
+        best = int(np.argmax(gains))
+        if gains[best] <= 0:
+            break
+        chosen.append(best)
+        covered += float(gains[best])
+        remaining[visible[best]] = 0.0
+    return chosen, covered / max(weights.sum(), 1e-30)
+
+
+def plan_views(obj, camera, empty, step=10.0, target=0.99, ray_budget=200000):
+    # Smallest greedy set of rig angles covering target of the surface area
+    # any candidate sees. Exact ray casts while they fit in ray_budget, the
+    # depth buffer approximation beyond, with the chosen views ray cast.
+    views = candidate_views(step)
+    cameras = preset_cameras(camera, empty, views)
+    geometry = world_geometry(obj)
+
+    tree = object_bvh(obj, geometry)
+    approximate = len(views) * len(geometry["centers"]) > ray_budget
+    if approximate:
+        visible = depth_visibility(geometry, cameras)
+        method = "depth buffer"
+    else:
+        visible = ray_visibility(tree, geometry, cameras)
+        method = "ray cast"
+
+    chosen, covered = greedy_cover(visible, geometry["areas"], target)
+    if approximate and chosen:
+        # The depth buffer only picks the views, their coverage is measured
+        # with exact rays so the reported figure is never optimistic
+        exact = ray_visibility(tree, geometry, [cameras[i] for i in chosen])
+        areas = geometry["areas"]
+        covered = areas[exact.any(axis=0)].sum() / max(areas.sum(), 1e-30)
+        method = "depth buffer, confirmed by ray cast"
+
+    return {
+        "views": [views[i] for i in chosen],
+        "covered": covered * 100,
+        "candidates": len(views),
+        "method": method,
+        "approximate": approximate,
+    }
+
+
+# Local hull vertices per object name, and ortho fits per rig angle
+hull_cache = {}
+fit_cache = {}
+
+
+def fit_points(obj, max_points=2000):
+    # World space points that bound the evaluated object, reduced to the
+    # convex hull for dense meshes. The hull is cached by the evaluated mesh
+    # content, only the transform is applied per call.
+    with evaluated_mesh(obj) as mesh:
+        co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", co)
+        key = hashlib.blake2b(co.data, digest_size=16).hexdigest()
+
+        cached = hull_cache.get(obj.name)
+        if cached is not None and cached[0] == key:
+            points = cached[1]
+        else:
+            points = co.reshape(-1, 3)
+            if len(points) > max_points:
+                bm = bmesh.new()
+                bm.from_mesh(mesh)
+                hull = bmesh.ops.convex_hull(bm, input=bm.verts)
+                points = np.array(
+                    [v.co for v in hull["geom"] if isinstance(v, bmesh.types.BMVert)],
+                    dtype=np.float32,
+                )
+                bm.free()
+            hull_cache[obj.name] = (key, points)
+
+    matrix = np.array(obj.matrix_world)
+    return points @ matrix[:3, :3].T + matrix[:3, 3], key
+
+
+def camera_basis(forward):
+    # Right and up axes of a camera tracking with world Z up, as TRACK_TO does
+    helper = np.array([0.0, 0.0, 1.0])
+    if abs(forward @ helper) > 0.999:
+        helper = np.array([0.0, 1.0, 0.0])
+    right = np.cross(forward, helper)
+    right /= np.linalg.norm(right)
+    return right, np.cross(right, forward)
+
+
+def fit_views(points, cameras, anchor, aspect, sensor_fit="AUTO", margin=0.05):
+    # Tight ortho_scale and the empty location that centers the projected
+    # bounds, keeping the anchor's depth, for every camera in one projection
+    # of all points
+    bases = [camera_basis(forward) for _, forward in cameras]
+    axes = np.array([axis for basis in bases for axis in basis])
+    projected = points @ axes.T
+    low = projected.min(axis=0).reshape(-1, 2)
+    high = projected.max(axis=0).reshape(-1, 2)
+    width, height = (high - low).T * (1 + margin)
+
+    if sensor_fit == "HORIZONTAL" or (sensor_fit == "AUTO" and aspect >= 1):
+        scales = np.maximum(width, height * aspect)
+    else:
+        scales = np.maximum(height, width / aspect)
+
+    centers = np.einsum("vk,vkj->vj", (low + high) / 2, axes.reshape(-1, 2, 3))
+    forwards = np.array([forward for _, forward in cameras])
+    locations = centers + forwards * (forwards @ anchor)[:, None]
+    return scales, locations
+
+
+def fitted_view(obj, camera, empty, view, aspect, sensor_fit, margin):
+    # Cached (ortho_scale, empty location) of obj for rig angles view, all
+    # presets are fitted at once whenever the object changed
+    points, key = fit_points(obj)
+    anchor = np.array(obj.matrix_world.translation)
+    key += repr(
+        (
+            np.array(obj.matrix_world).tolist(),
+            np.array(camera.matrix_basis).tolist(),
+            np.array(camera.matrix_parent_inverse).tolist(),
+            empty.rotation_euler[1],
+            aspect,
+            sensor_fit,
+            margin,
+        )
+    )
+    cached = fit_cache.get(obj.name)
+    if cached is None or cached[0] != key:
+        cached = (key, {})
+        views = list(VIEWS)
+        cameras = preset_cameras(camera, empty, views)
+        scales, locations = fit_views(
+            points, cameras, anchor, aspect, sensor_fit, margin
+        )
+        cached[1].update(zip(views, zip(scales, locations)))
+        fit_cache[obj.name] = cached
+
+    fits = cached[1]
+    if view not in fits:
+        cameras = preset_cameras(camera, empty, [view])
+        scales, locations = fit_views(
+            points, cameras, anchor, aspect, sensor_fit, margin
+        )
+        fits[view] = scales[0], locations[0]
+    return fits[view]
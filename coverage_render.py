@@ -0,0 +1,370 @@
+"""Turntable coverage renders of the camera_coverage rig.
+
+Renders every elevation and azimuth preset for one or more target objects
+with Cycles on the CPU, spread over background Blender processes, and tiles
+each target's views into a contact sheet:
+
+    blender -b SCENE.blend --python coverage_render.py -- OUTPUT_DIR \\
+        [--targets NAME ...] [--jobs N] [--samples N]
+
+Views whose scene state hash matches the one recorded in OUTPUT_DIR/coverage.json
+are not rendered again.
+"""
+
+import bpy
+import os
+import sys
+import importlib
+import json
+import argparse
+import hashlib
+import tempfile
+import time
+import numpy as np
+from math import radians
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+if not __package__:
+    # Render workers and the command line start this file by path, import
+    # the add-on package first so the relative imports resolve
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+    __package__ = os.path.basename(PACKAGE_DIR)
+    importlib.import_module(__package__)
+
+from .mesh_arrays import balance_chunks
+from .worker_pool import blender_command, run_jobs
+
+# Same presets as the camera_coverage panel buttons, sheet rows and columns
+ELEVATIONS = (-45.0, 0.0, 45.0)
+AZIMUTHS = (0.0, 45.0, 90.0, 135.0, 180.0, 225.0, 270.0, 315.0)
+VIEWS = [(e, a) for e in ELEVATIONS for a in AZIMUTHS]
+
+MANIFEST = "coverage.json"
+
+
+def view_name(target, elevation, azimuth):
+    return "%s_e%+04d_a%03d.png" % (bpy.path.clean_name(target), elevation, azimuth)
+
+
+# Editor-only properties of nodes and modifiers, which don't change a render
+LAYOUT_PROPERTIES = {
+    "rna_type",
+    "location",
+    "width",
+    "height",
+    "dimensions",
+    "select",
+    "hide",
+    "show_expanded",
+    "show_options",
+    "show_preview",
+    "is_active",
+}
+
+
+def rna_values(struct):
+    # Settings of an RNA struct as a repr-able tuple, pointers by name
+    values = []
+    for prop in struct.bl_rna.properties:
+        if prop.identifier in LAYOUT_PROPERTIES or prop.type == "COLLECTION":
+            continue
+        value = getattr(struct, prop.identifier)
+        if prop.type == "POINTER":
+            value = getattr(value, "name", None) if value is not None else None
+        elif getattr(prop, "array_length", 0):
+            value = tuple(value)
+        elif isinstance(value, set):
+            # Enum flags, sorted so the repr is the same in every session
+            value = tuple(sorted(value))
+        values.append((prop.identifier, value))
+    return tuple(values)
+
+
+def material_values(material):
+    # Node settings, unconnected input values and links of the material's
+    # top level tree, node groups are hashed by name only
+    if material is None:
+        return None
+    if not material.use_nodes or material.node_tree is None:
+        return (material.name, tuple(material.diffuse_color))
+
+    tree = material.node_tree
+    nodes = []
+    for node in sorted(tree.nodes, key=lambda n: n.name):
+        inputs = tuple(
+            (
+                (socket.identifier, socket.default_value[:])
+                if hasattr(socket.default_value, "__len__")
+                else (socket.identifier, socket.default_value)
+            )
+            for socket in node.inputs
+            if hasattr(socket, "default_value") and not socket.is_linked
+        )
+        nodes.append((node.name, rna_values(node), inputs))
+    links = sorted(
+        (
+            link.from_node.name,
+            link.from_socket.identifier,
+            link.to_node.name,
+            link.to_socket.identifier,
+        )
+        for link in tree.links
+    )
+    return (material.name, tuple(nodes), tuple(links))
+
+
+def scene_digest(scene, samples, rig=()):
+    # Everything visible in a render: renderable objects with their geometry,
+    # modifier settings, materials and transforms, the camera, and the render
+    # settings. Workers place the rig named in rig for every view, so its
+    # world transforms are left out and preset clicks keep the cache valid.
+    digest = hashlib.blake2b(digest_size=16)
+    render = scene.render
+    digest.update(
+        repr(
+            (render.resolution_x, render.resolution_y, render.resolution_percentage)
+        ).encode()
+    )
+    digest.update(b"%d" % samples)
+    if scene.world is not None:
+        digest.update(scene.world.name.encode())
+
+    for obj in sorted(scene.objects, key=lambda o: o.name):
+        if obj.hide_render:
+            continue
+        digest.update(obj.name.encode())
+        if obj.name in rig:
+            # Workers place the empty for every view and the camera follows as
+            # its child, so only what they leave alone counts
+            if obj.type == "EMPTY":
+                digest.update(repr((obj.rotation_euler[1], tuple(obj.scale))).encode())
+            else:
+                digest.update(np.array(obj.matrix_basis, dtype=np.float32).data)
+                digest.update(
+                    np.array(obj.matrix_parent_inverse, dtype=np.float32).data
+                )
+        else:
+            digest.update(np.array(obj.matrix_world, dtype=np.float32).data)
+        digest.update(
+            repr(
+                [material_values(slot.material) for slot in obj.material_slots]
+            ).encode()
+        )
+        digest.update(repr([rna_values(m) for m in obj.modifiers]).encode())
+        if obj.type == "MESH":
+            co = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+            obj.data.vertices.foreach_get("co", co)
+            digest.update(co.data)
+        elif obj.type == "CAMERA":
+            data = obj.data
+            digest.update(repr((data.type, data.ortho_scale, data.lens)).encode())
+        elif obj.type == "LIGHT":
+            data = obj.data
+            digest.update(repr((data.type, data.energy, tuple(data.color))).encode())
+
+    return digest.hexdigest()
+
+
+def view_digest(scene_hash, target, elevation, azimuth):
+    return hashlib.blake2b(
+        ("%s %s %r %r" % (scene_hash, target, elevation, azimuth)).encode(),
+        digest_size=16,
+    ).hexdigest()
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def contact_sheet(paths, columns, filepath):
+    # Tile equally sized renders row by row, first row at the top
+    images = [bpy.data.images.load(path, check_existing=False) for path in paths]
+    try:
+        width, height = images[0].size
+        rows = (len(images) + columns - 1) // columns
+        sheet = np.zeros((rows * height, columns * width, 4), dtype=np.float32)
+        for index, image in enumerate(images):
+            pixels = np.empty(width * height * 4, dtype=np.float32)
+            image.pixels.foreach_get(pixels)
+            # Blender stores rows bottom up
+            y = (rows - 1 - index // columns) * height
+            x = (index % columns) * width
+            sheet[y : y + height, x : x + width] = pixels.reshape(height, width, 4)
+    finally:
+        for image in images:
+            bpy.data.images.remove(image)
+
+    result = bpy.data.images.new(
+        "3DPCoverageSheet", columns * width, rows * height, alpha=True
+    )
+    result.pixels.foreach_set(sheet.ravel())
+    result.filepath_raw = filepath
+    result.file_format = "PNG"
+    result.save()
+    bpy.data.images.remove(result)
+
+
+def render_coverage(targets, output_dir, camera, empty, workers=None, samples=16):
+    # Render the missing views in background workers, then rebuild the contact
+    # sheets. Returns a summary of rendered and skipped views per target.
+    scene = bpy.context.scene
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    manifest = load_manifest(output_dir)
+    scene_hash = scene_digest(scene, samples, (camera, empty))
+    pending = []
+    for target in targets:
+        for elevation, azimuth in VIEWS:
+            name = view_name(target, elevation, azimuth)
+            digest = view_digest(scene_hash, target, elevation, azimuth)
+            path = os.path.join(output_dir, name)
+            if manifest.get(name) == digest and os.path.exists(path):
+                continue
+            # A stale render left behind by a failed worker must not pass as new
+            if os.path.exists(path):
+                os.remove(path)
+            pending.append(
+                {
+                    "target": target,
+                    "elevation": elevation,
+                    "azimuth": azimuth,
+                    "path": path,
+                    "digest": digest,
+                }
+            )
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    failed = []
+    with tempfile.TemporaryDirectory(prefix="3dp_coverage_") as tmp:
+        if pending:
+            snapshot = os.path.join(tmp, "snapshot.blend")
+            bpy.ops.wm.save_as_mainfile(filepath=snapshot, copy=True)
+
+            commands = []
+            log_paths = []
+            chunks = balance_chunks([1] * len(pending), workers)
+            for number, chunk in enumerate(chunks):
+                jobs_path = os.path.join(tmp, "jobs_%d.json" % number)
+                with open(jobs_path, "w") as f:
+                    json.dump(
+                        {
+                            "camera": camera,
+                            "empty": empty,
+                            "samples": samples,
+                            "jobs": [pending[i] for i in chunk],
+                        },
+                        f,
+                    )
+                commands.append(
+                    blender_command(
+                        os.path.abspath(__file__),
+                        ["--worker", jobs_path],
+                        threads=threads,
+                        blend=snapshot,
+                    )
+                )
+                log_paths.append(os.path.join(output_dir, "worker_%d.log" % number))
+            run_jobs(commands, log_paths, len(commands))
+
+    for job in pending:
+        if os.path.exists(job["path"]):
+            manifest[os.path.basename(job["path"])] = job["digest"]
+        else:
+            failed.append(os.path.basename(job["path"]))
+
+    with open(os.path.join(output_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    sheets = []
+    for target in targets:
+        paths = [os.path.join(output_dir, view_name(target, e, a)) for e, a in VIEWS]
+        if all(os.path.exists(path) for path in paths):
+            sheet = os.path.join(output_dir, bpy.path.clean_name(target) + "_sheet.png")
+            contact_sheet(paths, len(AZIMUTHS), sheet)
+            sheets.append(sheet)
+
+    return {
+        "rendered": len(pending) - len(failed),
+        "skipped": len(targets) * len(VIEWS) - len(pending),
+        "failed": failed,
+        "sheets": sheets,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def render_views(work):
+    # Worker side: aim the rig at each target and render with Cycles on the CPU
+    scene = bpy.context.scene
+    scene.render.engine = "CYCLES"
+    scene.cycles.device = "CPU"
+    scene.cycles.samples = work["samples"]
+    scene.render.image_settings.file_format = "PNG"
+    scene.render.image_settings.color_mode = "RGBA"
+    scene.camera = bpy.data.objects[work["camera"]]
+    empty = bpy.data.objects[work["empty"]]
+
+    # Keyframes from a baked turntable or planned views would be evaluated on
+    # render and override the pose set for each view
+    for animated in (empty, scene.camera, scene.camera.data):
+        animated.animation_data_clear()
+
+    for job in work["jobs"]:
+        empty.location = bpy.data.objects[job["target"]].matrix_world.translation
+        empty.rotation_euler[0] = radians(job["elevation"])
+        empty.rotation_euler[2] = radians(job["azimuth"])
+        scene.render.filepath = job["path"]
+        bpy.ops.render.render(write_still=True)
+        print("rendered %s" % job["path"], flush=True)
+
+
+def main():
+    args = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    if args and args[0] == "--worker":
+        with open(args[1]) as f:
+            render_views(json.load(f))
+        return 0
+
+    parser = argparse.ArgumentParser(description="Render camera coverage views")
+    parser.add_argument("output_dir")
+    parser.add_argument("--targets", nargs="+", help="objects (default: selection)")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: cores)")
+    parser.add_argument("--samples", type=int, default=16)
+    parser.add_argument("--camera", default="3DCamera")
+    parser.add_argument("--empty", default="3DEmpty")
+    options = parser.parse_args(args)
+
+    targets = options.targets or [o.name for o in bpy.context.selected_objects]
+    if not targets:
+        print("No target objects")
+        return 1
+
+    summary = render_coverage(
+        targets,
+        options.output_dir,
+        options.camera,
+        options.empty,
+        options.jobs,
+        options.samples,
+    )
+    print(
+        "%d rendered, %d skipped, %d failed, %d sheets in %.1fs"
+        % (
+            summary["rendered"],
+            summary["skipped"],
+            len(summary["failed"]),
+            len(summary["sheets"]),
+            summary["seconds"],
+        )
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
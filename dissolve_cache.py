@@ -0,0 +1,98 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from .mesh_arrays import flatten_arrays
+
+ANGLES = (1, 2, 3, 4, 5)
+
+
+def hash_arrays(arrays):
+    # Content hash of everything a hit writes back, so meshes sharing geometry
+    # but not UVs, materials, seams or attributes get entries of their own
+    digest = hashlib.blake2b(digest_size=16)
+    for key, array in flatten_arrays(arrays).items():
+        array = np.ascontiguousarray(array)
+        digest.update(key.encode())
+        digest.update(str(array.dtype).encode())
+        digest.update(str(array.shape).encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+def arrays_nbytes(arrays):
+    return sum(array.nbytes for array in flatten_arrays(arrays).values())
+
+
+def compact_arrays(arrays):
+    # Narrow the snapshot so it costs as little of the budget as possible
+    compact = dict(arrays)
+    loop_total = arrays["loop_total"]
+    if not len(loop_total) or loop_total.max() < 256:
+        compact["loop_total"] = loop_total.astype(np.uint8)
+    compact["material_index"] = arrays["material_index"].astype(np.int16)
+    return compact
+
+
+class DissolveCache:
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+        # Source hash per mesh name, so panels can look up results without
+        # hashing the mesh on every redraw
+        self.sources = {}
+
+    def get(self, source, angle):
+        result = self.entries.get((source, angle))
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end((source, angle))
+        return result
+
+    def put(self, source, angle, arrays):
+        key = (source, angle)
+        if key in self.entries:
+            self.size -= arrays_nbytes(self.entries.pop(key))
+
+        arrays = compact_arrays(arrays)
+        size = arrays_nbytes(arrays)
+        if size > self.budget:
+            return
+
+        self.entries[key] = arrays
+        self.size += size
+        self.evict()
+
+    def evict(self):
+        while self.size > self.budget and self.entries:
+            _, arrays = self.entries.popitem(last=False)
+            self.size -= arrays_nbytes(arrays)
+
+    def resize(self, budget):
+        self.budget = budget
+        self.evict()
+
+    def face_counts(self, mesh_name):
+        source = self.sources.get(mesh_name)
+        counts = {}
+        for angle in ANGLES:
+            arrays = self.entries.get((source, angle))
+            if arrays is not None:
+                counts[angle] = len(arrays["loop_start"])
+        return counts
+
+    def clear(self):
+        self.entries.clear()
+        self.sources.clear()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+
+cache = DissolveCache(256 * 1024 * 1024)
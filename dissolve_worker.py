@@ -0,0 +1,57 @@
+"""Limited dissolve worker, run as a background Blender process:
+
+blender -b --python dissolve_worker.py -- INPUT.npz OUTPUT.npz ANGLE
+"""
+
+import bpy
+import os
+import sys
+import importlib
+import bmesh
+from math import radians
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+if not __package__:
+    # Started by path with --python, load the add-on package first so the
+    # relative imports below resolve
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+    __package__ = os.path.basename(PACKAGE_DIR)
+    importlib.import_module(__package__)
+
+from .mesh_arrays import (
+    read_mesh_arrays,
+    write_mesh_arrays,
+    load_mesh_bundle,
+    save_mesh_bundle,
+)
+
+
+def dissolve_arrays(arrays, angle, scratch, bm):
+    scratch.clear_geometry()
+    write_mesh_arrays(scratch, arrays)
+    bm.from_mesh(scratch)
+    bmesh.ops.dissolve_limit(
+        bm, angle_limit=radians(angle), verts=bm.verts, edges=bm.edges
+    )
+    bm.to_mesh(scratch)
+    bm.clear()
+    return read_mesh_arrays(scratch)
+
+
+def dissolve_bundle(meshes, angle):
+    # One scratch mesh and bmesh serve every mesh of the bundle
+    scratch = bpy.data.meshes.new("3DPDissolveScratch")
+    bm = bmesh.new()
+    results = [dissolve_arrays(arrays, angle, scratch, bm) for arrays in meshes]
+    bm.free()
+    bpy.data.meshes.remove(scratch)
+    return results
+
+
+def main():
+    source, output, angle = sys.argv[sys.argv.index("--") + 1 :]
+    save_mesh_bundle(output, dissolve_bundle(load_mesh_bundle(source), int(angle)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
 import bpy
-import bmesh
 import os
 from bpy.types import Operator
-from bpy.props import StringProperty, BoolProperty, EnumProperty
+from bpy.props import (
+    StringProperty,
+    BoolProperty,
+    EnumProperty,
+    FloatProperty,
+    IntProperty,
+)
 
-custom_keymap = None
+from . import instrumentation
+
+custom_keymap = []
 
 
 class ExportOperator(Operator):
@@ -31,27 +38,160 @@ class ExportOperator(Operator):
         default="PLACEHOLDER",
     )
 
+    use_fast_writer: BoolProperty(
+        name="Fast GLB Writer",
+        description="Write static meshes directly, placeholder materials only",
+        default=False,
+    )
+
+    use_fragment_cache: BoolProperty(
+        name="Incremental",
+        description="Reuse cached buffers of meshes unchanged since the last export",
+        default=False,
+    )
+
+    instancing: EnumProperty(
+        name="Instancing",
+        description="Share one mesh between congruent objects",
+        items=[
+            ("NONE", "None", "Write every mesh"),
+            ("NODES", "Shared Meshes", "One mesh, one node per object"),
+            ("GPU", "GPU Instancing", "One node using EXT_mesh_gpu_instancing"),
+        ],
+        default="NONE",
+    )
+
+    use_quantization: BoolProperty(
+        name="Quantize",
+        description="Write KHR_mesh_quantization attributes and cache-ordered indices",
+        default=False,
+    )
+
+    quantize_error: FloatProperty(
+        name="Max Position Error",
+        description="Meshes that can't be quantized within this error keep float positions",
+        min=0.0,
+        default=0.0001,
+        precision=5,
+        subtype="DISTANCE",
+    )
+
+    split: EnumProperty(
+        name="Split",
+        description="Write one file per object or collection plus a JSON manifest",
+        items=[
+            ("NONE", "Single File", ""),
+            ("OBJECT", "Per Object", ""),
+            ("COLLECTION", "Per Collection", ""),
+        ],
+        default="NONE",
+    )
+
+    split_workers: IntProperty(
+        name="Workers",
+        description="Background Blender processes, 0 uses every core",
+        min=0,
+        default=0,
+    )
+
+    use_background: BoolProperty(
+        name="Background",
+        description="Export in background Blender processes and keep working",
+        default=False,
+    )
+
     @classmethod
     def poll(cls, context):
         return len(context.selected_objects) > 0
 
     def execute(self, context):
+        from .glb_writer import describe
+        from .export_worker import (
+            BackgroundExport,
+            export_objects,
+            file_entry,
+            group_entries,
+            split_groups,
+            start_background,
+        )
+
         if self.options.is_invoke:
             if not self.poll(context):
                 self.report({"ERROR"}, "Invalid context")
 
                 return {"CANCELLED"}
 
-        bpy.ops.export_scene.gltf(
-            filepath=self.filepath,
-            use_selection=True,
-            export_apply=self.export_apply,
-            export_materials=self.export_materials,
-            export_animations=False,
-            export_morph=False,
-        )
+        options = {
+            "apply": self.export_apply,
+            "materials": self.export_materials,
+            "fast": self.use_fast_writer,
+            "incremental": self.use_fragment_cache,
+            "instancing": self.instancing,
+            "quantize": self.quantize_error if self.use_quantization else None,
+        }
+
+        if self.split != "NONE":
+            directory = os.path.dirname(self.filepath)
+            groups = split_groups(context.selected_objects, self.split)
+            entries = group_entries(directory, groups)
+        elif self.use_background:
+            entries = [file_entry(self.filepath, context.selected_objects)]
+        else:
+            stats = export_objects(self.filepath, context.selected_objects, options)
+            if stats is not None:
+                self.report(
+                    {"INFO"},
+                    "Exported to: %s (%s)" % (self.filepath, describe(stats)),
+                )
+                return {"FINISHED"}
+
+            self.report({"INFO"}, "Exported to: " + self.filepath)
+
+            return {"FINISHED"}
+
+        try:
+            export = BackgroundExport(entries, options, self.split_workers)
+        except OSError as error:
+            self.report({"ERROR"}, "Could not start Blender worker: %s" % error)
+            return {"CANCELLED"}
+
+        if self.use_background:
+            return start_background(self, context, export)
+
+        try:
+            export.wait()
+            entries = export.finish()
+        except RuntimeError as error:
+            self.report({"ERROR"}, str(error))
+            return {"CANCELLED"}
+
+        return self.finish(entries)
+
+    def modal(self, context, event):
+        from .export_worker import background_modal
 
-        self.report({"INFO"}, "Exported to: " + self.filepath)
+        return background_modal(self, context, event, self.finish)
+
+    def finish(self, entries):
+        if self.split == "NONE":
+            self.report(
+                {"INFO"},
+                "Exported to: %s (%d bytes)" % (self.filepath, entries[0]["bytes"]),
+            )
+            return {"FINISHED"}
+
+        from .export_worker import write_manifest
+
+        directory = os.path.dirname(self.filepath)
+        stem = os.path.splitext(os.path.basename(self.filepath))[0]
+        manifest = os.path.join(directory, stem + ".manifest.json")
+        write_manifest(manifest, entries)
+
+        self.report(
+            {"INFO"},
+            "Exported %d files (%d bytes), manifest: %s"
+            % (len(entries), sum(entry["bytes"] for entry in entries), manifest),
+        )
 
         return {"FINISHED"}
 
@@ -78,10 +218,36 @@ class ExportOperator(Operator):
         col = box.column()
         col.prop(self, "export_apply")
         col.prop(self, "export_materials")
+        col = col.column()
+        col.active = self.export_materials == "PLACEHOLDER"
+        col.prop(self, "use_fast_writer")
+        row = col.row()
+        row.active = self.use_fast_writer
+        row.prop(self, "use_fragment_cache")
+        row = col.row()
+        row.active = self.use_fast_writer
+        row.prop(self, "instancing")
+        row = col.row()
+        row.active = self.use_fast_writer
+        row.prop(self, "use_quantization")
+        row = col.row()
+        row.active = self.use_fast_writer and self.use_quantization
+        row.prop(self, "quantize_error")
+
+        box = layout.box()
+        box.label(text="Split Export")
+
+        col = box.column()
+        col.prop(self, "split")
+        row = col.row()
+        row.active = self.split != "NONE"
+        row.prop(self, "split_workers")
+        col.prop(self, "use_background")
 
 
 def register():
-    bpy.utils.register_class(ExportOperator)
+    instrumentation.register()
+    bpy.utils.register_class(instrumentation.instrument(ExportOperator))
 
     key_config = bpy.context.window_manager.keyconfigs.addon
     if key_config:
@@ -89,7 +255,7 @@ def register():
         key_entry = key_map.keymap_items.new(
             "export.selection_to_gltf", type="E", value="PRESS", shift=True, ctrl=True
         )
-        custom_keymap = (key_map, key_entry)
+        custom_keymap.append((key_map, key_entry))
 
 
 def unregister():
@@ -98,7 +264,4 @@ def unregister():
     custom_keymap.clear()
 
     bpy.utils.unregister_class(ExportOperator)
-
-
-if __name__ == "__main__":
-    register()
+    instrumentation.unregister()
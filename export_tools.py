@@ -0,0 +1,226 @@
+import bpy
+from bpy.types import Panel, Scene, Operator, PropertyGroup
+from bpy.props import (
+    StringProperty,
+    FloatProperty,
+    BoolProperty,
+    EnumProperty,
+    PointerProperty,
+)
+
+from . import instrumentation
+
+# Scripts sharing the export panel, it stays registered while any is
+users = 0
+
+
+class ExportSettings(PropertyGroup):
+    export_path: StringProperty(name="File", subtype="FILE_PATH")
+    fast_export: BoolProperty(name="Fast GLB Writer", default=False)
+    export_cache: BoolProperty(
+        name="Incremental",
+        description="Reuse cached buffers of meshes unchanged since the last export",
+        default=False,
+    )
+    export_instancing: EnumProperty(
+        name="Instancing",
+        description="Share one mesh between congruent objects",
+        items=[
+            ("NONE", "None", "Write every mesh"),
+            ("NODES", "Shared Meshes", "One mesh, one node per object"),
+            ("GPU", "GPU Instancing", "One node using EXT_mesh_gpu_instancing"),
+        ],
+        default="NONE",
+    )
+    export_quantize: BoolProperty(
+        name="Quantize",
+        description="Write KHR_mesh_quantization attributes and cache-ordered indices",
+        default=False,
+    )
+    quantize_error: FloatProperty(
+        name="Max Position Error",
+        description="Meshes that can't be quantized within this error keep float positions",
+        min=0.0,
+        default=0.0001,
+        precision=5,
+        subtype="DISTANCE",
+    )
+    export_apply: BoolProperty(
+        name="Apply Modifiers",
+        description="Export the subdivided meshes instead of the base cages",
+        default=False,
+    )
+    export_evaluated: BoolProperty(
+        name="Reuse Evaluated",
+        description="Keep subdivided meshes in memory and reuse them while the "
+        "base mesh and modifier settings are unchanged",
+        default=True,
+    )
+    export_subdivide: BoolProperty(
+        name="Built-in Subdivision",
+        description="Subdivide plain level 1-2 Subdivision modifiers with the "
+        "exporter's own Catmull-Clark evaluator instead of the depsgraph",
+        default=True,
+    )
+    export_background: BoolProperty(
+        name="Background",
+        description="Export in a background Blender process and keep working",
+        default=False,
+    )
+
+
+class TOOL_OT_3dp_export(Operator):
+    bl_idname = "3dp.export"
+    bl_label = "export gltf"
+    filename_ext = ".glb"
+
+    @classmethod
+    def poll(cls, context):
+        return (
+            len(context.selected_objects) > 0 and context.scene.kbd_export.export_path
+        )
+
+    def execute(self, context):
+        from .glb_writer import FragmentCache, write_glb, describe, evaluated_cache
+        from .export_worker import BackgroundExport, file_entry, start_background
+
+        settings = context.scene.kbd_export
+        filepath = bpy.path.abspath(settings.export_path)
+
+        if settings.export_background:
+            options = {
+                "apply": settings.export_apply,
+                "subdivide": settings.export_subdivide,
+                "fast": settings.fast_export,
+                "incremental": settings.export_cache,
+                "instancing": settings.export_instancing,
+                "quantize": (
+                    settings.quantize_error if settings.export_quantize else None
+                ),
+            }
+            try:
+                export = BackgroundExport(
+                    [file_entry(filepath, context.selected_objects)], options
+                )
+            except OSError as error:
+                self.report({"ERROR"}, "Could not start Blender worker: %s" % error)
+                return {"CANCELLED"}
+            self.filepath = filepath
+            return start_background(self, context, export)
+
+        if settings.fast_export:
+            cache = FragmentCache() if settings.export_cache else None
+            evaluated = evaluated_cache if settings.export_evaluated else None
+            stats = write_glb(
+                filepath,
+                context.selected_objects,
+                context.evaluated_depsgraph_get(),
+                apply_modifiers=settings.export_apply,
+                cache=cache,
+                instancing=settings.export_instancing,
+                quantize=settings.quantize_error if settings.export_quantize else None,
+                evaluated=evaluated,
+                subdivide=settings.export_subdivide,
+            )
+            self.report(
+                {"INFO"},
+                "Exported to: %s (%s)" % (settings.export_path, describe(stats)),
+            )
+            return {"FINISHED"}
+
+        bpy.ops.export_scene.gltf(
+            filepath=filepath,
+            use_selection=True,
+            export_apply=settings.export_apply,
+            export_materials="PLACEHOLDER",
+            export_animations=False,
+            export_morph=False,
+        )
+
+        self.report({"INFO"}, "Exported to: " + settings.export_path)
+
+        return {"FINISHED"}
+
+    def modal(self, context, event):
+        from .export_worker import background_modal
+
+        return background_modal(self, context, event, self.finish)
+
+    def finish(self, entries):
+        self.report(
+            {"INFO"},
+            "Exported to: %s (%d bytes)" % (self.filepath, entries[0]["bytes"]),
+        )
+        return {"FINISHED"}
+
+
+class VIEW3D_PT_3dpkbd_export(Panel):
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "3DPKBD"
+    bl_label = "Export"
+
+    def draw(self, context):
+        layout = self.layout
+
+        settings = context.scene.kbd_export
+        layout.row().prop(settings, "export_path", text="")
+        row = layout.row()
+        row.prop(settings, "fast_export")
+        sub = row.row()
+        sub.active = settings.fast_export
+        sub.prop(settings, "export_cache")
+        row = layout.row()
+        row.active = settings.fast_export
+        row.prop(settings, "export_instancing", text="")
+        row = layout.row()
+        row.active = settings.fast_export
+        row.prop(settings, "export_quantize")
+        sub = row.row()
+        sub.active = settings.fast_export and settings.export_quantize
+        sub.prop(settings, "quantize_error", text="Error")
+        row = layout.row()
+        row.prop(settings, "export_apply")
+        sub = row.row()
+        sub.active = settings.fast_export and settings.export_apply
+        sub.prop(settings, "export_evaluated")
+        sub = layout.row()
+        sub.active = settings.fast_export and settings.export_apply
+        sub.prop(settings, "export_subdivide")
+        layout.row().prop(settings, "export_background")
+        layout.row().operator("3dp.export", text="Export GLTF")
+
+
+classes = (
+    ExportSettings,
+    TOOL_OT_3dp_export,
+    VIEW3D_PT_3dpkbd_export,
+)
+
+
+def register():
+    global users
+    users += 1
+    if users > 1:
+        return
+
+    from bpy.utils import register_class
+
+    for cls in classes:
+        register_class(instrumentation.instrument(cls))
+
+    Scene.kbd_export = PointerProperty(type=ExportSettings)
+
+
+def unregister():
+    global users
+    users -= 1
+    if users > 0:
+        return
+
+    from bpy.utils import unregister_class
+
+    for cls in reversed(classes):
+        unregister_class(cls)
+
+    del Scene.kbd_export
@@ -0,0 +1,312 @@
+"""glTF export worker, run as a background Blender process on a snapshot:
+
+blender -b SNAPSHOT.blend --python export_worker.py -- JOBS.json
+"""
+
+import bpy
+import os
+import sys
+import importlib
+import json
+import hashlib
+import shutil
+import tempfile
+import time
+import numpy as np
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+if not __package__:
+    # Workers start this file by path, import the add-on package first so the
+    # relative imports resolve
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+    __package__ = os.path.basename(PACKAGE_DIR)
+    importlib.import_module(__package__)
+
+from .glb_writer import FragmentCache, write_glb
+from .mesh_arrays import balance_chunks
+from .worker_pool import BackgroundJob, blender_command
+
+DEFAULT_OPTIONS = {
+    "apply": True,
+    "materials": "PLACEHOLDER",
+    "fast": False,
+    "incremental": False,
+    "instancing": "NONE",
+    "quantize": None,
+    "subdivide": False,
+}
+
+
+def export_objects(filepath, objects, options):
+    # Fast writer when it can handle the options, glTF exporter otherwise
+    options = dict(DEFAULT_OPTIONS, **options)
+    if options["fast"] and options["materials"] == "PLACEHOLDER":
+        return write_glb(
+            filepath,
+            objects,
+            bpy.context.evaluated_depsgraph_get(),
+            options["apply"],
+            FragmentCache() if options["incremental"] else None,
+            options["instancing"],
+            quantize=options["quantize"],
+            subdivide=options["subdivide"],
+        )
+
+    names = set(obj.name for obj in objects)
+    for obj in bpy.context.view_layer.objects:
+        obj.select_set(obj.name in names)
+
+    bpy.ops.export_scene.gltf(
+        filepath=filepath,
+        use_selection=True,
+        export_apply=options["apply"],
+        export_materials=options["materials"],
+        export_animations=False,
+        export_morph=False,
+    )
+    return None
+
+
+def split_groups(objects, mode):
+    # (name, objects) per output file, by object or by first collection
+    if mode == "OBJECT":
+        return [(obj.name, [obj]) for obj in objects]
+
+    groups = {}
+    for obj in objects:
+        collections = obj.users_collection
+        name = collections[0].name if collections else "Scene"
+        groups.setdefault(name, []).append(obj)
+    return list(groups.items())
+
+
+def object_bounds(objects):
+    # World space axis aligned bounds from each object's bounding box corners
+    corners = []
+    for obj in objects:
+        matrix = np.array(obj.matrix_world)
+        box = np.array([corner[:] for corner in obj.bound_box])
+        corners.append(box @ matrix[:3, :3].T + matrix[:3, 3])
+    corners = np.concatenate(corners)
+    return {"min": corners.min(axis=0).tolist(), "max": corners.max(axis=0).tolist()}
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def vertex_count(objects):
+    return sum(len(obj.data.vertices) for obj in objects if obj.type == "MESH")
+
+
+def file_entry(path, objects):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return {
+        "name": name,
+        "file": os.path.basename(path),
+        "path": path,
+        "objects": [obj.name for obj in objects],
+    }
+
+
+def group_entries(directory, groups):
+    # clean_name maps "Key.001" and "Key_001" to the same file, number the
+    # later ones so parallel workers never write over each other
+    entries = []
+    used = set()
+    for name, members in groups:
+        base = bpy.path.clean_name(name)
+        stem = base
+        number = 1
+        while stem.lower() in used:
+            number += 1
+            stem = "%s_%d" % (base, number)
+        used.add(stem.lower())
+        entry = file_entry(os.path.join(directory, stem + ".glb"), members)
+        entries.append(dict(entry, name=name))
+    return entries
+
+
+class BackgroundExport:
+    # Snapshot the objects of every entry into a temporary .blend and export
+    # the entries in background Blender processes
+    def __init__(self, entries, options, workers=None):
+        self.entries = entries
+        self.start = time.perf_counter()
+        self.started = time.time()
+        self.tmp = tempfile.mkdtemp(prefix="3dp_export_")
+        self.jobs = []
+
+        objects = [
+            bpy.data.objects[name] for entry in entries for name in entry["objects"]
+        ]
+        snapshot = os.path.join(self.tmp, "snapshot.blend")
+        bpy.data.libraries.write(snapshot, set(objects), fake_user=True)
+
+        chunks = balance_chunks(
+            [
+                vertex_count([bpy.data.objects[name] for name in entry["objects"]])
+                for entry in entries
+            ],
+            workers or os.cpu_count() or 1,
+        )
+        try:
+            for number, chunk in enumerate(chunks):
+                jobs_path = os.path.join(self.tmp, "jobs_%d.json" % number)
+                with open(jobs_path, "w") as f:
+                    json.dump(
+                        {"options": options, "jobs": [entries[i] for i in chunk]}, f
+                    )
+                self.jobs.append(
+                    BackgroundJob(
+                        blender_command(
+                            os.path.abspath(__file__), [jobs_path], blend=snapshot
+                        ),
+                        os.path.join(self.tmp, "worker_%d.log" % number),
+                    )
+                )
+        except OSError:
+            self.cancel()
+            raise
+
+    def done_count(self):
+        # Workers print one line per exported file
+        return sum(job.read_log().count("exported ") for job in self.jobs)
+
+    def status(self):
+        return "Exporting glTF: %d/%d files, %.0fs (Esc to cancel)" % (
+            self.done_count(),
+            len(self.entries),
+            time.perf_counter() - self.start,
+        )
+
+    def poll(self):
+        # True once every worker has finished, raises if any of them failed
+        codes = [job.poll() for job in self.jobs]
+        for job, code in zip(self.jobs, codes):
+            if code is not None and code != 0:
+                log = job.read_log()
+                self.cancel()
+                raise RuntimeError("Export worker failed:\n" + log[-2000:])
+        return all(code is not None for code in codes)
+
+    def wait(self, interval=0.1):
+        while not self.poll():
+            time.sleep(interval)
+
+    def cancel(self):
+        for job in self.jobs:
+            job.cancel()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        # Files written since the export started are partial or out of step
+        # with the rest, older ones were never touched
+        for entry in self.entries:
+            try:
+                if os.path.getmtime(entry["path"]) >= self.started:
+                    os.remove(entry["path"])
+            except OSError:
+                pass
+
+    def finish(self):
+        # Manifest entries for the written files, raises if a worker exited
+        # cleanly without writing one of them
+        missing = [e["name"] for e in self.entries if not os.path.exists(e["path"])]
+        if missing:
+            log = "\n".join(job.read_log()[-1000:] for job in self.jobs)
+            self.cancel()
+            raise RuntimeError(
+                "Export worker wrote no file for: %s\n%s" % (", ".join(missing), log)
+            )
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        results = []
+        for entry in self.entries:
+            entry = dict(entry)
+            path = entry.pop("path")
+            entry["bounds"] = object_bounds(
+                [bpy.data.objects[name] for name in entry["objects"]]
+            )
+            entry["bytes"] = os.path.getsize(path)
+            entry["sha256"] = file_digest(path)
+            results.append(entry)
+        return results
+
+
+def start_background(operator, context, export):
+    # Let a modal operator follow a BackgroundExport from a timer
+    operator.export = export
+    window_manager = context.window_manager
+    operator.timer = window_manager.event_timer_add(0.25, window=context.window)
+    window_manager.modal_handler_add(operator)
+    context.workspace.status_text_set(export.status())
+    return {"RUNNING_MODAL"}
+
+
+def background_modal(operator, context, event, finished):
+    # Modal step for operators started with start_background, finished is
+    # called with the manifest entries once the export is written
+    if event.type == "ESC":
+        operator.export.cancel()
+        stop_background(operator, context)
+        operator.report({"WARNING"}, "Export cancelled")
+        return {"CANCELLED"}
+
+    if event.type != "TIMER":
+        return {"PASS_THROUGH"}
+
+    try:
+        done = operator.export.poll()
+    except RuntimeError as error:
+        stop_background(operator, context)
+        operator.report({"ERROR"}, str(error))
+        return {"CANCELLED"}
+
+    if not done:
+        context.workspace.status_text_set(operator.export.status())
+        return {"PASS_THROUGH"}
+
+    stop_background(operator, context)
+    try:
+        entries = operator.export.finish()
+    except RuntimeError as error:
+        operator.report({"ERROR"}, str(error))
+        return {"CANCELLED"}
+    return finished(entries)
+
+
+def stop_background(operator, context):
+    context.window_manager.event_timer_remove(operator.timer)
+    context.workspace.status_text_set(None)
+
+
+def write_manifest(path, entries):
+    with open(path, "w") as f:
+        json.dump(
+            {"files": entries, "bytes": sum(entry["bytes"] for entry in entries)},
+            f,
+            indent=2,
+        )
+
+
+def main():
+    with open(sys.argv[sys.argv.index("--") + 1]) as f:
+        work = json.load(f)
+
+    # Objects written to the snapshot are not linked to any scene yet
+    scene = bpy.context.scene
+    for obj in bpy.data.objects:
+        if not obj.users_scene:
+            scene.collection.objects.link(obj)
+
+    for job in work["jobs"]:
+        objects = [bpy.data.objects[name] for name in job["objects"]]
+        export_objects(job["path"], objects, work["options"])
+        print("exported %s" % job["path"], flush=True)
+
+
+if __name__ == "__main__":
+    main()
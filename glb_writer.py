@@ -0,0 +1,791 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .catmull_clark import subdivide_arrays, export_loops, subsurf_modifier
+from .mesh_arrays import read_mesh_arrays
+from .mesh_dedupe import read_shape, read_corner_normals, group_instances
+from .mesh_quantize import optimize_primitive, quantize_mesh
+
+GLB_MAGIC = b"glTF"
+JSON_CHUNK = b"JSON"
+BIN_CHUNK = b"BIN\0"
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+COMPONENT_TYPES = {
+    np.dtype(np.int8): 5120,
+    np.dtype(np.uint8): 5121,
+    np.dtype(np.int16): 5122,
+    np.dtype(np.uint16): 5123,
+    np.dtype(np.uint32): 5125,
+    np.dtype(np.float32): 5126,
+}
+ACCESSOR_TYPES = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4"}
+
+# Bump when the layout of cached fragments changes
+FRAGMENT_VERSION = 1
+
+
+def to_yup(vectors):
+    # Blender is Z-up, glTF is Y-up
+    return vectors[:, [0, 2, 1]] * np.array([1, 1, -1], dtype=vectors.dtype)
+
+
+def read_mesh_loops(mesh):
+    # Per-corner attributes of every loop triangle, read in bulk
+    mesh.calc_loop_triangles()
+    num_loops = len(mesh.loops)
+    num_tris = len(mesh.loop_triangles)
+
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    loop_verts = np.empty(num_loops, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+
+    uvs = None
+    if mesh.uv_layers.active is not None:
+        uvs = np.empty(num_loops * 2, dtype=np.float32)
+        mesh.uv_layers.active.data.foreach_get("uv", uvs)
+        uvs = uvs.reshape(-1, 2)
+
+    tri_loops = np.empty(num_tris * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("loops", tri_loops)
+    tri_material = np.empty(num_tris, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("material_index", tri_material)
+
+    return {
+        "positions": co.reshape(-1, 3)[loop_verts],
+        "normals": read_corner_normals(mesh),
+        "uvs": uvs,
+        "tri_loops": tri_loops.reshape(-1, 3),
+        "tri_material": tri_material,
+    }
+
+
+def dedupe_rows(rows):
+    # Merge identical corners into shared vertices, returns (unique, inverse)
+    rows = np.ascontiguousarray(rows)
+    keys = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1])))
+    _, first, inverse = np.unique(keys.ravel(), return_index=True, return_inverse=True)
+    return rows[first], inverse.ravel()
+
+
+def build_primitives(loops):
+    # One primitive per material slot, like the exporter's PLACEHOLDER mode
+    columns = [to_yup(loops["positions"]), to_yup(loops["normals"])]
+    if loops["uvs"] is not None:
+        # glTF UV origin is the top left corner
+        columns.append(loops["uvs"] * [1, -1] + [0, 1])
+    # Adding zero folds -0.0 into 0.0 so equal corners dedupe bytewise
+    rows = np.hstack(columns).astype(np.float32) + np.float32(0)
+
+    primitives = []
+    for material in np.unique(loops["tri_material"]):
+        corners = loops["tri_loops"][loops["tri_material"] == material].ravel()
+        vertices, indices = dedupe_rows(rows[corners])
+        primitives.append(
+            {
+                "positions": vertices[:, 0:3],
+                "normals": vertices[:, 3:6],
+                "uvs": vertices[:, 6:8] if loops["uvs"] is not None else None,
+                "indices": indices,
+                "material": int(material),
+            }
+        )
+
+    return primitives
+
+
+# Change of basis from Blender's Z-up to glTF's Y-up
+Z_UP_TO_Y_UP = np.array(
+    [[1.0, 0.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0], [0.0, -1.0, 0.0, 0.0], [0, 0, 0, 1]]
+)
+
+
+def matrix_to_quaternion(rotation):
+    # Unit quaternion (x, y, z, w) of a pure rotation matrix
+    trace = np.trace(rotation)
+    if trace > 0:
+        s = 2.0 * np.sqrt(trace + 1.0)
+        quaternion = [
+            (rotation[2, 1] - rotation[1, 2]) / s,
+            (rotation[0, 2] - rotation[2, 0]) / s,
+            (rotation[1, 0] - rotation[0, 1]) / s,
+            0.25 * s,
+        ]
+    else:
+        i = int(np.argmax(np.diag(rotation)))
+        j, k = (i + 1) % 3, (i + 2) % 3
+        s = 2.0 * np.sqrt(1.0 + rotation[i, i] - rotation[j, j] - rotation[k, k])
+        quaternion = [0.0, 0.0, 0.0, (rotation[k, j] - rotation[j, k]) / s]
+        quaternion[i] = 0.25 * s
+        quaternion[j] = (rotation[j, i] + rotation[i, j]) / s
+        quaternion[k] = (rotation[k, i] + rotation[i, k]) / s
+    quaternion = np.array(quaternion)
+    return quaternion / np.linalg.norm(quaternion)
+
+
+def node_trs(matrix_world, local=None):
+    # Translation, rotation and scale of a Blender world matrix in glTF space,
+    # optionally followed by a glTF space local transform
+    matrix = Z_UP_TO_Y_UP @ np.asarray(matrix_world, dtype=np.float64)
+    matrix = matrix @ Z_UP_TO_Y_UP.T
+    if local is not None:
+        matrix = matrix @ local
+    scale = np.linalg.norm(matrix[:3, :3], axis=0)
+    if np.linalg.det(matrix[:3, :3]) < 0:
+        scale[0] = -scale[0]
+    rotation = matrix[:3, :3] / np.where(scale == 0, 1.0, scale)
+    return {
+        "translation": matrix[:3, 3].tolist(),
+        "rotation": matrix_to_quaternion(rotation).tolist(),
+        "scale": scale.tolist(),
+    }
+
+
+def mesh_fingerprint(mesh):
+    # Content hash of everything build_primitives depends on, read without
+    # triangulating so a cache hit skips the expensive part of the export
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(b"%d" % FRAGMENT_VERSION)
+
+    arrays = [
+        ("co", mesh.vertices, 3, np.float32),
+        ("vertex_index", mesh.loops, 1, np.int32),
+        ("loop_start", mesh.polygons, 1, np.int32),
+        ("material_index", mesh.polygons, 1, np.int32),
+    ]
+    if mesh.uv_layers.active is not None:
+        arrays.append(("uv", mesh.uv_layers.active.data, 2, np.float32))
+    if hasattr(mesh, "corner_normals"):
+        arrays.append(("vector", mesh.corner_normals, 3, np.float32))
+    else:
+        mesh.calc_normals_split()
+        arrays.append(("normal", mesh.loops, 3, np.float32))
+
+    for name, collection, width, dtype in arrays:
+        data = np.empty(len(collection) * width, dtype=dtype)
+        collection.foreach_get(name, data)
+        digest.update(name.encode())
+        digest.update(data.data)
+
+    return digest.hexdigest()
+
+
+class FragmentCache:
+    # Encoded primitives per mesh fingerprint, one .npz file each. Files past
+    # the size budget are evicted least recently used first, by mtime, which
+    # load() refreshes on every hit.
+    def __init__(self, directory=None, budget=512 * 1024 * 1024):
+        self.directory = directory or os.path.join(
+            tempfile.gettempdir(), "3dpkbd_glb_cache"
+        )
+        self.budget = budget
+        os.makedirs(self.directory, exist_ok=True)
+        self.evict()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def load(self, key):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            primitives = []
+            for index in range(int(data["count"])):
+                prefix = "%d/" % index
+                primitives.append(
+                    {
+                        "positions": data[prefix + "positions"],
+                        "normals": data[prefix + "normals"],
+                        "uvs": data[prefix + "uvs"] if prefix + "uvs" in data else None,
+                        "indices": data[prefix + "indices"],
+                        "material": int(data[prefix + "material"]),
+                    }
+                )
+            seconds = float(data["seconds"])
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return primitives, seconds
+
+    def store(self, key, primitives, seconds):
+        data = {"count": len(primitives), "seconds": seconds}
+        for index, primitive in enumerate(primitives):
+            for name, value in primitive.items():
+                if value is not None:
+                    data["%d/%s" % (index, name)] = value
+
+        # Write then rename so a crashed export never leaves a broken fragment
+        partial = self.path(key + ".partial")
+        np.savez(partial, **data)
+        os.replace(partial, self.path(key))
+        self.size += os.path.getsize(self.path(key))
+        if self.size > self.budget:
+            self.evict()
+
+    def fragments(self):
+        # (mtime, size, path) of every fragment, oldest first
+        fragments = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                fragments.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(fragments)
+
+    def evict(self):
+        # Rescan, other exports may share the directory
+        fragments = self.fragments()
+        self.size = sum(size for _, size, _ in fragments)
+        for _, size, path in fragments:
+            if self.size <= self.budget:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.directory, name))
+        self.size = 0
+
+
+def crease_values(mesh):
+    # Edge creases, keyed by their vertices since edge order is not part of
+    # the fingerprint, and vertex creases. Before Blender 4.0 edge creases
+    # were an edge property instead of an attribute.
+    values = []
+    edge_crease = np.empty(len(mesh.edges), dtype=np.float32)
+    crease = mesh.attributes.get("crease_edge")
+    if crease is not None:
+        crease.data.foreach_get("value", edge_crease)
+    elif len(mesh.edges) and hasattr(mesh.edges[0], "crease"):
+        mesh.edges.foreach_get("crease", edge_crease)
+    else:
+        edge_crease = None
+    if edge_crease is not None:
+        edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+        mesh.edges.foreach_get("vertices", edges)
+        values += [edges, edge_crease]
+
+    crease = mesh.attributes.get("crease_vert")
+    if crease is not None:
+        vertex_crease = np.empty(len(mesh.vertices), dtype=np.float32)
+        crease.data.foreach_get("value", vertex_crease)
+        values.append(vertex_crease)
+    return values
+
+
+def modifier_key(obj):
+    # Hash of the base mesh and the modifier stack settings, None when the
+    # evaluated mesh also depends on other datablocks or shape keys
+    mesh = obj.data
+    if mesh.shape_keys is not None:
+        return None
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(mesh_fingerprint(mesh).encode())
+
+    for values in crease_values(mesh):
+        digest.update(values.data)
+
+    for modifier in obj.modifiers:
+        digest.update(modifier.type.encode())
+        for prop in modifier.bl_rna.properties:
+            if prop.identifier == "rna_type":
+                continue
+            value = getattr(modifier, prop.identifier)
+            if prop.type in ("POINTER", "COLLECTION"):
+                if value:
+                    return None
+                continue
+            if getattr(prop, "array_length", 0):
+                value = tuple(value)
+            digest.update(("%s=%r" % (prop.identifier, value)).encode())
+
+    return digest.hexdigest()
+
+
+def entry_nbytes(entry):
+    size = sum(a.nbytes for a in entry["shape"].values() if a is not None)
+    for primitive in entry["primitives"]:
+        size += sum(a.nbytes for a in primitive.values() if isinstance(a, np.ndarray))
+    return size
+
+
+class EvaluatedCache:
+    # Shape and primitives of evaluated meshes per modifier_key, kept in
+    # memory so repeated exports skip evaluating unchanged modifier stacks
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        if key in self.entries:
+            self.size -= entry_nbytes(self.entries.pop(key))
+
+        size = entry_nbytes(entry)
+        if size > self.budget:
+            return
+
+        self.entries[key] = entry
+        self.size += size
+        while self.size > self.budget:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= entry_nbytes(evicted)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+evaluated_cache = EvaluatedCache(256 * 1024 * 1024)
+
+
+class GlbBuilder:
+    def __init__(self, generator="3DPKBD GLB writer"):
+        self.gltf = {
+            "asset": {"version": "2.0", "generator": generator},
+            "scene": 0,
+            "scenes": [{"nodes": []}],
+            "nodes": [],
+            "meshes": [],
+            "accessors": [],
+            "bufferViews": [],
+            "buffers": [],
+        }
+        self.chunks = []
+        self.length = 0
+        # Dequantization transform of every quantized mesh, applied by the
+        # nodes that use it
+        self.mesh_local = {}
+
+    def use_extension(self, extension, required=False):
+        keys = (
+            ("extensionsUsed", "extensionsRequired")
+            if required
+            else ("extensionsUsed",)
+        )
+        for key in keys:
+            if extension not in self.gltf.setdefault(key, []):
+                self.gltf[key].append(extension)
+
+    def add_view(self, data, target=None, stride=None):
+        data = np.ascontiguousarray(data)
+        view = {"buffer": 0, "byteOffset": self.length, "byteLength": data.nbytes}
+        if stride is not None:
+            view["byteStride"] = stride
+        if target is not None:
+            view["target"] = target
+        self.chunks.append(data.tobytes())
+        self.length += data.nbytes
+
+        # Keep every view 4 byte aligned
+        padding = -self.length % 4
+        if padding:
+            self.chunks.append(b"\0" * padding)
+            self.length += padding
+
+        self.gltf["bufferViews"].append(view)
+        return len(self.gltf["bufferViews"]) - 1
+
+    def add_accessor(
+        self, data, target=ARRAY_BUFFER, normalized=False, bounds=None, width=None
+    ):
+        # width below the array's column count leaves the rest as stride padding
+        data = np.asarray(data)
+        columns = 1 if data.ndim == 1 else data.shape[1]
+        width = width or columns
+        stride = columns * data.itemsize if width < columns else None
+        accessor = {
+            "bufferView": self.add_view(data, target, stride),
+            "componentType": COMPONENT_TYPES[data.dtype],
+            "count": len(data),
+            "type": ACCESSOR_TYPES[width],
+        }
+        if normalized:
+            accessor["normalized"] = True
+        if bounds is not None:
+            accessor["min"], accessor["max"] = bounds
+        self.gltf["accessors"].append(accessor)
+        return len(self.gltf["accessors"]) - 1
+
+    def add_attribute(self, data):
+        # Float data as is, integer data as normalized padded vectors
+        if data.dtype.kind == "f":
+            return self.add_accessor(data.astype(np.float32))
+        width = 2 if data.shape[1] == 2 else 3
+        return self.add_accessor(data, normalized=True, width=width)
+
+    def add_primitive(self, primitive):
+        positions = primitive["positions"]
+        if positions.dtype.kind == "f":
+            positions = positions.astype(np.float32)
+            position = self.add_accessor(
+                positions,
+                bounds=(positions.min(axis=0).tolist(), positions.max(axis=0).tolist()),
+            )
+        else:
+            # Quantized positions are read as plain integers, scaled back by the
+            # node's dequantization transform
+            position = self.add_accessor(
+                positions,
+                bounds=(
+                    positions[:, :3].min(axis=0).tolist(),
+                    positions[:, :3].max(axis=0).tolist(),
+                ),
+                width=3,
+            )
+
+        attributes = {
+            "POSITION": position,
+            "NORMAL": self.add_attribute(primitive["normals"]),
+        }
+        if primitive["uvs"] is not None:
+            attributes["TEXCOORD_0"] = self.add_attribute(primitive["uvs"])
+
+        index_type = np.uint16 if len(positions) < 65536 else np.uint32
+        indices = self.add_accessor(
+            primitive["indices"].astype(index_type), ELEMENT_ARRAY_BUFFER
+        )
+        return {"attributes": attributes, "indices": indices, "mode": 4}
+
+    def add_mesh(self, name, primitives, dequantize=None):
+        self.gltf["meshes"].append(
+            {"name": name, "primitives": [self.add_primitive(p) for p in primitives]}
+        )
+        mesh = len(self.gltf["meshes"]) - 1
+
+        if any(p["normals"].dtype.kind != "f" for p in primitives):
+            self.use_extension("KHR_mesh_quantization", required=True)
+        if dequantize is not None:
+            center, scale = dequantize
+            local = np.diag([scale, scale, scale, 1.0])
+            local[:3, 3] = center
+            self.mesh_local[mesh] = local
+
+        return mesh
+
+    def add_node(self, name, mesh, matrix_world):
+        node = {"name": name, "mesh": mesh}
+        node.update(node_trs(matrix_world, self.mesh_local.get(mesh)))
+        self.gltf["nodes"].append(node)
+        self.gltf["scenes"][0]["nodes"].append(len(self.gltf["nodes"]) - 1)
+
+    def add_instanced_node(self, name, mesh, matrices):
+        # One node drawing the mesh once per matrix via EXT_mesh_gpu_instancing
+        local = self.mesh_local.get(mesh)
+        transforms = [node_trs(matrix, local) for matrix in matrices]
+        attributes = {}
+        for attribute, key in (
+            ("TRANSLATION", "translation"),
+            ("ROTATION", "rotation"),
+            ("SCALE", "scale"),
+        ):
+            values = np.array([t[key] for t in transforms], dtype=np.float32)
+            attributes[attribute] = self.add_accessor(values, target=None)
+
+        extension = "EXT_mesh_gpu_instancing"
+        self.use_extension(extension, required=True)
+
+        self.gltf["nodes"].append(
+            {
+                "name": name,
+                "mesh": mesh,
+                "extensions": {extension: {"attributes": attributes}},
+            }
+        )
+        self.gltf["scenes"][0]["nodes"].append(len(self.gltf["nodes"]) - 1)
+
+    def to_bytes(self):
+        self.gltf["buffers"] = [{"byteLength": self.length}]
+        if not self.gltf["meshes"]:
+            for key in ("meshes", "accessors", "bufferViews", "buffers"):
+                del self.gltf[key]
+
+        document = json.dumps(self.gltf, separators=(",", ":")).encode()
+        document += b" " * (-len(document) % 4)
+
+        parts = [struct.pack("<I", len(document)), JSON_CHUNK, document]
+        if self.length:
+            parts += [struct.pack("<I", self.length), BIN_CHUNK] + self.chunks
+        body = b"".join(parts)
+
+        return GLB_MAGIC + struct.pack("<II", 2, 12 + len(body)) + body
+
+    def write(self, filepath):
+        data = self.to_bytes()
+        with open(filepath, "wb") as f:
+            f.write(data)
+        return len(data)
+
+
+def object_meshes(objects, depsgraph=None, apply_modifiers=False):
+    # Yield (object, mesh) pairs, freeing evaluated meshes once used
+    for obj in objects:
+        if not apply_modifiers:
+            yield obj, obj.data
+            continue
+        evaluated = obj.evaluated_get(depsgraph)
+        yield obj, evaluated.to_mesh()
+        evaluated.to_mesh_clear()
+
+
+def subdivided_entry(obj, modifier):
+    # Shape and primitives from the numpy Catmull-Clark evaluator, so the
+    # depsgraph never evaluates the modifier
+    result = subdivide_arrays(
+        read_mesh_arrays(obj.data),
+        modifier.levels,
+        modifier.use_limit_surface,
+        modifier.uv_smooth,
+        modifier.boundary_smooth,
+    )
+    layer = obj.data.uv_layers.active
+    uv_name = layer.name if layer is not None else None
+    loops = export_loops(result, uv_name)
+    shape = {
+        "co": result["co"].astype(np.float64),
+        "loop_verts": result["loop_verts"],
+        "loop_start": result["loop_start"],
+        "material_index": result["material_index"].astype(np.int32),
+        "use_smooth": result["use_smooth"].astype(bool),
+        "normals": loops["normals"].astype(np.float64),
+        "uv": result["uvs"][uv_name].ravel() if uv_name is not None else None,
+    }
+    return {"shape": shape, "primitives": build_primitives(loops)}
+
+
+def evaluated_entry(
+    obj, depsgraph, evaluated=None, cache=None, stats=None, subdivide=False
+):
+    # Shape and primitives of the object's evaluated mesh, only running the
+    # modifier stack when the evaluated cache has no entry for it and the
+    # numpy evaluator can't reproduce it
+    key = modifier_key(obj) if evaluated is not None else None
+    entry = evaluated.get(key) if key is not None else None
+    if entry is not None:
+        stats["reused"] += 1
+        return entry
+
+    modifier = subsurf_modifier(obj) if subdivide else None
+    if modifier is not None:
+        entry = subdivided_entry(obj, modifier)
+        stats["subdivided"] += 1
+    else:
+        for _, mesh in object_meshes([obj], depsgraph, apply_modifiers=True):
+            entry = {
+                "shape": read_shape(mesh),
+                "primitives": mesh_primitives(mesh, cache, stats),
+            }
+        stats["evaluated"] += 1
+    if key is not None:
+        evaluated.put(key, entry)
+    return entry
+
+
+def write_glb(
+    filepath,
+    objects,
+    depsgraph=None,
+    apply_modifiers=False,
+    cache=None,
+    instancing=None,
+    tolerance=1e-5,
+    quantize=None,
+    evaluated=None,
+    subdivide=False,
+):
+    # Static meshes with placeholder materials only, anything else is skipped.
+    # instancing is "NODES" to share one mesh between congruent objects or
+    # "GPU" to also merge them into one EXT_mesh_gpu_instancing node. quantize
+    # is the maximum position error allowed for KHR_mesh_quantization output.
+    # evaluated is an EvaluatedCache reused for objects with modifiers applied,
+    # subdivide evaluates lone SUBSURF modifiers with catmull_clark instead.
+    start = time.perf_counter()
+    builder = GlbBuilder()
+    stats = {"objects": 0, "skipped": 0, "vertices": 0, "triangles": 0}
+    if cache is not None:
+        stats.update({"hits": 0, "misses": 0, "saved": 0.0})
+    if quantize is not None:
+        stats.update({"quantized": 0, "float_bytes": 0, "quantized_bytes": 0})
+        stats["errors"] = {"position": 0.0, "normal": 0.0, "uv": 0.0}
+
+    mesh_objects = [obj for obj in objects if obj.type == "MESH"]
+    stats["skipped"] = len(objects) - len(mesh_objects)
+
+    entries = None
+    if apply_modifiers and (evaluated is not None or subdivide):
+        # Every object is its own prototype unless instancing merges them, so
+        # resolving all of them up front evaluates nothing twice
+        stats.update({"evaluated": 0, "reused": 0, "subdivided": 0})
+        entries = [
+            evaluated_entry(obj, depsgraph, evaluated, cache, stats, subdivide)
+            for obj in mesh_objects
+        ]
+
+    if instancing in ("NODES", "GPU"):
+        if entries is not None:
+            shapes = [entry["shape"] for entry in entries]
+        else:
+            shapes = [
+                read_shape(mesh)
+                for _, mesh in object_meshes(mesh_objects, depsgraph, apply_modifiers)
+            ]
+        groups = group_instances(shapes, tolerance)
+        prototypes = [mesh_objects[group["prototype"]] for group in groups]
+    else:
+        # Objects sharing mesh data without modifiers already share one mesh
+        groups = {}
+        for index, obj in enumerate(mesh_objects):
+            key = obj.name if apply_modifiers else obj.data.name
+            groups.setdefault(key, {"prototype": index, "members": []})
+            groups[key]["members"].append((index, np.eye(4)))
+        groups = list(groups.values())
+        prototypes = [mesh_objects[group["prototype"]] for group in groups]
+
+    if entries is not None:
+        meshes = [(obj, None) for obj in prototypes]
+    else:
+        meshes = object_meshes(prototypes, depsgraph, apply_modifiers)
+
+    for group, (obj, mesh) in zip(groups, meshes):
+        if entries is not None:
+            primitives = entries[group["prototype"]]["primitives"]
+        else:
+            primitives = mesh_primitives(mesh, cache, stats)
+        if not primitives:
+            # A glTF mesh needs at least one primitive, so meshes without
+            # faces are left out like non-mesh objects
+            stats["skipped"] += len(group["members"])
+            continue
+        dequantize = None
+        if quantize is not None:
+            primitives = [optimize_primitive(p) for p in primitives]
+            stats["float_bytes"] += sum(attribute_bytes(p) for p in primitives)
+            primitives, dequantize, errors = quantize_mesh(primitives, quantize)
+            stats["quantized_bytes"] += sum(attribute_bytes(p) for p in primitives)
+            stats["quantized"] += dequantize is not None
+            for key, error in errors.items():
+                stats["errors"][key] = max(stats["errors"][key], error)
+
+        mesh_index = builder.add_mesh(obj.data.name, primitives, dequantize)
+        for primitive in primitives:
+            stats["vertices"] += len(primitive["positions"])
+            stats["triangles"] += len(primitive["indices"]) // 3
+
+        matrices = [
+            np.array(mesh_objects[index].matrix_world) @ local
+            for index, local in group["members"]
+        ]
+        if instancing == "GPU" and len(matrices) > 1:
+            builder.add_instanced_node(obj.name, mesh_index, matrices)
+        else:
+            for (index, _), matrix in zip(group["members"], matrices):
+                builder.add_node(mesh_objects[index].name, mesh_index, matrix)
+        stats["objects"] += len(matrices)
+
+    stats["unique_meshes"] = len(builder.gltf["meshes"])
+    stats["bytes"] = builder.write(filepath)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def attribute_bytes(primitive):
+    # Size of the primitive's vertex and index data in the buffer
+    index_size = 2 if len(primitive["positions"]) < 65536 else 4
+    size = primitive["indices"].size * index_size
+    for key in ("positions", "normals", "uvs"):
+        data = primitive[key]
+        if data is not None:
+            size += data.size * (4 if data.dtype.kind == "f" else data.itemsize)
+    return size
+
+
+def mesh_primitives(mesh, cache=None, stats=None):
+    if cache is None:
+        return build_primitives(read_mesh_loops(mesh))
+
+    start = time.perf_counter()
+    key = mesh_fingerprint(mesh)
+    cached = cache.load(key)
+    if cached is not None:
+        primitives, seconds = cached
+        stats["hits"] += 1
+        stats["saved"] += max(seconds - (time.perf_counter() - start), 0.0)
+        return primitives
+
+    primitives = build_primitives(read_mesh_loops(mesh))
+    cache.store(key, primitives, time.perf_counter() - start)
+    stats["misses"] += 1
+    return primitives
+
+
+def describe(stats):
+    text = "%d objects, %d triangles, %d bytes in %.2fs" % (
+        stats["objects"],
+        stats["triangles"],
+        stats["bytes"],
+        stats["seconds"],
+    )
+    if stats["skipped"]:
+        text += ", %d skipped" % stats["skipped"]
+    if instancing_used(stats):
+        text += ", %d unique meshes (%.1fx dedupe)" % (
+            stats["unique_meshes"],
+            stats["objects"] / stats["unique_meshes"],
+        )
+    if "quantized" in stats:
+        text += (
+            ", %d/%d meshes quantized, attributes %d -> %d bytes,"
+            " max error %.4f mm / %.2f° / %.6f uv"
+        ) % (
+            stats["quantized"],
+            stats["unique_meshes"],
+            stats["float_bytes"],
+            stats["quantized_bytes"],
+            stats["errors"]["position"] * 1000,
+            stats["errors"]["normal"],
+            stats["errors"]["uv"],
+        )
+    if "evaluated" in stats:
+        text += ", %d/%d evaluated meshes reused (%d subdivided in numpy)" % (
+            stats["reused"],
+            stats["reused"] + stats["evaluated"] + stats["subdivided"],
+            stats["subdivided"],
+        )
+    if "hits" in stats:
+        text += ", cache %d hits / %d misses, %.2fs saved" % (
+            stats["hits"],
+            stats["misses"],
+            stats["saved"],
+        )
+    return text
+
+
+def instancing_used(stats):
+    return 0 < stats.get("unique_meshes", 0) < stats["objects"]
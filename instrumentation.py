@@ -0,0 +1,287 @@
+import bpy
+import io
+import os
+import json
+import time
+import cProfile
+import pstats
+import tempfile
+import tracemalloc
+from collections import deque
+from bpy.types import Panel, Operator, PropertyGroup, WindowManager
+from bpy.props import BoolProperty, IntProperty, StringProperty, PointerProperty
+
+# Most recent calls of every instrumented operator, newest last
+records = deque(maxlen=500)
+
+# Scripts sharing this module, the panel stays registered while any is
+users = 0
+# Nested instrumented calls are timed, but only the outermost is profiled
+depth = 0
+
+
+def selection_counts(context):
+    objects = context.selected_objects
+    vertices = sum(len(o.data.vertices) for o in objects if o.type == "MESH")
+    return len(objects), vertices
+
+
+def write_log(path, record, limit):
+    # Append the record, first moving a log past limit bytes to path.1 so the
+    # log and its one backup stay bounded
+    try:
+        if limit and os.path.exists(path) and os.path.getsize(path) > limit:
+            os.replace(path, path + ".1")
+        with open(path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as error:
+        print("Could not write operator log %s: %s" % (path, error))
+
+
+def add_record(options, record):
+    records.append(record)
+    if options.log_path:
+        write_log(
+            bpy.path.abspath(options.log_path),
+            record,
+            options.log_limit * 1024 * 1024,
+        )
+
+
+def measure(operator, context, execute):
+    # Run execute and record wall time, peak traced memory and optionally a
+    # cProfile summary, with the selection size as context
+    global depth
+    options = context.window_manager.instrumentation
+    if not options.enabled:
+        return execute(operator, context)
+
+    objects, vertices = selection_counts(context)
+    tracing = options.track_memory and not tracemalloc.is_tracing()
+    profile = cProfile.Profile() if options.profile and depth == 0 else None
+
+    status = None
+    depth += 1
+    if tracing:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        if profile is not None:
+            status = profile.runcall(execute, operator, context)
+        else:
+            status = execute(operator, context)
+    finally:
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if tracing else None
+        if tracing:
+            tracemalloc.stop()
+        depth -= 1
+
+        record = {
+            "operator": operator.bl_idname,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seconds": seconds,
+            "peak_bytes": peak,
+            "objects": objects,
+            "vertices": vertices,
+            "status": sorted(status) if status is not None else ["ERROR"],
+        }
+        if profile is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(profile, stream=stream).sort_stats("cumulative")
+            stats.print_stats(options.profile_lines)
+            record["profile"] = stream.getvalue().strip()
+
+        add_record(options, record)
+        if status is not None and "RUNNING_MODAL" in status:
+            # Modal operators such as background exports finish later, time
+            # them again from here until modal returns
+            operator.instrument_start = (start, objects, vertices)
+
+    return status
+
+
+def measure_modal(operator, context, event, modal):
+    # Record a modal operator started under measure() once it finishes
+    status = modal(operator, context, event)
+    started = getattr(operator, "instrument_start", None)
+    if started is None or not status & {"FINISHED", "CANCELLED"}:
+        return status
+
+    operator.instrument_start = None
+    options = context.window_manager.instrumentation
+    if options.enabled:
+        start, objects, vertices = started
+        add_record(
+            options,
+            {
+                "operator": operator.bl_idname + " (modal)",
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "seconds": time.perf_counter() - start,
+                "peak_bytes": None,
+                "objects": objects,
+                "vertices": vertices,
+                "status": sorted(status),
+            },
+        )
+    return status
+
+
+def instrument(cls):
+    # Wrap the execute and modal of an operator class in measure(), once
+    execute = cls.__dict__.get("execute")
+    if execute is not None and not getattr(execute, "instrumented", False):
+
+        def wrapped(self, context):
+            return measure(self, context, execute)
+
+        wrapped.instrumented = True
+        cls.execute = wrapped
+
+    modal = cls.__dict__.get("modal")
+    if modal is not None and not getattr(modal, "instrumented", False):
+
+        def wrapped_modal(self, context, event):
+            return measure_modal(self, context, event, modal)
+
+        wrapped_modal.instrumented = True
+        cls.modal = wrapped_modal
+
+    return cls
+
+
+def slowest(count):
+    return sorted(records, key=lambda r: r["seconds"], reverse=True)[:count]
+
+
+class InstrumentationSettings(PropertyGroup):
+    enabled: BoolProperty(name="Record Operators", default=True)
+    track_memory: BoolProperty(
+        name="Track Peak Memory",
+        description="Trace Python allocations, which slows the operators down",
+        default=False,
+    )
+    profile: BoolProperty(name="cProfile", default=False)
+    profile_lines: IntProperty(name="Profile Lines", min=1, default=20)
+    log_path: StringProperty(
+        name="Log",
+        description="JSON lines file every record is appended to, empty to disable",
+        subtype="FILE_PATH",
+        default=os.path.join(tempfile.gettempdir(), "3dp_operators.jsonl"),
+    )
+    log_limit: IntProperty(
+        name="Log Limit (MB)",
+        description="Size at which the log is moved to a .1 backup and restarted",
+        min=1,
+        default=10,
+    )
+    rows: IntProperty(name="Rows", min=1, default=8)
+
+
+class TOOL_OT_clear_records(Operator):
+    bl_idname = "instrument.clear"
+    bl_label = "Clear"
+    bl_description = "Forget the recorded operator calls"
+
+    def execute(self, context):
+        records.clear()
+        return {"FINISHED"}
+
+
+class TOOL_OT_print_profile(Operator):
+    bl_idname = "instrument.print_profile"
+    bl_label = "Print Profile"
+    bl_description = "Print the profile of the slowest profiled call to the console"
+
+    @classmethod
+    def poll(cls, context):
+        return any("profile" in r for r in records)
+
+    def execute(self, context):
+        record = max((r for r in records if "profile" in r), key=lambda r: r["seconds"])
+        print(
+            "%s %.3fs\n%s" % (record["operator"], record["seconds"], record["profile"])
+        )
+        self.report({"INFO"}, "Printed profile of %s" % record["operator"])
+        return {"FINISHED"}
+
+
+class VIEW3D_PT_instrumentation(Panel):
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "3DPKBD"
+    bl_label = "Operator Timings"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context):
+        options = context.window_manager.instrumentation
+        layout = self.layout
+
+        row = layout.row()
+        row.prop(options, "enabled")
+        row.prop(options, "track_memory")
+        row = layout.row()
+        row.prop(options, "profile")
+        row.prop(options, "profile_lines")
+        layout.prop(options, "log_path")
+        layout.prop(options, "log_limit")
+
+        row = layout.row()
+        row.prop(options, "rows")
+        row.operator("instrument.clear")
+        layout.operator("instrument.print_profile")
+
+        box = layout.box()
+        if not records:
+            box.label(text="No operator calls recorded")
+        for record in slowest(options.rows):
+            box.label(
+                text="%s %.3fs%s, %d obj, %d verts"
+                % (
+                    record["operator"],
+                    record["seconds"],
+                    (
+                        ", %.1f MB" % (record["peak_bytes"] / (1024 * 1024))
+                        if record["peak_bytes"] is not None
+                        else ""
+                    ),
+                    record["objects"],
+                    record["vertices"],
+                )
+            )
+
+
+classes = (
+    InstrumentationSettings,
+    TOOL_OT_clear_records,
+    TOOL_OT_print_profile,
+    VIEW3D_PT_instrumentation,
+)
+
+
+def register():
+    global users
+    users += 1
+    if users > 1:
+        return
+
+    from bpy.utils import register_class
+
+    for cls in classes:
+        register_class(cls)
+
+    WindowManager.instrumentation = PointerProperty(type=InstrumentationSettings)
+
+
+def unregister():
+    global users
+    users -= 1
+    if users > 0:
+        return
+
+    from bpy.utils import unregister_class
+
+    for cls in reversed(classes):
+        unregister_class(cls)
+
+    del WindowManager.instrumentation
@@ -0,0 +1,48 @@
+import bpy
+import numpy as np
+
+from .coverage_render import ELEVATIONS
+
+
+def enum_value(struct, prop, identifier):
+    # Integer value foreach_set expects for an enum property
+    return struct.bl_rna.properties[prop].enum_items[identifier].value
+
+
+def turntable_schedule(steps, spacing, start=1, elevations=ELEVATIONS):
+    # Frames and (elevation, azimuth) in degrees for every elevation ring.
+    # Azimuth keeps increasing across rings, so the spin never reverses.
+    rings = len(elevations)
+    index = np.arange(rings * steps)
+    frames = start + index * spacing
+    angles = np.column_stack([np.repeat(elevations, steps), 360.0 * index / steps])
+    return frames, angles
+
+
+def bake_rotation(obj, frames, angles, interpolation="LINEAR", easing="AUTO"):
+    # Replace the X and Z rotation_euler F-curves of obj with one key per
+    # frame, written in bulk instead of one keyframe_insert per frame
+    animation = obj.animation_data or obj.animation_data_create()
+    if animation.action is None:
+        animation.action = bpy.data.actions.new(obj.name + "Action")
+    fcurves = animation.action.fcurves
+
+    count = len(frames)
+    for axis, column in ((0, 0), (2, 1)):
+        curve = fcurves.find("rotation_euler", index=axis)
+        if curve is None:
+            curve = fcurves.new(
+                "rotation_euler", index=axis, action_group="Object Transforms"
+            )
+        points = curve.keyframe_points
+        points.clear()
+        points.add(count)
+
+        co = np.column_stack([frames, np.radians(angles[:, column])])
+        points.foreach_set("co", co.astype(np.float32).ravel())
+        for prop, identifier in (("interpolation", interpolation), ("easing", easing)):
+            value = enum_value(bpy.types.Keyframe, prop, identifier)
+            points.foreach_set(prop, np.full(count, value, dtype=np.int32))
+        curve.update()
+
+    return count
@@ -0,0 +1,413 @@
+import numpy as np
+
+# Generic attribute types the arrays carry, with their foreach key and width
+ATTRIBUTE_TYPES = {
+    "FLOAT": ("value", 1, np.float32),
+    "INT": ("value", 1, np.int32),
+    "INT8": ("value", 1, np.int8),
+    "BOOLEAN": ("value", 1, bool),
+    "FLOAT2": ("vector", 2, np.float32),
+    "FLOAT_VECTOR": ("vector", 3, np.float32),
+    "FLOAT_COLOR": ("color", 4, np.float32),
+    "BYTE_COLOR": ("color", 4, np.float32),
+    "INT32_2D": ("value", 2, np.int32),
+    "QUATERNION": ("value", 4, np.float32),
+}
+# Attributes already read through the vertex, polygon and UV properties
+BUILTIN_ATTRIBUTES = ("position", "material_index", "sharp_face")
+
+
+def read_coords(mesh):
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    return co.reshape(-1, 3)
+
+
+def write_coords(mesh, co):
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(co, dtype=np.float32).ravel())
+    mesh.update()
+
+
+def floor_height(co, precision=6):
+    # Lowest z below the ground plane, zero if the mesh already sits above it
+    if not len(co):
+        return 0.0
+    return min(round(float(co[:, 2].min()), precision), 0.0)
+
+
+def drop_to_floor(co, scale):
+    # Scale about the origin and lift the result so its lowest point rests on z=0
+    height = floor_height(co)
+    co *= scale
+    co[:, 2] += abs(height) * scale
+    return co
+
+
+def extra_attributes(mesh):
+    uv_names = set(layer.name for layer in mesh.uv_layers)
+    return [
+        a
+        for a in mesh.attributes
+        if not a.name.startswith(".")
+        and a.name not in BUILTIN_ATTRIBUTES
+        and a.name not in uv_names
+    ]
+
+
+def round_trip_safe(obj):
+    # The arrays carry geometry, UVs, seams and generic attributes, but vertex
+    # groups, shape keys and custom normals only survive Blender's own tools
+    mesh = obj.data
+    if obj.vertex_groups or mesh.shape_keys is not None or mesh.has_custom_normals:
+        return False
+    return all(a.data_type in ATTRIBUTE_TYPES for a in extra_attributes(mesh))
+
+
+def read_attributes(mesh):
+    # Generic attributes keyed "DOMAIN/TYPE/name", so bundles can rebuild them
+    attributes = {}
+    for attribute in extra_attributes(mesh):
+        if attribute.data_type not in ATTRIBUTE_TYPES:
+            continue
+        key, width, dtype = ATTRIBUTE_TYPES[attribute.data_type]
+        values = np.empty(len(attribute.data) * width, dtype=dtype)
+        attribute.data.foreach_get(key, values)
+        if width > 1:
+            values = values.reshape(-1, width)
+        name = "%s/%s/%s" % (attribute.domain, attribute.data_type, attribute.name)
+        attributes[name] = values
+    return attributes
+
+
+def read_mesh_arrays(mesh):
+    # Flat copies of everything needed to rebuild the mesh
+    num_edges = len(mesh.edges)
+    num_loops = len(mesh.loops)
+    num_polys = len(mesh.polygons)
+
+    edges = np.empty(num_edges * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    loop_verts = np.empty(num_loops, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+    loop_start = np.empty(num_polys, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    loop_total = np.empty(num_polys, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    material_index = np.empty(num_polys, dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", material_index)
+    use_smooth = np.empty(num_polys, dtype=bool)
+    mesh.polygons.foreach_get("use_smooth", use_smooth)
+    use_seam = np.empty(num_edges, dtype=bool)
+    mesh.edges.foreach_get("use_seam", use_seam)
+
+    uvs = {}
+    for layer in mesh.uv_layers:
+        uv = np.empty(num_loops * 2, dtype=np.float32)
+        layer.data.foreach_get("uv", uv)
+        uvs[layer.name] = uv.reshape(-1, 2)
+
+    return {
+        "co": read_coords(mesh),
+        "edges": edges.reshape(-1, 2),
+        "loop_verts": loop_verts,
+        "loop_start": loop_start,
+        "loop_total": loop_total,
+        "material_index": material_index,
+        "use_smooth": use_smooth,
+        "use_seam": use_seam,
+        "uvs": uvs,
+        "attributes": read_attributes(mesh),
+    }
+
+
+def edge_rows(mesh, edges):
+    # calc_edges may reorder and add edges, find the source row of every edge
+    # of the mesh, len(edges) for edges the source did not have
+    current = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", current)
+    size = max(len(mesh.vertices), 1)
+
+    def edge_keys(pairs):
+        pairs = np.sort(pairs.reshape(-1, 2).astype(np.int64), axis=1)
+        return pairs[:, 0] * size + pairs[:, 1]
+
+    keys = edge_keys(current)
+    if not len(edges):
+        return np.zeros(len(keys), dtype=np.int64)
+    source = edge_keys(edges)
+    order = np.argsort(source, kind="stable")
+    found = np.minimum(np.searchsorted(source[order], keys), len(order) - 1)
+    rows = order[found]
+    rows[source[rows] != keys] = len(edges)
+    return rows
+
+
+def write_attributes(mesh, attributes, rows):
+    for name, values in attributes.items():
+        domain, data_type, name = name.split("/", 2)
+        key, _, dtype = ATTRIBUTE_TYPES[data_type]
+        if domain == "EDGE":
+            # Edges calc_edges added get zero, like a new attribute would
+            padding = np.zeros((1,) + values.shape[1:], dtype=values.dtype)
+            values = np.concatenate((values, padding))[rows]
+        attribute = mesh.attributes.get(name) or mesh.attributes.new(
+            name, data_type, domain
+        )
+        attribute.data.foreach_set(
+            key, np.ascontiguousarray(values, dtype=dtype).ravel()
+        )
+
+
+def write_mesh_arrays(mesh, arrays):
+    # Fill an empty mesh from arrays in the layout returned by read_mesh_arrays
+    mesh.vertices.add(len(arrays["co"]))
+    mesh.vertices.foreach_set("co", arrays["co"].astype(np.float32).ravel())
+    mesh.edges.add(len(arrays["edges"]))
+    mesh.edges.foreach_set("vertices", arrays["edges"].astype(np.int32).ravel())
+    mesh.loops.add(len(arrays["loop_verts"]))
+    mesh.loops.foreach_set("vertex_index", arrays["loop_verts"].astype(np.int32))
+    mesh.polygons.add(len(arrays["loop_start"]))
+    mesh.polygons.foreach_set("loop_start", arrays["loop_start"].astype(np.int32))
+    try:
+        mesh.polygons.foreach_set("loop_total", arrays["loop_total"].astype(np.int32))
+    except AttributeError:
+        # Read-only since Blender 4.0, derived from loop_start
+        pass
+    mesh.polygons.foreach_set(
+        "material_index", arrays["material_index"].astype(np.int32)
+    )
+    mesh.polygons.foreach_set("use_smooth", arrays["use_smooth"].astype(bool))
+
+    for name, uv in arrays["uvs"].items():
+        layer = mesh.uv_layers.get(name) or mesh.uv_layers.new(name=name)
+        layer.data.foreach_set("uv", uv.astype(np.float32).ravel())
+
+    mesh.update(calc_edges=True)
+
+    rows = edge_rows(mesh, arrays["edges"])
+    if "use_seam" in arrays:
+        use_seam = np.concatenate((arrays["use_seam"].astype(bool), [False]))
+        mesh.edges.foreach_set("use_seam", use_seam[rows])
+    write_attributes(mesh, arrays.get("attributes", {}), rows)
+
+    mesh.validate()
+
+
+def connected_components(num_verts, edges):
+    # Union-find over the edge list: hook every root onto the smallest root it
+    # shares an edge with, then compress paths until each edge joins one root
+    parent = np.arange(num_verts, dtype=np.int64)
+    if len(edges):
+        a = edges[:, 0].astype(np.int64)
+        b = edges[:, 1].astype(np.int64)
+        while True:
+            root_a = parent[a]
+            root_b = parent[b]
+            low = np.minimum(root_a, root_b)
+            high = np.maximum(root_a, root_b)
+            pending = low != high
+            if not pending.any():
+                break
+            np.minimum.at(parent, high[pending], low[pending])
+            while True:
+                grand = parent[parent]
+                if np.array_equal(grand, parent):
+                    break
+                parent = grand
+
+    # Roots are the lowest vertex index of each part, so part 0 holds vertex 0
+    _, labels = np.unique(parent, return_inverse=True)
+    return labels
+
+
+def _group(labels, count):
+    order = np.argsort(labels, kind="stable")
+    sizes = np.bincount(labels, minlength=count)
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    return order, offsets
+
+
+def split_mesh_arrays(arrays, labels, min_verts=0):
+    # Split mesh arrays into one set of arrays per connected component
+    num_parts = int(labels.max()) + 1 if len(labels) else 0
+    poly_labels = labels[arrays["loop_verts"][arrays["loop_start"]]]
+    edge_labels = labels[arrays["edges"][:, 0]]
+
+    vert_order, vert_offsets = _group(labels, num_parts)
+    edge_order, edge_offsets = _group(edge_labels, num_parts)
+    poly_order, poly_offsets = _group(poly_labels, num_parts)
+
+    # Index of every vertex inside its own part
+    local_index = np.empty(len(labels), dtype=np.int32)
+    local_index[vert_order] = np.arange(len(labels)) - vert_offsets[labels[vert_order]]
+
+    # Loops reordered to follow the grouped polygons
+    totals = arrays["loop_total"][poly_order]
+    starts = arrays["loop_start"][poly_order]
+    new_starts = np.concatenate(([0], np.cumsum(totals)[:-1])).astype(np.int64)
+    loop_order = np.repeat(starts - new_starts, totals) + np.arange(totals.sum())
+    loop_offsets = np.concatenate(([0], np.cumsum(totals)))[poly_offsets]
+
+    parts = []
+    for part in range(num_parts):
+        v0, v1 = vert_offsets[part], vert_offsets[part + 1]
+        if v1 - v0 < min_verts:
+            continue
+        verts = vert_order[v0:v1]
+        edges = edge_order[edge_offsets[part] : edge_offsets[part + 1]]
+        polys = poly_order[poly_offsets[part] : poly_offsets[part + 1]]
+        loops = loop_order[loop_offsets[part] : loop_offsets[part + 1]]
+        loop_start = new_starts[poly_offsets[part] : poly_offsets[part + 1]]
+
+        rows = {"POINT": verts, "EDGE": edges, "FACE": polys, "CORNER": loops}
+        parts.append(
+            {
+                "co": arrays["co"][verts],
+                "edges": local_index[arrays["edges"][edges]],
+                "loop_verts": local_index[arrays["loop_verts"][loops]],
+                "loop_start": loop_start - loop_offsets[part],
+                "loop_total": arrays["loop_total"][polys],
+                "material_index": arrays["material_index"][polys],
+                "use_smooth": arrays["use_smooth"][polys],
+                "use_seam": arrays["use_seam"][edges],
+                "uvs": {name: uv[loops] for name, uv in arrays["uvs"].items()},
+                "attributes": {
+                    name: values[rows[name.split("/", 1)[0]]]
+                    for name, values in arrays["attributes"].items()
+                },
+            }
+        )
+
+    return parts
+
+
+def separate_loose_operator(obj, min_verts=0):
+    # mesh.separate keeps vertex groups, shape keys and custom normals, parts
+    # under min_verts are removed afterwards
+    import bpy
+
+    before = set(bpy.data.objects)
+    with bpy.context.temp_override(
+        active_object=obj,
+        object=obj,
+        selected_objects=[obj],
+        selected_editable_objects=[obj],
+    ):
+        bpy.ops.object.mode_set(mode="EDIT")
+        bpy.ops.mesh.select_all(action="SELECT")
+        bpy.ops.mesh.separate(type="LOOSE")
+        bpy.ops.object.mode_set(mode="OBJECT")
+
+    objects = [obj] + [o for o in bpy.data.objects if o not in before]
+    kept = [o for o in objects if len(o.data.vertices) >= min_verts]
+    if not kept:
+        # Leave the source whole, like the array path does
+        return []
+    for small in objects:
+        if small not in kept:
+            mesh = small.data
+            bpy.data.objects.remove(small)
+            if not mesh.users:
+                bpy.data.meshes.remove(mesh)
+    return kept
+
+
+def empty_like(mesh):
+    # Empty mesh with the materials and shading settings of mesh, for
+    # write_mesh_arrays to fill. mesh.copy() would duplicate the whole source
+    # geometry once per part.
+    import bpy
+
+    new_mesh = bpy.data.meshes.new(mesh.name)
+    for material in mesh.materials:
+        new_mesh.materials.append(material)
+    for name in ("use_auto_smooth", "auto_smooth_angle"):
+        # Mesh properties before Blender 4.1
+        if hasattr(mesh, name):
+            setattr(new_mesh, name, getattr(mesh, name))
+    return new_mesh
+
+
+def separate_loose(obj, min_verts=0):
+    # Headless replacement for mesh.separate(type="LOOSE"), the first kept part
+    # stays on obj and every other part gets a copy of the object. Returns an
+    # empty list and leaves obj untouched when no part has min_verts vertices.
+    if not round_trip_safe(obj):
+        return separate_loose_operator(obj, min_verts)
+
+    mesh = obj.data
+    arrays = read_mesh_arrays(mesh)
+    labels = connected_components(len(arrays["co"]), arrays["edges"])
+    parts = split_mesh_arrays(arrays, labels, min_verts)
+    if not parts:
+        return []
+
+    objects = [obj]
+    for part in parts[1:]:
+        new_mesh = empty_like(mesh)
+        write_mesh_arrays(new_mesh, part)
+        if len(new_mesh.uv_layers):
+            new_mesh.uv_layers.active_index = mesh.uv_layers.active_index
+
+        new_obj = obj.copy()
+        new_obj.data = new_mesh
+        for collection in obj.users_collection:
+            collection.objects.link(new_obj)
+        new_obj.select_set(obj.select_get())
+        objects.append(new_obj)
+
+    mesh.clear_geometry()
+    write_mesh_arrays(mesh, parts[0])
+
+    return objects
+
+
+# Keys of read_mesh_arrays holding a dict of arrays by name
+NESTED_KEYS = ("uvs", "attributes")
+
+
+def flatten_arrays(arrays):
+    # Every array of the mesh with a path like "uvs/UVMap", sorted by path
+    flat = {}
+    for key, value in arrays.items():
+        if key in NESTED_KEYS:
+            for name, array in value.items():
+                flat["%s/%s" % (key, name)] = array
+        else:
+            flat[key] = value
+    return dict(sorted(flat.items()))
+
+
+def save_mesh_bundle(path, meshes):
+    # Store several meshes' arrays in one .npz for handing to worker processes
+    data = {}
+    for index, arrays in enumerate(meshes):
+        for key, value in flatten_arrays(arrays).items():
+            data["%d/%s" % (index, key)] = value
+    np.savez(path, count=len(meshes), **data)
+
+
+def load_mesh_bundle(path):
+    with np.load(path) as data:
+        meshes = [{key: {} for key in NESTED_KEYS} for _ in range(int(data["count"]))]
+        for key in data.files:
+            if key == "count":
+                continue
+            index, name = key.split("/", 1)
+            nested, _, rest = name.partition("/")
+            if nested in NESTED_KEYS and rest:
+                meshes[int(index)][nested][rest] = data[key]
+            else:
+                meshes[int(index)][name] = data[key]
+    return meshes
+
+
+def balance_chunks(sizes, count):
+    # Greedy largest-first assignment of items to count roughly equal chunks
+    chunks = [[] for _ in range(max(1, min(count, len(sizes))))]
+    loads = [0] * len(chunks)
+    for index in sorted(range(len(sizes)), key=lambda i: -sizes[i]):
+        lightest = loads.index(min(loads))
+        chunks[lightest].append(index)
+        loads[lightest] += sizes[index]
+    return [sorted(chunk) for chunk in chunks if chunk]
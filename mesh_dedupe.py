@@ -0,0 +1,117 @@
+import hashlib
+
+import numpy as np
+
+# Largest difference between a member's corner normals and the prototype's,
+# rotated onto it, that still counts as the same shading
+NORMAL_TOLERANCE = 1e-3
+
+
+def read_corner_normals(mesh):
+    # Split normals, which already account for smooth faces, sharp edges and
+    # custom normals
+    normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+    if hasattr(mesh, "corner_normals"):
+        mesh.corner_normals.foreach_get("vector", normals)
+    else:
+        mesh.calc_normals_split()
+        mesh.loops.foreach_get("normal", normals)
+    return normals.reshape(-1, 3)
+
+
+def read_shape(mesh):
+    # Arrays that decide whether two meshes can share one glTF mesh
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+    loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    material_index = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", material_index)
+    use_smooth = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get("use_smooth", use_smooth)
+
+    uv = None
+    if mesh.uv_layers.active is not None:
+        uv = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        mesh.uv_layers.active.data.foreach_get("uv", uv)
+
+    return {
+        "co": co.reshape(-1, 3).astype(np.float64),
+        "loop_verts": loop_verts,
+        "loop_start": loop_start,
+        "material_index": material_index,
+        "use_smooth": use_smooth,
+        "normals": read_corner_normals(mesh).astype(np.float64),
+        "uv": uv,
+    }
+
+
+def shape_key(shape, tolerance):
+    # Invariant under rotation and translation: topology plus the sorted
+    # distances of every vertex from the centroid, quantized well above the
+    # tolerance so float noise lands in the same bucket
+    co = shape["co"]
+    radii = np.sort(np.linalg.norm(co - co.mean(axis=0), axis=1)) if len(co) else co
+    buckets = np.round(radii / (tolerance * 100)).astype(np.int64)
+
+    digest = hashlib.blake2b(digest_size=16)
+    for key in ("loop_verts", "loop_start", "material_index", "use_smooth"):
+        digest.update(np.ascontiguousarray(shape[key]).data)
+    digest.update(buckets.data)
+    digest.update(b"uv" if shape["uv"] is not None else b"")
+    return digest.hexdigest()
+
+
+def rigid_transform(source, target):
+    # Kabsch fit of the rotation and translation taking source onto target,
+    # vertices are matched by index
+    source_center = source.mean(axis=0)
+    target_center = target.mean(axis=0)
+    covariance = (source - source_center).T @ (target - target_center)
+    u, _, vt = np.linalg.svd(covariance)
+    correction = np.diag([1.0, 1.0, np.sign(np.linalg.det(vt.T @ u.T))])
+    rotation = vt.T @ correction @ u.T
+
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation
+    matrix[:3, 3] = target_center - rotation @ source_center
+    error = np.abs(source @ rotation.T + matrix[:3, 3] - target).max()
+    return matrix, error
+
+
+def same_shading(prototype, shape, matrix):
+    # Sharp edges and custom normals only show in the corner normals, which
+    # have to match once rotated like the vertices
+    rotated = prototype["normals"] @ matrix[:3, :3].T
+    return np.abs(rotated - shape["normals"]).max() <= NORMAL_TOLERANCE
+
+
+def group_instances(shapes, tolerance=1e-5):
+    # Groups of congruent meshes, each member paired with the matrix that maps
+    # the group prototype's local space onto its own
+    buckets = {}
+    groups = []
+
+    for index, shape in enumerate(shapes):
+        candidates = buckets.setdefault(shape_key(shape, tolerance), [])
+        for group in candidates:
+            prototype = shapes[group["prototype"]]
+            if shape["uv"] is not None and not np.allclose(
+                shape["uv"], prototype["uv"], atol=tolerance
+            ):
+                continue
+            if not len(shape["co"]):
+                group["members"].append((index, np.eye(4)))
+                break
+            matrix, error = rigid_transform(prototype["co"], shape["co"])
+            if error <= tolerance and same_shading(prototype, shape, matrix):
+                group["members"].append((index, matrix))
+                break
+        else:
+            group = {"prototype": index, "members": [(index, np.eye(4))]}
+            candidates.append(group)
+            groups.append(group)
+
+    return groups
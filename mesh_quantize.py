@@ -0,0 +1,107 @@
+import numpy as np
+
+INT16_MAX = 32767
+INT8_MAX = 127
+UINT16_MAX = 65535
+
+
+def morton_codes(points, bits=10):
+    # Interleave the bits of the quantized coordinates into one Z-order key
+    points = np.asarray(points, dtype=np.float64)
+    low = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - low, 1e-12)
+    cells = ((points - low) / extent * ((1 << bits) - 1)).astype(np.uint64)
+
+    codes = np.zeros(len(points), dtype=np.uint64)
+    for bit in range(bits):
+        for axis in range(3):
+            value = (cells[:, axis] >> np.uint64(bit)) & np.uint64(1)
+            codes |= value << np.uint64(3 * bit + axis)
+    return codes
+
+
+def optimize_primitive(primitive):
+    # Sort triangles along a Z-order curve for post-transform cache locality,
+    # then renumber vertices in first-use order for fetch locality
+    triangles = primitive["indices"].reshape(-1, 3)
+    if not len(triangles):
+        return primitive
+
+    centroids = primitive["positions"][triangles].mean(axis=1)
+    triangles = triangles[np.argsort(morton_codes(centroids), kind="stable")]
+
+    corners = triangles.ravel()
+    used, first = np.unique(corners, return_index=True)
+    order = used[np.argsort(first)]
+    remap = np.empty(len(primitive["positions"]), dtype=np.int64)
+    remap[order] = np.arange(len(order))
+
+    optimized = dict(primitive)
+    for key in ("positions", "normals", "uvs"):
+        if primitive[key] is not None:
+            optimized[key] = primitive[key][order]
+    optimized["indices"] = remap[corners]
+    return optimized
+
+
+def quantize_mesh(primitives, max_error):
+    # KHR_mesh_quantization layout: int16 positions relative to one uniform
+    # dequantization transform per mesh, int8 normals and uint16 UVs, padded
+    # to a 4 byte stride. Positions that would exceed max_error stay float,
+    # as do UVs outside the 0-1 range.
+    errors = {"position": 0.0, "normal": 0.0, "uv": 0.0}
+    if not primitives:
+        return primitives, None, errors
+
+    positions = np.concatenate([p["positions"] for p in primitives]).astype(np.float64)
+    center = (positions.min(axis=0) + positions.max(axis=0)) / 2.0
+    scale = max(float(np.abs(positions - center).max()), 1e-12)
+    grids = [
+        np.round((p["positions"] - center) / scale * INT16_MAX) for p in primitives
+    ]
+    error = max(
+        float(np.abs(grid / INT16_MAX * scale + center - p["positions"]).max())
+        for grid, p in zip(grids, primitives)
+    )
+    # Integer positions times this scale plus center restore the originals.
+    # Positions left as floats are exact, so only quantized ones count.
+    dequantize = None
+    if error <= max_error:
+        dequantize = (center, scale / INT16_MAX)
+        errors["position"] = error
+
+    quantized = []
+    for grid, primitive in zip(grids, primitives):
+        result = dict(primitive)
+        if dequantize is not None:
+            result["positions"] = pad(grid.astype(np.int16), 4)
+
+        normals = primitive["normals"].astype(np.float64)
+        normal_grid = np.round(np.clip(normals, -1.0, 1.0) * INT8_MAX)
+        restored = (
+            normal_grid / np.maximum(np.linalg.norm(normal_grid, axis=1), 1.0)[:, None]
+        )
+        cosines = np.clip((restored * normals).sum(axis=1), -1.0, 1.0)
+        errors["normal"] = max(
+            errors["normal"], float(np.degrees(np.arccos(cosines)).max())
+        )
+        result["normals"] = pad(normal_grid.astype(np.int8), 4)
+
+        uvs = primitive["uvs"]
+        if uvs is not None and uvs.min() >= 0.0 and uvs.max() <= 1.0:
+            uv_grid = np.round(uvs.astype(np.float64) * UINT16_MAX)
+            errors["uv"] = max(
+                errors["uv"], float(np.abs(uv_grid / UINT16_MAX - uvs).max())
+            )
+            result["uvs"] = uv_grid.astype(np.uint16)
+
+        quantized.append(result)
+
+    return quantized, dequantize, errors
+
+
+def pad(array, width):
+    # Extra zero components so every vertex starts on a 4 byte boundary
+    padded = np.zeros((len(array), width), dtype=array.dtype)
+    padded[:, : array.shape[1]] = array
+    return padded
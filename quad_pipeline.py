@@ -0,0 +1,96 @@
+import os
+import json
+import tempfile
+import numpy as np
+
+from .mesh_arrays import (
+    read_mesh_arrays,
+    write_mesh_arrays,
+    save_mesh_bundle,
+    load_mesh_bundle,
+    balance_chunks,
+    round_trip_safe,
+)
+from .worker_pool import blender_command, run_jobs
+
+SUBSURF_SETTINGS = (
+    "levels",
+    "quality",
+    "subdivision_type",
+    "uv_smooth",
+    "boundary_smooth",
+    "use_creases",
+    "use_custom_normals",
+    "use_limit_surface",
+)
+
+
+def subsurf_settings(modifier):
+    return {
+        name: getattr(modifier, name)
+        for name in SUBSURF_SETTINGS
+        if hasattr(modifier, name)
+    }
+
+
+def bakeable(obj):
+    # Workers only see the mesh arrays and the subdivision, so anything the
+    # arrays can't carry or other modifiers depend on keeps its modifier.
+    # Creases, seams and other attributes travel with the arrays.
+    if obj.data.users > 1 or not round_trip_safe(obj):
+        return False
+    return [m.type for m in obj.modifiers] == ["SUBSURF"]
+
+
+def subdivide_objects_parallel(objects, workers=None):
+    # Apply each object's subdivision in background Blender processes, one
+    # balanced chunk per worker, and write the results back in bulk
+    objects = list(objects)
+    if not objects:
+        return
+
+    sources = []
+    for obj in objects:
+        arrays = read_mesh_arrays(obj.data)
+        arrays["subsurf"] = np.array(json.dumps(subsurf_settings(obj.modifiers[0])))
+        sources.append(arrays)
+
+    # Output grows by 4x per level, so weigh chunks by the expected result
+    chunks = balance_chunks(
+        [
+            len(a["loop_verts"]) * 4 ** o.modifiers[0].levels
+            for a, o in zip(sources, objects)
+        ],
+        workers or os.cpu_count() or 1,
+    )
+    script = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "subdivide_worker.py"
+    )
+    results = [None] * len(objects)
+
+    with tempfile.TemporaryDirectory(prefix="3dp_subd_") as tmp:
+        commands = []
+        log_paths = []
+        outputs = []
+        for number, chunk in enumerate(chunks):
+            source = os.path.join(tmp, "in_%d.npz" % number)
+            outputs.append(os.path.join(tmp, "out_%d.npz" % number))
+            log_paths.append(os.path.join(tmp, "worker_%d.log" % number))
+            save_mesh_bundle(source, [sources[i] for i in chunk])
+            commands.append(blender_command(script, [source, outputs[-1]]))
+
+        jobs = run_jobs(commands, log_paths, len(commands))
+
+        for chunk, job, output in zip(chunks, jobs, outputs):
+            if job["returncode"] != 0 or not os.path.exists(output):
+                with open(job["log"]) as log:
+                    raise RuntimeError(
+                        "Subdivision worker failed:\n" + log.read()[-2000:]
+                    )
+            for i, arrays in zip(chunk, load_mesh_bundle(output)):
+                results[i] = arrays
+
+    for obj, arrays in zip(objects, results):
+        obj.data.clear_geometry()
+        write_mesh_arrays(obj.data, arrays)
+        obj.modifiers.remove(obj.modifiers[0])
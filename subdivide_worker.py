@@ -0,0 +1,65 @@
+"""Subdivision apply worker, run as a background Blender process:
+
+blender -b --python subdivide_worker.py -- INPUT.npz OUTPUT.npz
+"""
+
+import bpy
+import os
+import sys
+import importlib
+import json
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+if not __package__:
+    # Blender runs this file by path, make it a module of the add-on package
+    # for the relative imports
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+    __package__ = os.path.basename(PACKAGE_DIR)
+    importlib.import_module(__package__)
+
+from .mesh_arrays import (
+    read_mesh_arrays,
+    write_mesh_arrays,
+    load_mesh_bundle,
+    save_mesh_bundle,
+)
+
+
+def subdivide_arrays(arrays, settings, obj):
+    # Evaluate the subdivision through the depsgraph, the same code path
+    # modifier_apply uses
+    obj.data.clear_geometry()
+    write_mesh_arrays(obj.data, arrays)
+    modifier = obj.modifiers[0]
+    for name, value in settings.items():
+        setattr(modifier, name, value)
+
+    evaluated = obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
+    result = read_mesh_arrays(evaluated.to_mesh())
+    evaluated.to_mesh_clear()
+    return result
+
+
+def subdivide_bundle(meshes):
+    scratch = bpy.data.meshes.new("3DPSubdivisionScratch")
+    obj = bpy.data.objects.new("3DPSubdivisionScratch", scratch)
+    bpy.context.scene.collection.objects.link(obj)
+    obj.modifiers.new("Subdivision", "SUBSURF")
+
+    results = []
+    for arrays in meshes:
+        settings = json.loads(str(arrays.pop("subsurf")))
+        results.append(subdivide_arrays(arrays, settings, obj))
+
+    bpy.data.objects.remove(obj)
+    bpy.data.meshes.remove(scratch)
+    return results
+
+
+def main():
+    source, output = sys.argv[sys.argv.index("--") + 1 :]
+    save_mesh_bundle(output, subdivide_bundle(load_mesh_bundle(source)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import numpy as np
+from math import radians
+
+# Orthographic cameras used by the unwrap operators: rotation (XYZ euler),
+# location and ortho_scale of the "3DPCamera" for every direction
+PROJECTIONS = {
+    "side": ((radians(90), 0.0, radians(-90)), (-9.4902, 0.0000, 0.0000), 2),
+    "top": ((radians(6), 0.0, 0.0), (0.000, 0.6666, 5.0786), 5),
+    "bottom": ((radians(180), 0.0, 0.0), (0.0000, -1.1414, -6.0376), 5),
+}
+DIRECTIONS = ("side", "top", "bottom")
+
+
+def euler_to_matrix(rotation):
+    # XYZ euler order, same as mathutils.Euler(rotation, "XYZ").to_matrix()
+    x, y, z = rotation
+    cx, sx = np.cos(x), np.sin(x)
+    cy, sy = np.cos(y), np.sin(y)
+    cz, sz = np.cos(z), np.sin(z)
+    rx = np.array([[1, 0, 0], [0, cx, -sx], [0, sx, cx]])
+    ry = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    rz = np.array([[cz, -sz, 0], [sz, cz, 0], [0, 0, 1]])
+    return rz @ ry @ rx
+
+
+def aspect(resolution_x, resolution_y):
+    if resolution_x > resolution_y:
+        return np.array([1.0, resolution_x / resolution_y])
+    return np.array([resolution_y / resolution_x, 1.0])
+
+
+def project_ortho(co, direction, matrix_world=None, resolution=(1920, 1080)):
+    # Matches uv.project_from_view(camera_bounds=True, correct_aspect=False,
+    # scale_to_bounds=False) looking through the direction's camera
+    rotation, location, ortho_scale = PROJECTIONS[direction]
+    co = np.asarray(co, dtype=np.float64)
+    if matrix_world is not None:
+        matrix_world = np.asarray(matrix_world, dtype=np.float64)
+        co = co @ matrix_world[:3, :3].T + matrix_world[:3, 3]
+
+    # World to camera space is the transposed rotation for an unscaled camera
+    local = (co - np.asarray(location)) @ euler_to_matrix(rotation)
+    return local[:, :2] * (aspect(*resolution) / ortho_scale) + 0.5
+
+
+def classify_faces(normals, matrix_world=None, angle=radians(45)):
+    # Faces within angle of straight up are "top", of straight down "bottom",
+    # everything else "side"
+    normals = np.asarray(normals, dtype=np.float64)
+    if matrix_world is not None:
+        normal_matrix = np.linalg.inv(np.asarray(matrix_world)[:3, :3])
+        normals = normals @ normal_matrix
+        normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+
+    threshold = np.cos(angle)
+    labels = np.zeros(len(normals), dtype=np.int8)
+    labels[normals[:, 2] >= threshold] = DIRECTIONS.index("top")
+    labels[normals[:, 2] <= -threshold] = DIRECTIONS.index("bottom")
+    return labels
+
+
+def read_uv_arrays(mesh):
+    if not mesh.uv_layers:
+        mesh.uv_layers.new()
+
+    num_loops = len(mesh.loops)
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    loop_verts = np.empty(num_loops, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    uv = np.empty(num_loops * 2, dtype=np.float32)
+    mesh.uv_layers.active.data.foreach_get("uv", uv)
+
+    return co.reshape(-1, 3), loop_verts, loop_total, uv.reshape(-1, 2)
+
+
+def write_uvs(mesh, uv):
+    mesh.uv_layers.active.data.foreach_set("uv", uv.ravel())
+    mesh.update()
+
+
+def project_mesh_uvs(obj, direction, resolution, only_selected=True):
+    # Write the projection into the active UV layer for the selected faces
+    mesh = obj.data
+    co, loop_verts, loop_total, uv = read_uv_arrays(mesh)
+
+    select = np.ones(len(mesh.polygons), dtype=bool)
+    if only_selected:
+        mesh.polygons.foreach_get("select", select)
+    loops = np.repeat(select, loop_total)
+
+    matrix_world = np.array(obj.matrix_world)
+    uv[loops] = project_ortho(
+        co[loop_verts[loops]], direction, matrix_world, resolution
+    )
+    write_uvs(mesh, uv)
+
+    return int(loops.sum())
+
+
+def auto_unwrap_object(obj, resolution, angle=radians(45)):
+    # Classify every face by normal and apply the matching projection to all
+    # of them with a single write, no Edit Mode or selection needed
+    mesh = obj.data
+    co, loop_verts, loop_total, uv = read_uv_arrays(mesh)
+
+    normals = np.empty(len(mesh.polygons) * 3, dtype=np.float32)
+    mesh.polygons.foreach_get("normal", normals)
+    matrix_world = np.array(obj.matrix_world)
+    labels = classify_faces(normals.reshape(-1, 3), matrix_world, angle)
+    loop_labels = np.repeat(labels, loop_total)
+
+    counts = {}
+    for index, direction in enumerate(DIRECTIONS):
+        loops = loop_labels == index
+        counts[direction] = int((labels == index).sum())
+        if counts[direction]:
+            uv[loops] = project_ortho(
+                co[loop_verts[loops]], direction, matrix_world, resolution
+            )
+    write_uvs(mesh, uv)
+
+    return counts
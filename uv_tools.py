@@ -0,0 +1,255 @@
+import bpy
+import time
+from math import radians
+from bpy.types import Panel, Scene, Operator, PropertyGroup
+from bpy.props import StringProperty, FloatProperty, BoolProperty, PointerProperty
+
+from . import instrumentation
+
+# Scripts sharing these operators, they stay registered while any is
+users = 0
+
+
+class UVSettings(PropertyGroup):
+    uv_angle: FloatProperty(
+        name="Top/Bottom Angle",
+        description="Faces within this angle of vertical are projected top or bottom",
+        min=0.0,
+        default=45.0,
+        max=90.0,
+    )
+
+
+class TOOL_OT_3dp_rename(Operator):
+    bl_idname = "3dp.rename"
+    bl_label = "rename"
+    bl_description = "set name of object data"
+    bl_options = {"REGISTER", "UNDO"}
+    foo: StringProperty(name="Name")
+
+    @classmethod
+    def poll(cls, context):
+        return len(context.selected_objects) > 0
+
+    def execute(self, context):
+        selected = context.selected_objects
+        for obj in selected:
+            obj.name = self.foo
+            obj.data.name = self.foo
+
+        self.report({"INFO"}, "Object renamed: %r" % self.foo)
+
+        return {"FINISHED"}
+
+
+class TOOL_OT_3dp_unwrap(Operator):
+    bl_idname = "3dp.unwrap"
+    bl_label = "unwrap uv"
+    bl_description = "project uv from view"
+    bl_options = {"REGISTER", "UNDO"}
+    foo: StringProperty(name="Direction")
+    viewport: BoolProperty(name="Project From Viewport", default=False)
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object.mode == "EDIT"
+
+    def execute(self, context):
+        import bmesh
+        from .uv_project import PROJECTIONS, project_mesh_uvs
+
+        # Every mesh in multi-object Edit Mode, like uv.project_from_view
+        objects = [
+            o
+            for o in context.objects_in_mode_unique_data
+            if o.type == "MESH" and o.data.total_face_sel
+        ]
+        if not objects:
+            self.report({"ERROR"}, "No Faces Selected")
+            return {"CANCELLED"}
+
+        if self.foo not in PROJECTIONS:
+            self.report({"ERROR"}, "Unknown direction %r" % self.foo)
+            return {"CANCELLED"}
+
+        if self.viewport:
+            return self.project_from_viewport(context)
+
+        # Project straight from the camera parameters on the mesh data, then
+        # reload the edit mesh so it picks up the new UVs
+        render = context.scene.render
+        for obj in objects:
+            obj.update_from_editmode()
+            project_mesh_uvs(obj, self.foo, (render.resolution_x, render.resolution_y))
+
+            bm = bmesh.from_edit_mesh(obj.data)
+            bm.clear()
+            bm.from_mesh(obj.data)
+            bmesh.update_edit_mesh(obj.data)
+
+        self.report(
+            {"INFO"},
+            "UV projected from %r view on %d objects" % (self.foo, len(objects)),
+        )
+
+        return {"FINISHED"}
+
+    def project_from_viewport(self, context):
+        import mathutils
+        from .uv_project import PROJECTIONS
+
+        camera_data = bpy.data.cameras.get("3DPCamera")
+
+        if camera_data is None:
+            camera_data = bpy.data.cameras.new(name="3DPCamera")
+            my_camera = bpy.data.objects.new("3DPCamera", camera_data)
+
+            context.scene.collection.objects.link(my_camera)
+        else:
+            my_camera = bpy.data.objects["3DPCamera"]
+
+        camera_data.type = "ORTHO"
+
+        cam_rot, cam_loc, camera_data.ortho_scale = PROJECTIONS[self.foo]
+
+        my_camera.location = cam_loc
+        my_camera.rotation_euler = mathutils.Euler(cam_rot, "XYZ")
+        context.scene.camera = my_camera
+
+        bpy.ops.view3d.view_camera()
+
+        for area in bpy.context.screen.areas:
+            if area.type == "VIEW_3D":
+                area.spaces.active.region_3d.update()
+
+        bpy.ops.uv.project_from_view(
+            camera_bounds=True, correct_aspect=False, scale_to_bounds=False
+        )
+
+        bpy.ops.view3d.view_camera()
+
+        self.report({"INFO"}, "UV projected from %r view" % self.foo)
+
+        return {"FINISHED"}
+
+
+class TOOL_OT_3dp_auto_unwrap(Operator):
+    bl_idname = "3dp.auto_unwrap"
+    bl_label = "auto unwrap uv"
+    bl_description = "project uv for every face of the selected meshes by normal"
+    bl_options = {"REGISTER", "UNDO"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.mode == "OBJECT" and any(
+            o.type == "MESH" for o in context.selected_objects
+        )
+
+    def execute(self, context):
+        from .uv_project import DIRECTIONS, auto_unwrap_object
+
+        start = time.perf_counter()
+        render = context.scene.render
+        resolution = (render.resolution_x, render.resolution_y)
+        angle = radians(context.scene.kbd_uv.uv_angle)
+
+        totals = dict.fromkeys(DIRECTIONS, 0)
+        objects = [o for o in context.selected_objects if o.type == "MESH"]
+        for obj in objects:
+            for direction, count in auto_unwrap_object(obj, resolution, angle).items():
+                totals[direction] += count
+
+        self.report(
+            {"INFO"},
+            "UV projected %d objects (%s) in %.2fs"
+            % (
+                len(objects),
+                ", ".join("%s %d" % item for item in totals.items()),
+                time.perf_counter() - start,
+            ),
+        )
+
+        return {"FINISHED"}
+
+
+class VIEW3D_PT_3dpkbd_uv(Panel):
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "3DPKBD"
+    bl_label = "UV Project From View"
+
+    def draw(self, context):
+        layout = self.layout
+
+        layout.use_property_split = True
+        layout.use_property_decorate = False  # No animation.
+
+        row = layout.row()
+        row.operator("3dp.unwrap", text="Side").foo = "side"
+        row.operator("3dp.unwrap", text="Top").foo = "top"
+        row.operator("3dp.unwrap", text="Bottom").foo = "bottom"
+
+        settings = context.scene.kbd_uv
+        layout.row().prop(settings, "uv_angle", text="Angle")
+        layout.row().operator("3dp.auto_unwrap", text="Unwrap Selected Objects")
+
+
+class VIEW3D_PT_3dpkbd_rename(Panel):
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "3DPKBD"
+    bl_label = "Rename"
+
+    def draw(self, context):
+        layout = self.layout
+
+        layout.use_property_split = True
+        layout.use_property_decorate = False  # No animation.
+
+        row = layout.row()
+        col = row.column()
+        col.operator("3dp.rename", text="Top").foo = "top"
+        col.operator("3dp.rename", text="Standard").foo = "standard"
+        col.operator("3dp.rename", text="Vented").foo = "vented"
+        col = row.column()
+        col.operator("3dp.rename", text="Blocker").foo = "blocker"
+        col.operator("3dp.rename", text="Blocker-1").foo = "blocker-1"
+        col.operator("3dp.rename", text="Blocker-2").foo = "blocker-2"
+
+
+classes = (
+    UVSettings,
+    TOOL_OT_3dp_unwrap,
+    TOOL_OT_3dp_auto_unwrap,
+    TOOL_OT_3dp_rename,
+    VIEW3D_PT_3dpkbd_uv,
+    VIEW3D_PT_3dpkbd_rename,
+)
+
+
+def register():
+    global users
+    users += 1
+    if users > 1:
+        return
+
+    from bpy.utils import register_class
+
+    for cls in classes:
+        register_class(instrumentation.instrument(cls))
+
+    Scene.kbd_uv = PointerProperty(type=UVSettings)
+
+
+def unregister():
+    global users
+    users -= 1
+    if users > 0:
+        return
+
+    from bpy.utils import unregister_class
+
+    for cls in reversed(classes):
+        unregister_class(cls)
+
+    del Scene.kbd_uv
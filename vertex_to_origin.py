@@ -1,8 +1,58 @@
 import bpy
-import bmesh
 from bpy.types import Operator
+from bpy.props import EnumProperty
 
-custom_keymap = None
+from . import instrumentation
+
+custom_keymap = []
+
+
+def origin_target(obj, target):
+    # Local position of the new origin, or None when nothing is selected
+    import bmesh
+    import numpy as np
+    from mathutils import Vector
+
+    mesh = obj.data
+    if target == "ACTIVE":
+        bm = bmesh.from_edit_mesh(mesh)
+        active = bm.select_history.active
+        if isinstance(active, bmesh.types.BMVert):
+            return active.co.copy()
+
+    # Sync the edit mesh once, then read selection and coordinates in bulk
+    obj.update_from_editmode()
+    select = np.empty(len(mesh.vertices), dtype=bool)
+    mesh.vertices.foreach_get("select", select)
+    if not select.any():
+        return None
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    co = co.reshape(-1, 3)[select].astype(np.float64)
+
+    if target == "ACTIVE":
+        # No vertex in the selection history, fall back to the first selected
+        return Vector(co[0])
+    if target == "CENTROID":
+        return Vector(co.mean(axis=0))
+    return Vector((co.min(axis=0) + co.max(axis=0)) / 2)
+
+
+def move_origin(obj, offset):
+    # Shift the mesh against the offset and the object along it, so nothing
+    # moves in world space, children included
+    import bmesh
+    from mathutils import Matrix
+
+    bm = bmesh.from_edit_mesh(obj.data)
+    bmesh.ops.translate(bm, vec=-offset, verts=bm.verts)
+    bmesh.update_edit_mesh(obj.data, loop_triangles=False, destructive=False)
+
+    obj.matrix_world = obj.matrix_world @ Matrix.Translation(offset)
+    for child in obj.children:
+        child.matrix_parent_inverse = (
+            Matrix.Translation(-offset) @ child.matrix_parent_inverse
+        )
 
 
 class OriginOperator(Operator):
@@ -10,42 +60,52 @@ class OriginOperator(Operator):
     bl_label = "Origin to Selected Vertex"
     bl_options = {"REGISTER", "UNDO"}
 
+    target: EnumProperty(
+        name="Target",
+        items=[
+            ("ACTIVE", "Active Vertex", "Last selected vertex of each object"),
+            ("CENTROID", "Selection Centroid", "Mean of the selected vertices"),
+            ("BOUNDS", "Bounding Box Center", "Center of the selected vertices"),
+        ],
+        default="ACTIVE",
+    )
+
     @classmethod
     def poll(cls, context):
-        return context.mode == "EDIT_MESH" and len(context.selected_objects) == 1
+        return context.mode == "EDIT_MESH"
 
     def execute(self, context):
-        active_object = context.active_object
-        mesh = active_object.data
-        bm = bmesh.from_edit_mesh(mesh)
-
-        selected_verts = [v for v in bm.verts if v.select]
-        if not len(selected_verts):
+        moved = 0
+        skipped = []
+        for obj in context.objects_in_mode_unique_data:
+            if obj.data.users > 1:
+                skipped.append(obj.name)
+                continue
+            origin = origin_target(obj, self.target)
+            if origin is None:
+                continue
+            move_origin(obj, origin)
+            moved += 1
+
+        if not moved:
             self.report({"ERROR"}, "No Vertex Selected")
             return {"CANCELLED"}
 
-        vert_position = selected_verts[0].co
-
-        # Get the object's world matrix
-        world_matrix = active_object.matrix_world
-
-        # Calculate the global coordinates by multiplying the world matrix by the local coordinates
-        world_vert_position = world_matrix @ vert_position
-
-        # Set cursor location to new vertex position
-        context.scene.cursor.location = world_vert_position
-
-        # Switch to object mode to set origin
-        bpy.ops.object.mode_set(mode="OBJECT")
-        bpy.ops.object.origin_set(type="ORIGIN_CURSOR")
-
-        self.report({"INFO"}, "Object Origin Updated")
+        if skipped:
+            self.report(
+                {"WARNING"},
+                "Origin updated on %d objects, skipped shared mesh data: %s"
+                % (moved, ", ".join(skipped)),
+            )
+        else:
+            self.report({"INFO"}, "Origin updated on %d objects" % moved)
 
         return {"FINISHED"}
 
 
 def register():
-    bpy.utils.register_class(OriginOperator)
+    instrumentation.register()
+    bpy.utils.register_class(instrumentation.instrument(OriginOperator))
 
     key_config = bpy.context.window_manager.keyconfigs.addon
     if key_config:
@@ -56,7 +116,7 @@ def register():
             value="PRESS",
             shift=True,
         )
-        custom_keymap = (key_map, key_entry)
+        custom_keymap.append((key_map, key_entry))
 
 
 def unregister():
@@ -65,7 +125,4 @@ def unregister():
     custom_keymap.clear()
 
     bpy.utils.unregister_class(OriginOperator)
-
-
-if __name__ == "__main__":
-    register()
+    instrumentation.unregister()
@@ -0,0 +1,89 @@
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def blender_binary():
+    # Prefer an explicit override, then the Blender we are running inside
+    binary = os.environ.get("BLENDER")
+    if binary:
+        return binary
+    try:
+        import bpy
+
+        if bpy.app.binary_path:
+            return bpy.app.binary_path
+    except ImportError:
+        pass
+    return "blender"
+
+
+def blender_command(script, args=(), threads=1, blend=None):
+    command = [blender_binary(), "-b"]
+    if blend is not None:
+        command.append(blend)
+    command += ["--factory-startup", "--threads", str(threads)]
+    command += ["--python-exit-code", "1", "--python", script, "--"]
+    return command + [str(arg) for arg in args]
+
+
+def run_job(command, log_path):
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        try:
+            returncode = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT)
+        except OSError as error:
+            log.write("Failed to start %r: %s\n" % (command[0], error))
+            returncode = -1
+
+    return {
+        "returncode": returncode,
+        "seconds": time.perf_counter() - start,
+        "log": log_path,
+    }
+
+
+def run_jobs(commands, log_paths, max_workers=None):
+    # Each job is its own Blender process, threads only wait on them
+    max_workers = max_workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers) as pool:
+        return list(pool.map(run_job, commands, log_paths))
+
+
+class BackgroundJob:
+    # A Blender process that is polled instead of waited on, so callers such
+    # as modal operators keep the UI responsive
+    def __init__(self, command, log_path):
+        self.log_path = log_path
+        self.log = open(log_path, "w")
+        self.start = time.perf_counter()
+        try:
+            self.process = subprocess.Popen(
+                command, stdout=self.log, stderr=subprocess.STDOUT
+            )
+        except OSError:
+            self.log.close()
+            raise
+        self.returncode = None
+
+    def poll(self):
+        if self.returncode is None:
+            self.returncode = self.process.poll()
+            if self.returncode is not None:
+                self.log.close()
+        return self.returncode
+
+    def cancel(self):
+        if self.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.poll()
+
+    def read_log(self):
+        with open(self.log_path) as log:
+            return log.read()